@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Times how long each entry point takes to import, in a fresh interpreter.
+
+Every script is executed with `runpy.run_path` under a name other than
+`__main__`, so only its module body runs. Each measurement is the wall-clock
+time of a whole `python` process minus that of `python -c pass`, which is
+what `dominos.pl` pays per `will-tip.py` query on top of the answer itself.
+With `--breakdown N` the N slowest imports of each entry point (cumulative
+time from `python -X importtime`) are reported too.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+ENTRY_POINTS = (
+    "will-tip.py", "tipping.py", "tip_oracle.py", "chain.py", "datalog.py", "dominos.py", "gen_scenarios.py",
+    "run_batch.py", "benchmark.py", "calibrate.py", "sweep.py", "training.py", "feature_executor.py",
+    "run_abstraction.py", "run_prompting.py", "run_classifier.py", "run.py", "multirun.py",
+)
+IMPORT = "import runpy, sys; runpy.run_path(sys.argv[1], run_name='__bench__')"
+
+
+def _run(command):
+    start = time.perf_counter()
+    process = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    return time.perf_counter() - start, process
+
+
+def import_time(script, repeat=5):
+    """`(median seconds, error)` of importing `script`; error is the last
+    line of the traceback if the import fails."""
+    times = []
+    for _ in range(repeat):
+        seconds, process = _run([sys.executable, "-c", IMPORT, os.path.join(ROOT, script)])
+        if process.returncode != 0:
+            lines = process.stderr.strip().splitlines()
+            return None, lines[-1] if lines else f"exit status {process.returncode}"
+        times.append(seconds)
+    return statistics.median(times), None
+
+
+def breakdown(script, top=10):
+    """The `top` imports of `script` with the largest cumulative time, as
+    `(module, seconds)`."""
+    _, process = _run([sys.executable, "-X", "importtime", "-c", IMPORT, os.path.join(ROOT, script)])
+    rows = []
+    for line in process.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, module = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                rows.append((module.strip(), int(cumulative) / 1e6))
+    return sorted(rows, key=lambda row: row[1], reverse=True)[:top]
+
+
+def run_benchmark(scripts=ENTRY_POINTS, repeat=5, top=0):
+    baseline = statistics.median(_run([sys.executable, "-c", "pass"])[0] for _ in range(repeat))
+    rows = {}
+    for script in scripts:
+        seconds, error = import_time(script, repeat)
+        row = {"seconds": None if seconds is None else max(seconds - baseline, 0.0), "error": error}
+        if top and error is None:
+            row["slowest"] = breakdown(script, top)
+        rows[script] = row
+    return {"python": sys.version.split()[0], "repeat": repeat, "baseline_seconds": baseline, "entry_points": rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the imports of every entry point.")
+    parser.add_argument("scripts", nargs="*", default=list(ENTRY_POINTS), help="scripts to time (default: all)")
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="runs per script; the median is reported")
+    parser.add_argument("--breakdown", type=int, default=0, metavar="N", help="also report the N slowest imports")
+    parser.add_argument("-o", "--out", default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.scripts, args.repeat, args.breakdown)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    for script, row in report["entry_points"].items():
+        status = f"{row['seconds'] * 1000:.1f} ms" if row["error"] is None else f"failed: {row['error']}"
+        print(f"{script}: {status}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
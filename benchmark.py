@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import chain
+import dominos
+import solver
+from scenario import load_scenarios
+
+ABSTRACTIONS = ("native", "datalog", "prolog")
+
+
+def scenario_axes(scenario):
+    """Breakdown keys of a scenario: height/width ratio, number of dominoes and
+    the widest gap in the row, in domino slots (0 for an unbroken row)."""
+    xs = sorted(scenario.dominoes)
+    spacings = [b - a for a, b in zip(xs, xs[1:])]
+    gap = round(max(spacings) / min(spacings)) - 1 if spacings and min(spacings) > 0 else 0
+    return {
+        "ratio": round(scenario.height / scenario.width, 2),
+        "dominoes": len(xs),
+        "gap": gap,
+    }
+
+
+class CountingOracle:
+    """Wraps a tipping oracle and counts the calls made to it."""
+
+    def __init__(self, oracle=None):
+        self.oracle = oracle or chain._default_oracle
+        self.calls = 0
+
+    def __call__(self, domino_width, domino_height):
+        self.calls += 1
+        return self.oracle(domino_width, domino_height)
+
+
+def _timed(function, *args, **kwargs):
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - wall, time.process_time() - cpu
+
+
+def _make_abstraction(kind):
+    """Returns `predict(scenario, oracle) -> bool` for an abstraction path."""
+    if kind == "native":
+        return chain.will_cup
+    if kind == "datalog":
+        import datalog
+
+        with open("dominos.pl") as f:
+            rules = f.read()
+        # One compiled program for the whole run; its shell results are cached
+        # across scenarios, so repeated (width, height) pairs call no oracle
+        current = []
+        program = datalog.Program(rules, shell=datalog.tip_shell(lambda w, h: current[-1](w, h)))
+
+        def predict(scenario, oracle):
+            current[:] = [oracle]
+            return program.holds(datalog.scenario_facts(scenario))
+
+        return predict
+    if kind == "prolog":
+        # swipl calls will-tip.py itself, so its oracle calls are not counted
+        return lambda scenario, oracle: chain.prolog_will_cup(scenario)
+    raise ValueError(f"Unknown abstraction {kind!r}")
+
+
+def benchmark_scenario(scenario, predict, **simulate_kwargs):
+    verdict, sim_wall, sim_cpu = _timed(dominos.simulate, scenario, **simulate_kwargs)
+    oracle = CountingOracle()
+    predicted, abs_wall, abs_cpu = _timed(predict, scenario, oracle)
+    return dict(
+        scenario=scenario.name,
+        **scenario_axes(scenario),
+        actual=verdict.cup_tipped,
+        predicted=bool(predicted),
+        stop_reason=verdict.stop_reason,
+        steps=verdict.steps,
+        sim_wall=sim_wall,
+        sim_cpu=sim_cpu,
+        abs_wall=abs_wall,
+        abs_cpu=abs_cpu,
+        oracle_calls=oracle.calls,
+    )
+
+
+def summarize(records):
+    """Agreement, confusion matrix (actual vs predicted), totals and speedup.
+    Runs whose simulation timed out (`actual` is None) only count as timings."""
+    decided = [r for r in records if r["actual"] is not None]
+    confusion = {
+        "tp": sum(r["actual"] and r["predicted"] for r in decided),
+        "fp": sum(not r["actual"] and r["predicted"] for r in decided),
+        "fn": sum(r["actual"] and not r["predicted"] for r in decided),
+        "tn": sum(not r["actual"] and not r["predicted"] for r in decided),
+    }
+    totals = {key: sum(r[key] for r in records) for key in ("sim_wall", "sim_cpu", "abs_wall", "abs_cpu", "steps", "oracle_calls")}
+    return {
+        "scenarios": len(records),
+        "undecided": len(records) - len(decided),
+        "agreement": (confusion["tp"] + confusion["tn"]) / len(decided) if decided else None,
+        "confusion": confusion,
+        **totals,
+        "speedup_wall": totals["sim_wall"] / totals["abs_wall"] if totals["abs_wall"] else None,
+        "speedup_cpu": totals["sim_cpu"] / totals["abs_cpu"] if totals["abs_cpu"] else None,
+    }
+
+
+def breakdown(records, key):
+    groups = {}
+    for record in records:
+        groups.setdefault(record[key], []).append(record)
+    return {str(value): summarize(groups[value]) for value in sorted(groups)}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(scenarios, abstraction="native", **simulate_kwargs):
+    predict = _make_abstraction(abstraction)
+    records = [benchmark_scenario(scenario, predict, **simulate_kwargs) for scenario in scenarios]
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "abstraction": abstraction,
+        "simulate": simulate_kwargs,
+        "summary": summarize(records),
+        "by_ratio": breakdown(records, "ratio"),
+        "by_dominoes": breakdown(records, "dominoes"),
+        "by_gap": breakdown(records, "gap"),
+        "records": records,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark simulation against abstraction on a scenario corpus.")
+    parser.add_argument("scenarios", nargs="?", default="scenarios", help="scenario file, shard, or directory")
+    parser.add_argument("--abstraction", choices=ABSTRACTIONS, default="native", help="abstraction path to time")
+    parser.add_argument("--duration", type=float, default=dominos.DURATION, help="simulated seconds per scenario")
+    parser.add_argument("--timeout", type=float, default=None, help="wall-clock seconds allowed per simulation")
+    parser.add_argument("--no-early-stop", action="store_true", help="only stop when the cup tips or the duration ends")
+    parser.add_argument("--reuse-worlds", action="store_true",
+                        help="reset one world for the whole run instead of building one per scenario (faster, but "
+                             "verdicts of borderline scenarios can depend on the scenarios simulated before them)")
+    parser.add_argument("--lazy", choices=("sleep", "data"), default=None,
+                        help="activate dominoes only as the wave reaches them (see wavefront.py)")
+    parser.add_argument("--profile", default=solver.DEFAULT_PROFILE,
+                        help=f"solver profile: {', '.join(solver.PROFILES)} or calibrated")
+    parser.add_argument("-o", "--out", default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        load_scenarios(args.scenarios),
+        args.abstraction,
+        duration=args.duration,
+        timeout=args.timeout,
+        early_stop=not args.no_early_stop,
+        reuse_world=args.reuse_worlds,
+        profile=args.profile,
+        lazy=args.lazy,
+    )
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    summary = report["summary"]
+    print(
+        f"{summary['scenarios']} scenarios, agreement {summary['agreement']}, "
+        f"confusion {summary['confusion']}, wall speedup {summary['speedup_wall']}",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
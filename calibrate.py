@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Picks the cheapest solver profile whose verdicts agree with the reference.
+
+Every scenario of the corpus is simulated under the `reference` profile and
+under each candidate profile (see solver.py). A candidate qualifies when its
+`cup_tipped` verdicts match the reference on at least `--min-agreement` of the
+scenarios; runs that time out count as disagreements. The qualifying profile
+with the least simulation time is chosen, and `--save` records it for
+`solver.get_profile("calibrated")`.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import dominos
+import solver
+from run_batch import run_batch
+from scenario import load_scenarios
+
+
+def run_profile(scenarios, profile, processes=None, **kwargs):
+    """`{scenario name: result}` of `run_batch` under one profile, plus the
+    wall-clock seconds of the whole run."""
+    start = time.perf_counter()
+    results = {result["scenario"]: result for result in run_batch(scenarios, processes, profile=profile, **kwargs)}
+    return results, time.perf_counter() - start
+
+
+def compare(reference, results):
+    agree = sum(
+        results[name]["cup_tipped"] is not None and results[name]["cup_tipped"] == verdict["cup_tipped"]
+        for name, verdict in reference.items()
+    )
+    mismatches = sorted(name for name in reference if results[name]["cup_tipped"] != reference[name]["cup_tipped"])
+    return agree / len(reference) if reference else None, mismatches
+
+
+def calibrate(scenarios, profiles=None, min_agreement=0.99, reference="reference", processes=None, **kwargs):
+    """Returns a report with the agreement and cost of every profile and the
+    chosen one (None if no candidate qualifies)."""
+    profiles = [name for name in (profiles or solver.PROFILES) if name != reference]
+    reference_results, reference_wall = run_profile(scenarios, reference, processes, **kwargs)
+    rows = {}
+    for name in profiles:
+        results, wall = run_profile(scenarios, name, processes, **kwargs)
+        profile = solver.get_profile(name)
+        agreement, mismatches = compare(reference_results, results)
+        steps = sum(result.get("steps", 0) for result in results.values())
+        rows[name] = {
+            "agreement": agreement,
+            "mismatches": mismatches,
+            "seconds": sum(result["seconds"] for result in results.values()),
+            "wall": wall,
+            "steps": steps,
+            # Solver iterations spent, a noise-free proxy for the cost
+            "iterations": steps * (profile.velocity_iterations + profile.position_iterations),
+        }
+
+    qualifying = [name for name, row in rows.items()
+                  if row["agreement"] is not None and row["agreement"] >= min_agreement]
+    chosen = min(qualifying, key=lambda name: rows[name]["seconds"]) if qualifying else None
+    return {
+        "scenarios": len(scenarios),
+        "reference": reference,
+        "reference_seconds": sum(result["seconds"] for result in reference_results.values()),
+        "reference_wall": reference_wall,
+        "min_agreement": min_agreement,
+        "profiles": rows,
+        "profile": chosen,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Choose the cheapest solver profile that agrees with the reference.")
+    parser.add_argument("scenarios", nargs="?", default="scenarios", help="scenario file, shard, or directory")
+    parser.add_argument("--profiles", nargs="+", default=None, choices=list(solver.PROFILES),
+                        help="candidate profiles (default: all)")
+    parser.add_argument("--min-agreement", type=float, default=0.99,
+                        help="fraction of reference verdicts a profile has to reproduce")
+    parser.add_argument("--duration", type=float, default=dominos.DURATION, help="simulated seconds per scenario")
+    parser.add_argument("--timeout", type=float, default=None, help="wall-clock seconds allowed per simulation")
+    parser.add_argument("-j", "--processes", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--save", action="store_true", help=f"record the chosen profile in {solver.CALIBRATION_PATH}")
+    parser.add_argument("-o", "--out", default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = calibrate(load_scenarios(args.scenarios), args.profiles, args.min_agreement,
+                       processes=args.processes, duration=args.duration, timeout=args.timeout)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    for name, row in report["profiles"].items():
+        print(f"{name}: agreement {row['agreement']}, {row['seconds']:.1f} s, {row['iterations']} iterations",
+              file=sys.stderr)
+    if report["profile"] is None:
+        print(f"No profile reaches {args.min_agreement} agreement", file=sys.stderr)
+        return 1
+    print(f"Chosen profile: {report['profile']}", file=sys.stderr)
+    if args.save:
+        with open(solver.CALIBRATION_PATH, "w") as f:
+            json.dump({key: report[key] for key in ("profile", "scenarios", "min_agreement", "profiles")}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
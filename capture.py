@@ -0,0 +1,138 @@
+import logging
+import queue
+import threading
+import time
+
+import pygame
+
+log = logging.getLogger(__name__)
+
+
+class VideoRecorder:
+    """Records pygame surfaces to a video file without blocking the render loop.
+
+    `capture` makes the only copy of a frame (`pygame.image.tobytes`, which is
+    already in (height, width, RGB) order, so no transpose is needed) and puts
+    it on a bounded queue. A background thread turns the bytes into an array
+    view and hands it to the imageio writer. When the queue is full the frame is
+    dropped rather than stalling the simulation, unless `block` is set; the
+    writer then repeats the previous frame in its place, so the video keeps
+    its timing but freezes where frames were dropped. `close` logs a warning
+    with the number of dropped frames.
+
+    Only every `every`-th frame is captured and frames can be scaled by `scale`
+    before the copy. The time spent capturing (on the render thread) and
+    encoding (on the writer thread) is accumulated separately; see `stats`.
+    If the writer thread fails, later frames are dropped and `close` raises
+    its exception."""
+
+    def __init__(self, path, fps, every=1, scale=1.0, max_queue=64, block=False):
+        self.path = path
+        self.fps = fps
+        self.every = max(1, int(every))
+        self.scale = scale
+        self.block = block
+        self.queue = queue.Queue(maxsize=max_queue)
+
+        self.frames_seen = 0
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.frames_encoded = 0
+        self.capture_seconds = 0.0
+        self.encode_seconds = 0.0
+        self.error = None
+        self._skipped = 0  # Frames dropped since the last queued one
+
+        self._tobytes = getattr(pygame.image, "tobytes", None) or pygame.image.tostring
+        self.thread = threading.Thread(target=self._encode, name="video-encoder", daemon=True)
+        self.thread.start()
+
+    def capture(self, surface):
+        self.frames_seen += 1
+        if (self.frames_seen - 1) % self.every:
+            return
+
+        start = time.perf_counter()
+        if self.scale != 1.0:
+            width, height = surface.get_size()
+            surface = pygame.transform.smoothscale(
+                surface, (max(1, int(width * self.scale)), max(1, int(height * self.scale)))
+            )
+        frame = (self._tobytes(surface, "RGB"), surface.get_size(), self._skipped)
+        try:
+            if not self.thread.is_alive():
+                # Nothing would take the frame off the queue
+                raise queue.Full
+            if self.block:
+                self._put(frame)
+            else:
+                self.queue.put_nowait(frame)
+            self.frames_captured += 1
+            self._skipped = 0
+        except queue.Full:
+            self.frames_dropped += 1
+            self._skipped += 1
+        self.capture_seconds += time.perf_counter() - start
+
+    def _put(self, item):
+        # Blocks while the queue is full, but gives up if the writer thread
+        # has died and will never make room
+        while True:
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if not self.thread.is_alive():
+                    raise
+
+    def _encode(self):
+        try:
+            import imageio
+            import numpy as np
+
+            writer = imageio.get_writer(self.path, fps=self.fps / self.every)
+            try:
+                image = None
+                while True:
+                    data, size, skipped = self.queue.get()
+                    start = time.perf_counter()
+                    # Dropped frames are replaced by the last frame written
+                    if image is not None:
+                        for _ in range(skipped):
+                            writer.append_data(image)
+                    if data is None:
+                        break
+                    width, height = size
+                    image = np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
+                    writer.append_data(image)
+                    self.encode_seconds += time.perf_counter() - start
+                    self.frames_encoded += 1
+            finally:
+                writer.close()
+        except BaseException as e:
+            self.error = e
+
+    def close(self):
+        """Waits for the queued frames to be encoded and closes the file.
+        Re-raises the exception of the writer thread, if it failed."""
+        try:
+            self._put((None, None, self._skipped))
+        except queue.Full:
+            pass
+        self.thread.join()
+        if self.frames_dropped:
+            log.warning(f"{self.frames_dropped} of {self.frames_captured + self.frames_dropped} frames of "
+                        f"{self.path} were dropped and replaced by the previous frame; pass block=True "
+                        f"(or lower the resolution) to keep them")
+        if self.error is not None:
+            raise RuntimeError(f"Video encoding of {self.path} failed") from self.error
+
+    def stats(self):
+        return {
+            "frames_seen": self.frames_seen,
+            "frames_captured": self.frames_captured,
+            "frames_dropped": self.frames_dropped,
+            "frames_encoded": self.frames_encoded,
+            "capture_seconds": self.capture_seconds,
+            "encode_seconds": self.encode_seconds,
+        }
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""In-process evaluator for the rules in `dominos.pl`.
+
+The rules define the least fixpoint of
+  tipped(X)  if X is the pushed domino and it tips (the oracle),
+             or some tipped domino X1 < X has X - X1 =< H,
+             or some ball B < X moves;
+  moves(B)   if some tipped domino X =< B has B - X =< H;
+  will_cup   if the rightmost ball lies beyond the rightmost domino and moves.
+Every dependency points to a smaller (or, for balls, equal) position, so one
+left-to-right sweep over the sorted dominoes and balls decides each object
+once its left neighbours are known. The nearest tipped domino to the left is
+found by bisecting the sorted list of tipped positions, making a scenario
+O(n log n) with the same float comparisons as Prolog.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from bisect import bisect_left, bisect_right
+
+from scenario import load_scenarios
+
+
+def _default_oracle(domino_width, domino_height):
+    import tipping
+
+    return tipping.will_tip(domino_width, domino_height)
+
+
+def propagate(scenario, oracle=None):
+    """Returns `(tipped, moved)`: the sorted positions of the dominoes that
+    will be tipped and of the balls that will move.
+
+    `oracle(width, height)` decides whether the pushed domino tips; it is
+    called at most once, and only if the pushed domino is one of the
+    dominoes. Defaults to `tipping.will_tip`."""
+    oracle = oracle or _default_oracle
+    height = scenario.height
+
+    # Dominoes sort before balls at the same position: a domino only depends on
+    # balls strictly to its left, a ball also on dominoes at its own position
+    objects = sorted([(x, 0) for x in scenario.dominoes] + [(b, 1) for b in scenario.balls])
+
+    tipped, moved = [], []
+    push_tips = None
+    for x, is_ball in objects:
+        if is_ball:
+            i = bisect_right(tipped, x)
+            if i and x - tipped[i - 1] <= height:
+                moved.append(x)
+            continue
+
+        if moved:
+            tipped.append(x)
+            continue
+        i = bisect_left(tipped, x)
+        if i and x - tipped[i - 1] <= height:
+            tipped.append(x)
+            continue
+        if x == scenario.push:
+            if push_tips is None:
+                push_tips = bool(oracle(scenario.width, scenario.height))
+            if push_tips:
+                tipped.append(x)
+    return tipped, moved
+
+
+def will_cup(scenario, oracle=None):
+    """Native equivalent of `will_cup` in dominos.pl."""
+    if not scenario.balls or not scenario.dominoes:
+        return False
+    ball = max(scenario.balls)
+    if not ball > max(scenario.dominoes):
+        return False
+    _, moved = propagate(scenario, oracle)
+    return bool(moved) and moved[-1] == ball
+
+
+def prolog_will_cup(scenario, rules_path="dominos.pl"):
+    """Evaluates `will_cup` with swipl, the way run_abstraction.py used to."""
+    with open(rules_path) as f:
+        rules = f.read()
+    with tempfile.NamedTemporaryFile("w", suffix=".pl", delete=False) as f:
+        f.write(scenario.to_prolog() + rules)
+        pl_name = f.name
+    import tip_oracle
+
+    # dominos.pl consults tip_cache.pl from its working directory without
+    # checking the settings it was exported under
+    tip_oracle.ensure_prolog_export()
+    try:
+        return subprocess.run(["swipl", "-q", "-f", pl_name], stdin=subprocess.DEVNULL,
+                              cwd=os.path.dirname(tip_oracle.PROLOG_CACHE_PATH)).returncode == 0
+    finally:
+        os.remove(pl_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the native evaluator against swipl on a set of scenarios."
+    )
+    parser.add_argument("scenarios", nargs="?", default="scenarios",
+                        help="scenario file, shard, or directory (default: scenarios)")
+    args = parser.parse_args()
+
+    mismatches = 0
+    scenarios = load_scenarios(args.scenarios)
+    for scenario in scenarios:
+        native = will_cup(scenario)
+        prolog = prolog_will_cup(scenario)
+        if native != prolog:
+            mismatches += 1
+            print(f"{scenario.name}: native={int(native)} prolog={int(prolog)}")
+    print(f"{len(scenarios) - mismatches}/{len(scenarios)} scenarios agree")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
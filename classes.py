@@ -1,147 +1,153 @@
-import pygame
-from Box2D import (
-    b2World, b2PolygonShape, b2CircleShape,
-    b2_dynamicBody, b2_staticBody, b2ContactListener, b2RevoluteJointDef
-)
-
-
-# Colors
-WHITE = (255, 255, 255)
-GRAY = (200, 200, 200)
-BLACK = (0, 0, 0)
-
-
-
-class Slider:
-    def __init__(self, name, x, y, width, height, range):
-        self.name = name
-        self.rect = pygame.Rect(x, y, width, height)
-        self.circle_radius = height // 2
-        self.circle_x = x  # Start position of the slider handle
-        self.dragging = False
-        self.range=range
-
-    def draw(self, surface):
-        # Draw the slider track
-        pygame.draw.rect(surface, GRAY, self.rect)
-        
-        # Draw the slider handle
-        pygame.draw.circle(surface, BLACK, (self.circle_x, self.rect.centery), self.circle_radius)
-
-    def handle_event(self, event):
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            # Check if the mouse clicked on the slider handle
-            if pygame.Rect(self.circle_x - self.circle_radius, self.rect.centery - self.circle_radius, 
-                           self.circle_radius * 2, self.circle_radius * 2).collidepoint(event.pos):
-                self.dragging = True
-
-        elif event.type == pygame.MOUSEBUTTONUP:
-            # Stop dragging when the mouse button is released
-            self.dragging = False
-
-        elif event.type == pygame.MOUSEMOTION:
-            # Update the slider handle position if dragging
-            if self.dragging:
-                self.circle_x = max(self.rect.left, min(event.pos[0], self.rect.right))
-                
-    def get_value(self):
-        # Map the slider position to a range (e.g., 0 to 100)
-        return (self.circle_x - self.rect.left) / self.rect.width * self.range
-
-# Contact listener to monitor contacts
-class ContactListener(b2ContactListener):
-    def __init__(self, last_domino_body, bowling_ball_body, platform_body, beam_body):
-        b2ContactListener.__init__(self)
-        self.last_domino_body = last_domino_body
-        self.bowling_ball_body = bowling_ball_body
-        self.platform_body = platform_body
-        self.beam_body = beam_body
-
-        # Contact status variables
-        self.domino_ball_contact = False
-        self.ball_contact_top = False
-        self.ball_contact_bottom = False
-
-    def BeginContact(self, contact):
-        fixtureA = contact.fixtureA
-        fixtureB = contact.fixtureB
-        bodyA = fixtureA.body
-        bodyB = fixtureB.body
-
-        # Check if the last domino is in contact with the bowling ball
-        if (bodyA == self.last_domino_body and bodyB == self.bowling_ball_body) or \
-           (bodyB == self.last_domino_body and bodyA == self.bowling_ball_body):
-            self.domino_ball_contact = True
-
-        # Check if the bowling ball is in contact with the top platform
-        if (bodyA == self.bowling_ball_body and bodyB == self.platform_body) or \
-           (bodyB == self.bowling_ball_body and bodyA == self.platform_body):
-            self.ball_contact_top = True
-
-        # Check if the bowling ball is in contact with the balance beam
-        if (bodyA == self.bowling_ball_body and bodyB == self.beam_body) or \
-           (bodyB == self.bowling_ball_body and bodyA == self.beam_body):
-            self.ball_contact_bottom = True  # Reusing variable for simplicity
-
-    def EndContact(self, contact):
-        fixtureA = contact.fixtureA
-        fixtureB = contact.fixtureB
-        bodyA = fixtureA.body
-        bodyB = fixtureB.body
-
-        # Check if the last domino is no longer in contact with the bowling ball
-        if (bodyA == self.last_domino_body and bodyB == self.bowling_ball_body) or \
-           (bodyB == self.last_domino_body and bodyA == self.bowling_ball_body):
-            self.domino_ball_contact = False
-
-        # Check if the bowling ball is no longer in contact with the top platform
-        if (bodyA == self.bowling_ball_body and bodyB == self.platform_body) or \
-           (bodyB == self.bowling_ball_body and bodyA == self.platform_body):
-            self.ball_contact_top = False
-
-        # Check if the bowling ball is no longer in contact with the balance beam
-        if (bodyA == self.bowling_ball_body and bodyB == self.beam_body) or \
-           (bodyB == self.bowling_ball_body and bodyA == self.beam_body):
-            self.ball_contact_bottom = False
-            
-    def get_contacts(self):
-        return self.domino_ball_contact, self.ball_contact_top, self.ball_contact_bottom
-            
-class Button:
-    def __init__(self, x, y, width, height, text, font, color, hover_color, text_color):
-        self.rect = pygame.Rect(x, y, width, height)
-        self.text = text
-        self.font = font
-        self.color = color
-        self.hover_color = hover_color
-        self.text_color = text_color
-        self.is_hovered = False
-
-    def draw(self, surface):
-        # Change color on hover
-        color = self.hover_color if self.is_hovered else self.color
-        pygame.draw.rect(surface, color, self.rect)
-        
-        # Render the text
-        text_surf = self.font.render(self.text, True, self.text_color)
-        text_rect = text_surf.get_rect(center=self.rect.center)
-        surface.blit(text_surf, text_rect)
-
-    def handle_event(self, event):
-        # Check if mouse is hovering over the button
-        self.is_hovered = self.rect.collidepoint(pygame.mouse.get_pos())
-        
-        # Check if button is clicked
-        if event.type == pygame.MOUSEBUTTONDOWN and self.is_hovered:
-            return True
-        return False
-    
-    
+import numpy as np
+
+from layout import BOWLING_BALL_RADIUS, START_X, layout
+
+
+def __getattr__(name):
+    # The pygame widgets and the Box2D contact listener used to live here;
+    # they are imported on first access so that headless users of the
+    # representations below load neither library
+    if name in ("Slider", "Button"):
+        import ui
+
+        return getattr(ui, name)
+    if name == "ContactListener":
+        from contacts import ContactListener
+
+        return ContactListener
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 class StructureRep:
-    def __init__(self, domino_bodies, ball_body):
+    def __init__(self, domino_bodies, ball_body, domino_width=0.2, domino_height=1.0):
         self.sorted_domino_positions = sorted([body.position[0] for body in domino_bodies])
-        self.domino_width = 0.2
-        self.domino_height = 1.0
+        self.domino_width = domino_width
+        self.domino_height = domino_height
         self.ball_position = ball_body.position[0]
         self.ball_radius = 0.5
-        self.ball_density = 0.5
\ No newline at end of file
+        self.ball_density = 0.5
+
+    @classmethod
+    def from_params(cls, domino_spacing=0.5, domino_width=0.2, domino_height=1.0, num_dominoes=20, small_gap=0.1,
+                    hole_size=0.1):
+        """Builds the representation of `world.get_world` with the same
+        parameters from geometry alone (see layout.py); the positions equal
+        those read from the Box2D bodies."""
+        dominoes, ball = layout(domino_spacing, domino_width, domino_height, num_dominoes, small_gap, hole_size)
+        rep = cls.__new__(cls)
+        rep.sorted_domino_positions = sorted(dominoes)
+        rep.domino_width = domino_width
+        rep.domino_height = domino_height
+        rep.ball_position = ball
+        rep.ball_radius = 0.5
+        rep.ball_density = 0.5
+        return rep
+
+    @classmethod
+    def from_scenario(cls, scenario):
+        """Builds the representation from a parsed Scenario. The ball is the
+        rightmost one, i.e. the one that has to reach the cup."""
+        rep = cls.__new__(cls)
+        rep.sorted_domino_positions = sorted(scenario.dominoes)
+        rep.domino_width = scenario.width
+        rep.domino_height = scenario.height
+        rep.ball_position = max(scenario.balls)
+        rep.ball_radius = 0.5
+        rep.ball_density = 0.5
+        return rep
+
+
+class StructureRepBatch:
+    """Many StructureReps in flat arrays. The sorted domino positions of all
+    scenarios are concatenated in `domino_positions`; those of scenario i are
+    `domino_positions[offsets[i]:offsets[i + 1]]`. The other fields hold one
+    value per scenario."""
+
+    def __init__(self, domino_positions, offsets, domino_width, domino_height, ball_position,
+                 ball_radius=0.5, ball_density=0.5):
+        self.domino_positions = np.asarray(domino_positions, dtype=np.float64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        n = len(self.offsets) - 1
+        self.domino_width = np.broadcast_to(np.asarray(domino_width, dtype=np.float64), (n,))
+        self.domino_height = np.broadcast_to(np.asarray(domino_height, dtype=np.float64), (n,))
+        self.ball_position = np.broadcast_to(np.asarray(ball_position, dtype=np.float64), (n,))
+        self.ball_radius = np.broadcast_to(np.asarray(ball_radius, dtype=np.float64), (n,))
+        self.ball_density = np.broadcast_to(np.asarray(ball_density, dtype=np.float64), (n,))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def counts(self):
+        return np.diff(self.offsets)
+
+    def segments(self):
+        """Index of the scenario each entry of `domino_positions` belongs to."""
+        return np.repeat(np.arange(len(self)), self.counts())
+
+    def __getitem__(self, i):
+        rep = StructureRep.__new__(StructureRep)
+        rep.sorted_domino_positions = self.domino_positions[self.offsets[i]:self.offsets[i + 1]].tolist()
+        rep.domino_width = float(self.domino_width[i])
+        rep.domino_height = float(self.domino_height[i])
+        rep.ball_position = float(self.ball_position[i])
+        rep.ball_radius = float(self.ball_radius[i])
+        rep.ball_density = float(self.ball_density[i])
+        return rep
+
+    @classmethod
+    def from_reps(cls, reps):
+        counts = [len(rep.sorted_domino_positions) for rep in reps]
+        positions = [x for rep in reps for x in rep.sorted_domino_positions]
+        return cls(
+            positions,
+            np.concatenate([[0], np.cumsum(counts, dtype=np.int64)]),
+            [rep.domino_width for rep in reps],
+            [rep.domino_height for rep in reps],
+            [rep.ball_position for rep in reps],
+            [rep.ball_radius for rep in reps],
+            [rep.ball_density for rep in reps],
+        )
+
+    @classmethod
+    def from_params(cls, values):
+        """Same fields as `StructureRep.from_params` for every row of `values`,
+        an (n, 6) array of `get_world` parameters, computed without a loop over
+        scenarios."""
+        values = np.asarray(values, dtype=np.float64).reshape(-1, 6)
+        domino_spacing, domino_width, domino_height, num_dominoes, small_gap, _ = values.T
+        counts = num_dominoes.astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        segments = np.repeat(np.arange(len(values)), counts)
+        index = np.arange(offsets[-1]) - offsets[:-1][segments]
+        step = domino_width + domino_spacing
+
+        # Same arithmetic as layout.py, then rounded like Box2D stores it
+        positions = START_X + index * step[segments]
+        last_domino_x = START_X + (counts - 1) * step
+        ball_position = last_domino_x + domino_width / 2 + BOWLING_BALL_RADIUS + small_gap
+        return cls(
+            positions.astype(np.float32).astype(np.float64),
+            offsets,
+            domino_width,
+            domino_height,
+            ball_position.astype(np.float32).astype(np.float64),
+        )
+
+    @classmethod
+    def from_scenarios(cls, scenarios):
+        """Same fields as `StructureRep.from_scenario` for every Scenario."""
+        scenarios = list(scenarios)
+        counts = np.array([len(scenario.dominoes) for scenario in scenarios], dtype=np.int64)
+        positions = np.concatenate(
+            [np.frombuffer(scenario.dominoes, dtype=np.float64) for scenario in scenarios]
+        ) if scenarios else np.zeros(0)
+        # Sort within each scenario: by scenario index first, then by position
+        segments = np.repeat(np.arange(len(scenarios)), counts)
+        positions = positions[np.lexsort((positions, segments))]
+        return cls(
+            positions,
+            np.concatenate([[0], np.cumsum(counts)]),
+            [scenario.width for scenario in scenarios],
+            [scenario.height for scenario in scenarios],
+            [max(scenario.balls) for scenario in scenarios],
+        )
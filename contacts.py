@@ -0,0 +1,145 @@
+import numpy as np
+from Box2D import b2ContactListener
+
+# Body roles. Every body the listener should know about carries
+# `userData = (role, index)`; see `tag_bodies`. Roles are numbered so that a
+# pair is stored with the smaller role first.
+DOMINO = 1
+LAST_DOMINO = 2
+BALL = 3
+PLATFORM = 4
+BEAM = 5
+
+# Role pairs that are logged, by pair code
+LAST_DOMINO_BALL = 1
+DOMINO_BALL = 2
+BALL_PLATFORM = 3
+BALL_BEAM = 4
+BALL_BALL = 5
+PAIR_NAMES = {
+    LAST_DOMINO_BALL: "last_domino-ball",
+    DOMINO_BALL: "domino-ball",
+    BALL_PLATFORM: "ball-platform",
+    BALL_BEAM: "ball-beam",
+    BALL_BALL: "ball-ball",
+}
+TRACKED_PAIRS = {
+    (LAST_DOMINO, BALL): LAST_DOMINO_BALL,
+    (DOMINO, BALL): DOMINO_BALL,
+    (BALL, PLATFORM): BALL_PLATFORM,
+    (BALL, BEAM): BALL_BEAM,
+    (BALL, BALL): BALL_BALL,
+}
+
+# One row per begin/end event of a tracked pair. `index_a` and `index_b` are the
+# indices of the two bodies within their roles, in pair order.
+EVENT_DTYPE = np.dtype([
+    ("step", np.int32),
+    ("pair", np.int8),
+    ("begin", np.bool_),
+    ("index_a", np.int16),
+    ("index_b", np.int16),
+])
+
+
+def domino_tag(index, num_dominoes):
+    return (LAST_DOMINO if index == num_dominoes - 1 else DOMINO, index)
+
+
+def tag_bodies(domino_bodies, ball_bodies, platform_bodies, beam_body):
+    """Stores the role tags the contact listener dispatches on. Dominoes that
+    are not created yet (None) are skipped; see `domino_tag`."""
+    for i, body in enumerate(domino_bodies):
+        if body is not None:
+            body.userData = domino_tag(i, len(domino_bodies))
+    for i, body in enumerate(ball_bodies):
+        body.userData = (BALL, i)
+    for i, body in enumerate(platform_bodies):
+        body.userData = (PLATFORM, i)
+    beam_body.userData = (BEAM, 0)
+
+
+def destroy_bodies(world, bodies):
+    """Destroys `bodies` (None entries are skipped). The tags are cleared
+    first: DestroyBody ends the body's contacts, and the listener must not
+    read a tag that is being freed."""
+    for body in bodies:
+        if body is not None:
+            body.userData = None
+            world.DestroyBody(body)
+
+
+# Contact listener to monitor contacts
+class ContactListener(b2ContactListener):
+    """Logs begin/end events of the tracked role pairs with the current `step`
+    (set by the simulation loop) in a preallocated structured array, and keeps
+    the three contact flags of the ball with index `flag_ball` (by default the
+    last ball created). Contacts between untagged bodies or untracked role
+    pairs are dropped after one dict lookup."""
+
+    def __init__(self, flag_ball=0, capacity=1024):
+        b2ContactListener.__init__(self)
+        self.events = np.zeros(capacity, dtype=EVENT_DTYPE)
+        self.reset(flag_ball)
+
+    def reset(self, flag_ball=None):
+        """Clears the flags and the log, e.g. after the world was reset."""
+        if flag_ball is not None:
+            self.flag_ball = flag_ball
+        self.step = 0
+        self.num_events = 0
+
+        # Contact status variables
+        self.domino_ball_contact = False
+        self.ball_contact_top = False
+        self.ball_contact_bottom = False
+
+    def _record(self, contact, begin):
+        a = contact.fixtureA.body.userData
+        b = contact.fixtureB.body.userData
+        if type(a) is not tuple or type(b) is not tuple:
+            return
+        if a[0] > b[0]:
+            a, b = b, a
+        pair = TRACKED_PAIRS.get((a[0], b[0]))
+        if pair is None:
+            return
+
+        if self.num_events == len(self.events):
+            self.events = np.resize(self.events, 2 * len(self.events))
+        self.events[self.num_events] = (self.step, pair, begin, a[1], b[1])
+        self.num_events += 1
+
+        if pair == LAST_DOMINO_BALL:
+            if b[1] == self.flag_ball:
+                self.domino_ball_contact = begin
+        elif pair == BALL_PLATFORM:
+            if a[1] == self.flag_ball and b[1] == 0:
+                self.ball_contact_top = begin
+        elif pair == BALL_BEAM:
+            if a[1] == self.flag_ball:
+                self.ball_contact_bottom = begin
+
+    def BeginContact(self, contact):
+        self._record(contact, True)
+
+    def EndContact(self, contact):
+        self._record(contact, False)
+
+    def get_contacts(self):
+        return self.domino_ball_contact, self.ball_contact_top, self.ball_contact_bottom
+
+    def history(self, pair=None, begin=None):
+        """Returns the logged events (a view when unfiltered), optionally only
+        those of one pair code and/or only begin (True) or end (False) events."""
+        events = self.events[:self.num_events]
+        if pair is not None:
+            events = events[events["pair"] == pair]
+        if begin is not None:
+            events = events[events["begin"] == begin]
+        return events
+
+    def first_step(self, pair, begin=True):
+        """Step of the first begin (or end) event of `pair`, or None."""
+        steps = self.history(pair, begin)["step"]
+        return int(steps[0]) if len(steps) else None
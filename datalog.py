@@ -0,0 +1,934 @@
+#!/usr/bin/env python3
+"""Bottom-up evaluation of `dominos.pl`-style rule files.
+
+A rule file is parsed as Prolog, and the rules reachable from an entry
+predicate (by default `will_cup`) are compiled once into a `Program`. The
+program can then be evaluated against any number of fact sets, e.g. one per
+scenario. Evaluation is semi-naive, stratum by stratum. Supported body goals:
+  - positive literals, `\\+ Literal` and `once(Goal)` (same as Goal here);
+  - arithmetic comparisons (`<`, `>`, `=<`, `>=`, `=:=`, `=\\=`), `is` and `=`;
+  - `aggregate(max(X) | min(X) | sum(X) | count, Goal, Result)`, with the
+    variables of Goal that are not bound before the aggregate treated as
+    existential;
+  - `atom_concat/3` with the first two arguments bound, and `shell/2`, which
+    calls a Python callback with the command instead of starting a process.
+
+Rules written for top-down execution may leave head variables to the caller,
+as in `will_be_tipped(domino(D)) :- ball_x(B), B < D, ...`. A head variable
+that the body never binds is bound from the facts of the same shape: for
+`domino(D)` the literal `domino(D)` is added to the body, before the first
+goal that mentions D.
+
+Facts are stored in relations with hash indexes on the bound arguments and
+sorted indexes for range joins: a literal that introduces one numeric
+variable followed by comparisons such as `X1 < X, X - X1 =< H` only visits
+the facts within the implied bounds. Bounds are widened slightly and the
+comparisons are still evaluated exactly, so the result is the same as a scan.
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+from bisect import bisect_left, bisect_right
+
+from scenario import load_scenarios
+
+
+class Var:
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __eq__(self, other):
+        return isinstance(other, Var) and other.name == self.name
+
+    def __hash__(self):
+        return hash(("Var", self.name))
+
+    def __repr__(self):
+        return self.name
+
+
+class Struct:
+    __slots__ = ("name", "args")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = tuple(args)
+
+    def __eq__(self, other):
+        return isinstance(other, Struct) and (other.name, other.args) == (self.name, self.args)
+
+    def __hash__(self):
+        return hash((self.name, self.args))
+
+    def __repr__(self):
+        return f"{self.name}({', '.join(map(repr, self.args))})"
+
+
+# Parsing
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<skip>\s+|%[^\n]*|/\*.*?\*/)
+    |(?P<number>\d+\.\d+(?:[eE][-+]?\d+)?|\d+)
+    |(?P<var>[A-Z_][A-Za-z0-9_]*)
+    |(?P<atom>[a-z][A-Za-z0-9_]*)
+    |(?P<quoted>'(?:[^'\\]|\\.|'')*')
+    |(?P<punct>[(),\[\]|;!])
+    |(?P<symbol>[-+*/\\^<>=~:.?@#&$]+)
+    """,
+    re.X | re.S,
+)
+
+_INFIX = {
+    ":-": (1200, "xfx"),
+    ";": (1100, "xfy"),
+    "|": (1100, "xfy"),
+    "->": (1050, "xfy"),
+    ",": (1000, "xfy"),
+    "=": (700, "xfx"),
+    "\\=": (700, "xfx"),
+    "==": (700, "xfx"),
+    "\\==": (700, "xfx"),
+    "<": (700, "xfx"),
+    ">": (700, "xfx"),
+    "=<": (700, "xfx"),
+    ">=": (700, "xfx"),
+    "=:=": (700, "xfx"),
+    "=\\=": (700, "xfx"),
+    "is": (700, "xfx"),
+    "+": (500, "yfx"),
+    "-": (500, "yfx"),
+    "*": (400, "yfx"),
+    "/": (400, "yfx"),
+    "//": (400, "yfx"),
+    "mod": (400, "yfx"),
+    "**": (200, "xfx"),
+    "^": (200, "xfy"),
+}
+_PREFIX = {
+    ":-": (1200, "fx"),
+    "dynamic": (1150, "fx"),
+    "\\+": (900, "fy"),
+    "-": (200, "fy"),
+    "+": (200, "fy"),
+}
+
+
+class _Parser:
+    def __init__(self, text):
+        self.tokens = []
+        pos = 0
+        while pos < len(text):
+            match = _TOKEN_RE.match(text, pos)
+            if match is None:
+                raise SyntaxError(f"Unexpected character {text[pos]!r} at offset {pos}")
+            kind = match.lastgroup
+            if kind != "skip":
+                value = match.group()
+                if kind == "symbol" and value == "." and (match.end() == len(text) or text[match.end()] in " \t\r\n%"):
+                    kind = "end"
+                elif kind == "quoted":
+                    kind, value = "atom", value[1:-1].replace("''", "'").replace("\\\\", "\\")
+                elif kind == "symbol":
+                    kind = "atom"
+                self.tokens.append((kind, value, match.start(), match.end()))
+            pos = match.end()
+        self.index = 0
+        self.anonymous = 0
+
+    def peek(self):
+        return self.tokens[self.index] if self.index < len(self.tokens) else ("eof", None, -1, -1)
+
+    def next(self):
+        token = self.peek()
+        self.index += 1
+        return token
+
+    def expect(self, value):
+        token = self.next()
+        if token[1] != value:
+            raise SyntaxError(f"Expected {value!r}, got {token[1]!r}")
+
+    def clauses(self):
+        while self.peek()[0] != "eof":
+            term = self.parse(1200)
+            if self.next()[0] != "end":
+                raise SyntaxError(f"Expected end of clause after {term!r}")
+            yield term
+
+    def _starts_term(self, token):
+        kind, value = token[0], token[1]
+        return kind in ("number", "var", "atom") or value in ("(", "[")
+
+    def primary(self, max_prec):
+        kind, value, start, end = self.next()
+        if kind == "number":
+            return (float(value) if "." in value else int(value)), 0
+        if kind == "var":
+            if value == "_":
+                self.anonymous += 1
+                value = f"_G{self.anonymous}"
+            return Var(value), 0
+        if value == "(":
+            term = self.parse(1200)
+            self.expect(")")
+            return term, 0
+        if value == "[":
+            self.expect("]")
+            return "[]", 0
+        if kind != "atom":
+            raise SyntaxError(f"Unexpected token {value!r}")
+
+        following = self.peek()
+        if following[1] == "(" and following[2] == end:
+            self.next()
+            args = [self.parse(999)]
+            while self.peek()[1] == ",":
+                self.next()
+                args.append(self.parse(999))
+            self.expect(")")
+            return Struct(value, args), 0
+        if value in _PREFIX and self._starts_term(following) and following[1] not in _INFIX.keys() - {"-", "+"}:
+            prec, kind = _PREFIX[value]
+            if prec > max_prec:
+                return value, 0
+            arg = self.parse(prec if kind == "fy" else prec - 1)
+            if value == "-" and isinstance(arg, (int, float)):
+                return -arg, 0
+            return Struct(value, [arg]), prec
+        return value, 0
+
+    def parse(self, max_prec):
+        left, left_prec = self.primary(max_prec)
+        while True:
+            token = self.peek()
+            op = token[1]
+            if token[0] not in ("atom", "punct") or op not in _INFIX:
+                return left
+            prec, kind = _INFIX[op]
+            left_max = prec if kind == "yfx" else prec - 1
+            right_max = prec if kind == "xfy" else prec - 1
+            if prec > max_prec or left_prec > left_max:
+                return left
+            self.next()
+            right = self.parse(right_max)
+            left, left_prec = Struct(op, [left, right]), prec
+
+
+def parse_clauses(text):
+    """Parses Prolog text into a list of terms, one per clause."""
+    return list(_Parser(text).clauses())
+
+
+def parse_facts(text):
+    """Parses ground facts (e.g. `tip_cache.pl`) into `{(name, arity): set of tuples}`."""
+    facts = {}
+    for clause in parse_clauses(text):
+        if isinstance(clause, Struct) and clause.name == ":-":
+            continue
+        name, args = (clause.name, clause.args) if isinstance(clause, Struct) else (clause, ())
+        facts.setdefault((name, len(args)), set()).add(tuple(_ground(arg, {}) for arg in args))
+    return facts
+
+
+def scenario_facts(scenario):
+    """The facts `Scenario.to_prolog` would write, as `{(name, arity): set of tuples}`."""
+    return {
+        ("width", 1): {(scenario.width,)},
+        ("height", 1): {(scenario.height,)},
+        ("push", 1): {(("domino", scenario.push),)},
+        ("domino", 1): {(x,) for x in scenario.dominoes},
+        ("ball_x", 1): {(x,) for x in scenario.balls},
+    }
+
+
+# Terms and values. Ground values are numbers, atoms (str) and compound terms
+# as tuples `(name, arg, ...)`.
+
+def _vars(term, out=None):
+    out = set() if out is None else out
+    if isinstance(term, Var):
+        out.add(term.name)
+    elif isinstance(term, Struct):
+        for arg in term.args:
+            _vars(arg, out)
+    return out
+
+
+def _ground(term, env):
+    if isinstance(term, Var):
+        return env[term.name]
+    if isinstance(term, Struct):
+        return (term.name,) + tuple(_ground(arg, env) for arg in term.args)
+    return term
+
+
+def _bind(pattern, value, env):
+    """Matches `pattern` against a ground value, binding into `env` in place."""
+    if isinstance(pattern, Var):
+        bound = env.get(pattern.name, _bind)
+        if bound is _bind:
+            env[pattern.name] = value
+            return True
+        return bound == value
+    if isinstance(pattern, Struct):
+        if not (isinstance(value, tuple) and len(value) == len(pattern.args) + 1 and value[0] == pattern.name):
+            return False
+        return all(_bind(p, v, env) for p, v in zip(pattern.args, value[1:]))
+    return pattern == value
+
+
+def _eval(expr, env):
+    if isinstance(expr, Var):
+        return env[expr.name]
+    if isinstance(expr, (int, float)):
+        return expr
+    if isinstance(expr, Struct):
+        args = [_eval(arg, env) for arg in expr.args]
+        if len(args) == 2:
+            a, b = args
+            if expr.name == "+":
+                return a + b
+            if expr.name == "-":
+                return a - b
+            if expr.name == "*":
+                return a * b
+            if expr.name == "/":
+                return a // b if isinstance(a, int) and isinstance(b, int) and a % b == 0 else a / b
+            if expr.name == "//":
+                return int(a / b)
+            if expr.name == "mod":
+                return a % b
+            if expr.name in ("**", "^"):
+                return a ** b
+            if expr.name == "max":
+                return max(a, b)
+            if expr.name == "min":
+                return min(a, b)
+        elif len(args) == 1:
+            if expr.name == "-":
+                return -args[0]
+            if expr.name == "+":
+                return args[0]
+            if expr.name == "abs":
+                return abs(args[0])
+    raise TypeError(f"Cannot evaluate {expr!r}")
+
+
+_COMPARE = {
+    "<": lambda a, b: a < b,
+    ">": lambda a, b: a > b,
+    "=<": lambda a, b: a <= b,
+    ">=": lambda a, b: a >= b,
+    "=:=": lambda a, b: a == b,
+    "=\\=": lambda a, b: a != b,
+}
+_FLIP = {"<": ">", ">": "<", "=<": ">=", ">=": "=<", "=:=": "=:=", "=\\=": "=\\="}
+
+
+def _atom_text(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return repr(value)
+    raise TypeError(f"atom_concat/3 expects atomic arguments, got {value!r}")
+
+
+# Storage
+
+class Relation:
+    """A set of tuples with hash indexes on argument positions and sorted
+    indexes on numeric paths, both built on first use and kept up to date."""
+
+    def __init__(self, tuples=()):
+        self.tuples = set()
+        self._hash = {}
+        self._sorted = {}
+        for row in tuples:
+            self.add(row)
+
+    def __len__(self):
+        return len(self.tuples)
+
+    def add(self, row):
+        if row in self.tuples:
+            return False
+        self.tuples.add(row)
+        for positions, index in self._hash.items():
+            index.setdefault(tuple(row[p] for p in positions), []).append(row)
+        for path, (keys, rows) in self._sorted.items():
+            key = _at_path(row, path)
+            if key is not None:
+                i = bisect_right(keys, key)
+                keys.insert(i, key)
+                rows.insert(i, row)
+        return True
+
+    def lookup(self, positions, key):
+        index = self._hash.get(positions)
+        if index is None:
+            index = self._hash[positions] = {}
+            for row in self.tuples:
+                index.setdefault(tuple(row[p] for p in positions), []).append(row)
+        return index.get(key, ())
+
+    def range(self, path, low, high):
+        index = self._sorted.get(path)
+        if index is None:
+            pairs = sorted(
+                ((key, row) for row in self.tuples for key in [_at_path(row, path)] if key is not None),
+                key=lambda pair: pair[0],
+            )
+            index = self._sorted[path] = ([key for key, _ in pairs], [row for _, row in pairs])
+        keys, rows = index
+        start = 0 if low is None else bisect_left(keys, low)
+        stop = len(keys) if high is None else bisect_right(keys, high)
+        return rows[start:stop]
+
+
+_EMPTY = Relation()
+
+
+def _at_path(row, path):
+    value = row[path[0]]
+    for name, arity, i in path[1:]:
+        if not (isinstance(value, tuple) and len(value) == arity + 1 and value[0] == name):
+            return None
+        value = value[i + 1]
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return value
+
+
+def _find_path(args, name):
+    """Path to the single occurrence of variable `name` in literal arguments."""
+    found = []
+
+    def visit(term, path):
+        if isinstance(term, Var) and term.name == name:
+            found.append(path)
+        elif isinstance(term, Struct):
+            for i, arg in enumerate(term.args):
+                visit(arg, path + ((term.name, len(term.args), i),))
+
+    for i, arg in enumerate(args):
+        visit(arg, (i,))
+    return found[0] if len(found) == 1 else None
+
+
+def _range_bounds(goal, name):
+    """Turns a comparison involving variable `name` linearly into
+    `(side, expr)` with side 'low' or 'high', or None."""
+    op, left, right = goal.name, goal.args[0], goal.args[1]
+    if op not in ("<", ">", "=<", ">=", "=:="):
+        return None
+    if name in _vars(right) and name not in _vars(left):
+        op, left, right = _FLIP[op], right, left
+    if name in _vars(right):
+        return None
+    target = Var(name)
+    if left == target:
+        bound = right
+        sign = 1
+    elif isinstance(left, Struct) and left.name in ("+", "-") and len(left.args) == 2:
+        a, b = left.args
+        if a == target and name not in _vars(b):
+            # V + E op C  ->  V op C - E;  V - E op C  ->  V op C + E
+            bound = Struct("-" if left.name == "+" else "+", [right, b])
+            sign = 1
+        elif b == target and name not in _vars(a):
+            if left.name == "+":
+                bound, sign = Struct("-", [right, a]), 1
+            else:
+                # E - V op C  ->  V flipped-op E - C
+                bound, sign = Struct("-", [a, right]), -1
+        else:
+            return None
+    else:
+        return None
+    if sign < 0:
+        op = _FLIP[op]
+    if op == "=:=":
+        return [("low", bound), ("high", bound)]
+    return [("high" if op in ("<", "=<") else "low", bound)]
+
+
+# Compilation
+
+class _Literal:
+    __slots__ = ("pred", "args", "positions", "range_path", "range_bounds")
+
+    def __init__(self, pred, args, positions):
+        self.pred = pred
+        self.args = args
+        self.positions = positions
+        self.range_path = None
+        self.range_bounds = []
+
+
+def _goal_key(goal):
+    if isinstance(goal, Struct):
+        return goal.name, len(goal.args)
+    return goal, 0
+
+
+def _flatten(body):
+    if isinstance(body, Struct) and body.name == ",":
+        return _flatten(body.args[0]) + _flatten(body.args[1])
+    if isinstance(body, Struct) and body.name == "once" and len(body.args) == 1:
+        return _flatten(body.args[0])
+    return [body]
+
+
+_BUILTINS = {"<", ">", "=<", ">=", "=:=", "=\\=", "is", "=", "\\+", "aggregate", "atom_concat", "shell", "true"}
+
+
+def _is_builtin(goal):
+    name, arity = _goal_key(goal)
+    return (name in _BUILTINS and (name == "true" or arity > 0)) or name in (";", "->")
+
+
+def _body_preds(goals):
+    """Yields `(pred, strict)` for the predicates a body depends on."""
+    for goal in goals:
+        name, arity = _goal_key(goal)
+        if name == "\\+" and arity == 1:
+            for pred, _ in _body_preds(_flatten(goal.args[0])):
+                yield pred, True
+        elif name == "aggregate" and arity == 3:
+            for pred, _ in _body_preds(_flatten(goal.args[1])):
+                yield pred, True
+        elif not _is_builtin(goal):
+            yield (name, arity), False
+
+
+class Program:
+    """The rules of a Prolog file reachable from `entry`, compiled for
+    bottom-up evaluation.
+
+    `shell(command)` replaces `shell/2` and returns the exit status; results
+    are cached per command for the lifetime of the program. Defaults to
+    `tip_shell()`. Ground facts in the rule text and `base_facts` are part of
+    every evaluation."""
+
+    def __init__(self, text, entry="will_cup", shell=None, base_facts=None):
+        self.entry = _goal_key(parse_clauses(entry + ".")[0]) if isinstance(entry, str) else entry
+        self.shell = shell or tip_shell()
+        self._shell_results = {}
+
+        rules, facts, dynamic = {}, {}, set()
+        for clause in parse_clauses(text):
+            if isinstance(clause, Struct) and clause.name == ":-" and len(clause.args) == 1:
+                directive = clause.args[0]
+                if isinstance(directive, Struct) and directive.name == "dynamic":
+                    for spec in _flatten(directive.args[0]):
+                        dynamic.add((spec.args[0], spec.args[1]))
+                continue
+            if isinstance(clause, Struct) and clause.name == ":-":
+                head, body = clause.args
+                rules.setdefault(_goal_key(head), []).append((head, _flatten(body)))
+            else:
+                name, arity = _goal_key(clause)
+                args = clause.args if isinstance(clause, Struct) else ()
+                facts.setdefault((name, arity), set()).add(tuple(_ground(arg, {}) for arg in args))
+        for pred, rows in (base_facts or {}).items():
+            facts.setdefault(pred, set()).update(rows)
+        self.base_facts = facts
+
+        # Only the rules the entry depends on are compiled
+        reachable, stack = set(), [self.entry]
+        while stack:
+            pred = stack.pop()
+            if pred in reachable:
+                continue
+            reachable.add(pred)
+            for _, body in rules.get(pred, []):
+                stack.extend(dep for dep, _ in _body_preds(body))
+        self.idb = {pred for pred in reachable if pred in rules}
+        self.edb = (reachable - self.idb) | dynamic
+
+        self.strata = []
+        for component in self._components(rules):
+            compiled = []
+            for pred in component:
+                for head, body in rules[pred]:
+                    compiled.append(self._compile_rule(head, body, component))
+            self.strata.append((component, compiled))
+
+    def _components(self, rules):
+        """Strongly connected components of the IDB dependency graph,
+        dependencies first; raises if negation or aggregation is recursive."""
+        edges = {pred: {} for pred in self.idb}
+        for pred in self.idb:
+            for _, body in rules[pred]:
+                for dep, strict in _body_preds(body):
+                    if dep in self.idb:
+                        edges[pred][dep] = edges[pred].get(dep, False) or strict
+
+        index, low, on_stack, stack, components = {}, {}, set(), [], []
+
+        def connect(pred):
+            index[pred] = low[pred] = len(index)
+            stack.append(pred)
+            on_stack.add(pred)
+            for dep in edges[pred]:
+                if dep not in index:
+                    connect(dep)
+                    low[pred] = min(low[pred], low[dep])
+                elif dep in on_stack:
+                    low[pred] = min(low[pred], index[dep])
+            if low[pred] == index[pred]:
+                component = set()
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.add(member)
+                    if member == pred:
+                        break
+                for member in component:
+                    for dep, strict in edges[member].items():
+                        if strict and dep in component:
+                            raise ValueError(f"{member[0]}/{member[1]} depends on {dep[0]}/{dep[1]} "
+                                             "through negation or aggregation within a cycle")
+                components.append(component)
+
+        for pred in sorted(self.idb):
+            if pred not in index:
+                connect(pred)
+        return components
+
+    def _compile_rule(self, head, body, component):
+        goals = [goal for goal in body if goal != "true"]
+        for goal in goals:
+            if _goal_key(goal)[0] in (";", "->"):
+                raise NotImplementedError(f"Disjunction and if-then-else are not supported: {goal!r}")
+
+        # Head variables the body never binds are bound from facts of the
+        # same shape, e.g. `domino(D)` for `will_be_tipped(domino(D))`. The
+        # domain literal goes right before the first goal that uses it, so the
+        # comparisons on it can restrict it to a range
+        head_args = head.args if isinstance(head, Struct) else ()
+        unbound = _vars(head) - self._binds(goals)
+        for arg in head_args:
+            if isinstance(arg, Struct) and _vars(arg) & unbound and (arg.name, len(arg.args)) in self.edb:
+                unbound -= _vars(arg)
+                uses = [i for i, goal in enumerate(goals) if _vars(goal) & _vars(arg)]
+                goals.insert(uses[0] if uses else len(goals), arg)
+        if unbound:
+            raise ValueError(f"Unsafe variables {sorted(unbound)} in rule for {_goal_key(head)}")
+
+        # For the semi-naive rounds, one plan per recursive literal that starts
+        # from that literal, so that only the new facts drive the join
+        delta_plans = []
+        for i, goal in enumerate(goals):
+            if not _is_builtin(goal) and _goal_key(goal) in component:
+                delta_plans.append(self._plan([goal] + goals[:i] + goals[i + 1:], set(), _vars(head)))
+        return head, self._plan(goals, set(), _vars(head)), delta_plans
+
+    def _binds(self, goals):
+        bound = set()
+        for goal in goals:
+            name, arity = _goal_key(goal)
+            if name in ("is", "=") and arity == 2:
+                bound |= _vars(goal)
+            elif name == "aggregate" and arity == 3:
+                bound |= _vars(goal.args[2])
+            elif name == "atom_concat" and arity == 3:
+                bound |= _vars(goal.args[2])
+            elif name in ("shell",) and arity == 2:
+                bound |= _vars(goal.args[1])
+            elif not _is_builtin(goal):
+                bound |= _vars(goal)
+        return bound
+
+    def _plan(self, goals, bound, outer):
+        """Orders `goals` into steps: literals in written order, every other
+        goal as soon as the variables it reads are bound. `outer` holds the
+        variables used outside `goals` (the head, or the enclosing rule)."""
+        bound = set(bound)
+        plan, pending, introduced = [], [], []
+
+        def used_elsewhere(goal):
+            names = set(outer)
+            for other in goals:
+                if other is not goal:
+                    _vars(other, names)
+            return names
+
+        def ready(goal):
+            name, arity = _goal_key(goal)
+            if name in _COMPARE or name == "is":
+                return _vars(goal.args[1] if name == "is" else goal) <= bound
+            if name == "=":
+                return _vars(goal.args[0]) <= bound or _vars(goal.args[1]) <= bound
+            if name == "\\+":
+                return _vars(goal) & used_elsewhere(goal) <= bound
+            if name == "aggregate":
+                inner = _vars(goal.args[1]) - _vars(goal.args[0])
+                return inner & used_elsewhere(goal) <= bound
+            if name == "atom_concat":
+                return _vars(goal.args[0]) | _vars(goal.args[1]) <= bound
+            if name == "shell":
+                return _vars(goal.args[0]) <= bound
+            return True
+
+        def flush():
+            progress = True
+            while progress:
+                progress = False
+                for goal in list(pending):
+                    if ready(goal):
+                        pending.remove(goal)
+                        plan.append(self._builtin(goal, bound, used_elsewhere(goal)))
+                        bound.update(self._binds([goal]))
+                        progress = True
+
+        for goal in goals:
+            if not _is_builtin(goal):
+                args = goal.args if isinstance(goal, Struct) else ()
+                positions = tuple(i for i, arg in enumerate(args) if _vars(arg) <= bound)
+                literal = _Literal(_goal_key(goal), args, positions)
+                new = _vars(goal) - bound
+                introduced.append((literal, new, set(bound)))
+                plan.append(literal)
+                bound |= new
+                flush()
+            else:
+                pending.append(goal)
+                flush()
+        if pending:
+            raise ValueError(f"Cannot order goals {pending!r}: their variables are never bound")
+
+        # A literal that introduces a single variable and is directly followed
+        # by comparisons bounding it only visits facts within those bounds
+        for literal, new, before in introduced:
+            if len(new) != 1:
+                continue
+            (name,) = new
+            path = _find_path(literal.args, name)
+            if path is None:
+                continue
+            for step in plan[plan.index(literal) + 1:]:
+                if isinstance(step, _Literal):
+                    break
+                if step[0] == "cmp" and name in _vars(step[1]):
+                    bounds = _range_bounds(step[1], name)
+                    if bounds and all(_vars(expr) <= before for _, expr in bounds):
+                        literal.range_path = path
+                        literal.range_bounds.extend(bounds)
+        return plan
+
+    def _builtin(self, goal, bound, outer):
+        name = _goal_key(goal)[0]
+        if name in _COMPARE:
+            return ("cmp", goal)
+        if name == "is":
+            return ("is", goal.args[0], goal.args[1])
+        if name == "=":
+            return ("unify", goal.args[0], goal.args[1])
+        if name == "\\+":
+            inner = _flatten(goal.args[0])
+            return ("not", self._plan(inner, bound, outer))
+        if name == "aggregate":
+            spec, inner, result = goal.args
+            op, template = (spec, None) if spec == "count" else (spec.name, spec.args[0])
+            if op not in ("count", "max", "min", "sum"):
+                raise NotImplementedError(f"Unsupported aggregate {spec!r}")
+            return ("aggregate", op, template, self._plan(_flatten(inner), bound, outer | _vars(result)), result)
+        if name == "atom_concat":
+            return ("atom_concat",) + goal.args
+        if name == "shell":
+            return ("shell",) + goal.args
+        raise NotImplementedError(f"Unsupported goal {goal!r}")
+
+    # Evaluation
+
+    def _run_shell(self, command):
+        status = self._shell_results.get(command)
+        if status is None:
+            status = self._shell_results[command] = int(self.shell(command))
+        return status
+
+    def _solve(self, plan, i, env, db, delta):
+        if i == len(plan):
+            yield env
+            return
+        step = plan[i]
+        if isinstance(step, _Literal):
+            use_delta = delta is not None and step is delta[0]
+            relation = delta[1] if use_delta else db.get(step.pred, _EMPTY)
+            if step.range_path is not None and not use_delta:
+                low = high = None
+                for side, expr in step.range_bounds:
+                    value = _eval(expr, env)
+                    value += (1e-9 * max(1.0, abs(value))) * (1 if side == "high" else -1)
+                    if side == "low":
+                        low = value if low is None else max(low, value)
+                    else:
+                        high = value if high is None else min(high, value)
+                rows = relation.range(step.range_path, low, high)
+            elif step.positions:
+                rows = relation.lookup(step.positions, tuple(_ground(step.args[p], env) for p in step.positions))
+            else:
+                rows = relation.tuples
+            arity = len(step.args)
+            for row in rows:
+                if len(row) != arity:
+                    continue
+                new_env = dict(env)
+                if all(_bind(p, v, new_env) for p, v in zip(step.args, row)):
+                    yield from self._solve(plan, i + 1, new_env, db, delta)
+            return
+
+        kind = step[0]
+        if kind == "cmp":
+            goal = step[1]
+            if _COMPARE[goal.name](_eval(goal.args[0], env), _eval(goal.args[1], env)):
+                yield from self._solve(plan, i + 1, env, db, delta)
+        elif kind == "is":
+            new_env = dict(env)
+            if _bind(step[1], _eval(step[2], env), new_env):
+                yield from self._solve(plan, i + 1, new_env, db, delta)
+        elif kind == "unify":
+            left, right = step[1], step[2]
+            pattern, term = (left, right) if _vars(right) <= env.keys() else (right, left)
+            new_env = dict(env)
+            if _bind(pattern, _ground(term, env), new_env):
+                yield from self._solve(plan, i + 1, new_env, db, delta)
+        elif kind == "not":
+            if next(self._solve(step[1], 0, env, db, None), None) is None:
+                yield from self._solve(plan, i + 1, env, db, delta)
+        elif kind == "aggregate":
+            _, op, template, inner, result = step
+            solutions = list(self._solve(inner, 0, env, db, None))
+            if not solutions:
+                return
+            if op == "count":
+                value = len(solutions)
+            else:
+                values = [_eval(template, solution) for solution in solutions]
+                value = max(values) if op == "max" else min(values) if op == "min" else sum(values)
+            new_env = dict(env)
+            if _bind(result, value, new_env):
+                yield from self._solve(plan, i + 1, new_env, db, delta)
+        elif kind == "atom_concat":
+            new_env = dict(env)
+            text = _atom_text(_ground(step[1], env)) + _atom_text(_ground(step[2], env))
+            if _bind(step[3], text, new_env):
+                yield from self._solve(plan, i + 1, new_env, db, delta)
+        elif kind == "shell":
+            new_env = dict(env)
+            if _bind(step[2], self._run_shell(_atom_text(_ground(step[1], env))), new_env):
+                yield from self._solve(plan, i + 1, new_env, db, delta)
+
+    def _derive(self, head, plan, db, delta, derived):
+        for env in self._solve(plan, 0, {}, db, delta):
+            row = tuple(_ground(arg, env) for arg in head.args) if isinstance(head, Struct) else ()
+            if row not in db[_goal_key(head)].tuples:
+                derived.setdefault(_goal_key(head), set()).add(row)
+
+    def evaluate(self, facts=None):
+        """Evaluates the program over the base facts plus `facts` and returns
+        the database, `{(name, arity): Relation}`."""
+        db = {}
+        for source in (self.base_facts, facts or {}):
+            for pred, rows in source.items():
+                relation = db.setdefault(pred, Relation())
+                for row in rows:
+                    relation.add(row)
+
+        for component, rules in self.strata:
+            for pred in component:
+                db.setdefault(pred, Relation())
+
+            # First round over the full relations, then semi-naive rounds in
+            # which one recursive literal at a time reads only the new facts
+            derived = {}
+            for head, plan, _ in rules:
+                self._derive(head, plan, db, None, derived)
+            while derived:
+                delta = {}
+                for pred, rows in derived.items():
+                    delta[pred] = Relation(row for row in rows if db[pred].add(row))
+                derived = {}
+                for head, _, delta_plans in rules:
+                    for plan in delta_plans:
+                        first = plan[0]
+                        if len(delta.get(first.pred, _EMPTY)):
+                            self._derive(head, plan, db, (first, delta[first.pred]), derived)
+        return db
+
+    def holds(self, facts=None):
+        """Whether the entry predicate (arity 0) is derived."""
+        return () in self.evaluate(facts).get(self.entry, _EMPTY).tuples
+
+    def evaluate_batch(self, fact_sets):
+        """`holds` for every fact set, e.g. `map(scenario_facts, scenarios)`."""
+        return [self.holds(facts) for facts in fact_sets]
+
+
+_WILL_TIP_RE = re.compile(r"will-tip\.py\s+(\S+)\s+(\S+)\s*$")
+
+
+def tip_shell(oracle=None):
+    """A `shell/2` callback that answers `... will-tip.py W H` in-process with
+    `oracle(width, height)` (default `tipping.will_tip`) and runs any other
+    command in a shell."""
+
+    def shell(command):
+        match = _WILL_TIP_RE.search(command)
+        if match is None:
+            return subprocess.call(command, shell=True)
+        will_tip = oracle
+        if will_tip is None:
+            import tipping
+
+            will_tip = tipping.will_tip
+        return 0 if will_tip(float(match.group(1)), float(match.group(2))) else 1
+
+    return shell
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a rule file bottom-up against scenarios.")
+    parser.add_argument("scenarios", help="scenario file, shard, or directory")
+    parser.add_argument("--rules", default="dominos.pl", help="rule file (default: dominos.pl)")
+    parser.add_argument("--entry", default="will_cup", help="entry predicate of arity 0")
+    parser.add_argument("--check", action="store_true", help="compare against chain.py and report disagreements")
+    args = parser.parse_args()
+
+    with open(args.rules) as f:
+        text = f.read()
+    # What the consult directive in dominos.pl loads, re-exported first if it
+    # was written under other simulation settings
+    import tip_oracle
+
+    tip_oracle.ensure_prolog_export()
+    with open(tip_oracle.PROLOG_CACHE_PATH) as f:
+        base_facts = parse_facts(f.read())
+    program = Program(text, args.entry, base_facts=base_facts)
+
+    scenarios = load_scenarios(args.scenarios)
+    results = program.evaluate_batch(scenario_facts(scenario) for scenario in scenarios)
+    mismatches = 0
+    for scenario, result in zip(scenarios, results):
+        if args.check:
+            import chain
+
+            expected = chain.will_cup(scenario)
+            if expected != result:
+                mismatches += 1
+                print(f"{scenario.name}: datalog={int(result)} chain={int(expected)}")
+        else:
+            print(scenario.name, 1 if result else 0)
+    if args.check:
+        print(f"{len(scenarios) - mismatches}/{len(scenarios)} scenarios agree")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,20 @@
 :- initialization(main, main).
 
+% Cached tipping answers exported by tip_oracle.py, if present.
+:- dynamic tip_cache/3.
+:- working_directory(Dir, Dir),
+   atom_concat(Dir, 'tip_cache.pl', TipCache),
+   ( exists_file(TipCache) -> consult(TipCache) ; true ).
+
+will_tip(domino(X)) :-
+    push(domino(X)),
+    width(W), height(H),
+    tip_cache(W, H, 1).
+
 will_tip(domino(X)) :-
     push(domino(X)),
     width(W), height(H),
+    \+ tip_cache(W, H, _),
     atom_concat('python3.11 will-tip.py ', W, Command1),
     atom_concat(Command1, ' ', Command2),
     atom_concat(Command2, H, Command),
@@ -1,120 +1,66 @@
+import math
 import sys
+import time
+from collections import namedtuple
 from Box2D import (
     b2World,
     b2PolygonShape,
     b2CircleShape,
     b2_dynamicBody,
     b2_staticBody,
-    b2ContactListener,
     b2RevoluteJointDef,
 )
-import imageio
-import re
 
-use_pygame = False
-
-if use_pygame:
-    import pygame
+import scenario as scenario_lib
+import solver
+from contacts import ContactListener, destroy_bodies, domino_tag, tag_bodies
+from trajectory import TrajectoryRecorder
+from wavefront import LAZY_MODES, Wavefront
 
-# # Initialize Pygame
-if use_pygame:
-    pygame.init()
+use_pygame = False
 
 # Screen dimensions and conversion factor
 SCREEN_WIDTH, SCREEN_HEIGHT = 800, 600
 PPM = 20.0  # Pixels per meter
+# Time step of the default solver profile; `simulate` takes any profile of
+# solver.py
 TARGET_FPS = 120
 TIME_STEP = 1.0 / TARGET_FPS
 DURATION = 30  # Duration of the simulation in seconds
 
-# # Pygame setup
-if use_pygame:
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-    pygame.display.set_caption("Domino Simulation with Balance Beam and Cups")
-    clock = pygame.time.Clock()
-    font = pygame.font.SysFont("Arial", 18)
+# Scene geometry shared by the world builder and the stop rules
+PLATFORM_TOP = 6  # Top surface of the ledge
+BOWLING_BALL_RADIUS = 0.5  # 0.5 meters radius
+BEAM_POSITION = (30, 2.0)  # Position of the fulcrum (pivot point)
+BEAM_LENGTH = 8.0  # Total length of the beam
+CUP_HEIGHT = 1.0  # Height of the cup walls (meters)
+BEAM_LIMIT = 15 * (3.1416 / 180)  # Limit the rotation to prevent excessive tilt
+# Lowest point any part of the beam or its cups can reach
+BEAM_LOWEST_Y = BEAM_POSITION[1] - (BEAM_LENGTH / 2) * math.sin(BEAM_LIMIT) - CUP_HEIGHT
+
+# Early termination: the beam is checked every step, the other observables and
+# the stop rules every CHECK_EVERY steps of the default profile (other profiles
+# check at the same simulated interval), and bodies slower than the profile's rest thresholds
+# count as at rest.
+CHECK_EVERY = 6
+CHECK_INTERVAL = CHECK_EVERY * TIME_STEP
 
 # Colors
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 
-# Box2D world setup
-world = b2World(gravity=(0, -10), doSleep=True)
-
-# Variables to track
-first_domino_tipped = False
-last_domino_tipped = False
-domino_ball_contact = False
-ball_moving_right = False
-ball_contact_top = False
-ball_contact_bottom = False
-beam_tip = "neutral"
-
-
-# Contact listener to monitor contacts
-class ContactListener(b2ContactListener):
-    def __init__(self):
-        b2ContactListener.__init__(self)
-
-    def BeginContact(self, contact):
-        global domino_ball_contact, ball_contact_top, ball_contact_bottom
-        fixtureA = contact.fixtureA
-        fixtureB = contact.fixtureB
-        bodyA = fixtureA.body
-        bodyB = fixtureB.body
-
-        # Check if the last domino is in contact with the bowling ball
-        if (bodyA == last_domino_body and bodyB == bowling_ball_body) or (
-            bodyB == last_domino_body and bodyA == bowling_ball_body
-        ):
-            domino_ball_contact = True
-
-        # Check if the bowling ball is in contact with the top platform
-        if (bodyA == bowling_ball_body and bodyB == platform_body) or (
-            bodyB == bowling_ball_body and bodyA == platform_body
-        ):
-            ball_contact_top = True
-
-        # Check if the bowling ball is in contact with the balance beam
-        if (bodyA == bowling_ball_body and bodyB == beam_body) or (
-            bodyB == bowling_ball_body and bodyA == beam_body
-        ):
-            ball_contact_bottom = True  # Reusing variable for simplicity
-
-    def EndContact(self, contact):
-        global domino_ball_contact, ball_contact_top, ball_contact_bottom
-        fixtureA = contact.fixtureA
-        fixtureB = contact.fixtureB
-        bodyA = fixtureA.body
-        bodyB = fixtureB.body
-
-        # Check if the last domino is no longer in contact with the bowling ball
-        if (bodyA == last_domino_body and bodyB == bowling_ball_body) or (
-            bodyB == last_domino_body and bodyA == bowling_ball_body
-        ):
-            domino_ball_contact = False
-
-        # Check if the bowling ball is no longer in contact with the top platform
-        if (bodyA == bowling_ball_body and bodyB == platform_body) or (
-            bodyB == bowling_ball_body and bodyA == platform_body
-        ):
-            ball_contact_top = False
-
-        # Check if the bowling ball is no longer in contact with the balance beam
-        if (bodyA == bowling_ball_body and bodyB == beam_body) or (
-            bodyB == bowling_ball_body and bodyA == beam_body
-        ):
-            ball_contact_bottom = False
-
-
-# Add the contact listener to the world
-contact_listener = ContactListener()
-world.contactListener = contact_listener
-
-# Elevated platform (the ledge)
-platform_body = world.CreateStaticBody(
-    position=(12.5, 5),  # Centered at x=12.5, y=5
-    shapes=b2PolygonShape(box=(12.5, 1)),  # Half-width 12.5, half-height 1
+# Outcome of one simulated scenario. `cup_tipped` is None when the run was cut
+# short by its wall-clock timeout before the outcome was known.
+Verdict = namedtuple(
+    "Verdict",
+    [
+        "scenario",
+        "cup_tipped",
+        "first_domino_tipped",
+        "last_domino_tipped",
+        "steps",
+        "stop_reason",
+    ],
 )
 
 
@@ -125,37 +71,26 @@ def to_pygame(pos):
 
 
 def parse_scenario(scenario_text):
-    # Extract values using regular expressions
-    width = float(re.search(r"width\(([\d.]+)\)\.", scenario_text).group(1))
-    height = float(re.search(r"height\(([\d.]+)\)\.", scenario_text).group(1))
-    push_position = float(
-        re.search(r"push\(domino\(([\d.]+)\)\)\.", scenario_text).group(1)
+    scenario = scenario_lib.parse_scenario(scenario_text)
+    return (
+        scenario.width,
+        scenario.height,
+        scenario.push,
+        scenario.dominoes.tolist(),
+        scenario.balls.tolist(),
     )
-    domino_positions = [
-        float(x) for x in re.findall(r"domino\(([\d.]+)\)\.", scenario_text)
-    ]
-    ball_positions = [
-        float(x) for x in re.findall(r"ball_x\(([\d.]+)\)\.", scenario_text)
-    ]
-    return (width, height, push_position, domino_positions, ball_positions)
-
 
-with open(sys.argv[1], "r") as f:
-    scenario_text = f.read()
-domino_width, domino_height, push_position, domino_positions, ball_positions = (
-    parse_scenario(scenario_text)
-)
 
-num_dominoes = len(domino_positions)
-start_x = 5  # Starting x position on the platform
-start_y = 6 + domino_height / 2  # Platform top surface y=6, domino center y
+def _create_platform(world):
+    # Elevated platform (the ledge)
+    return world.CreateStaticBody(
+        position=(12.5, 5),  # Centered at x=12.5, y=5
+        shapes=b2PolygonShape(box=(12.5, 1)),  # Half-width 12.5, half-height 1
+    )
 
-domino_spacing = 0.5  # Spacing between dominoes
-domino_bodies = []  # List to hold domino bodies
 
-last_domino_x = 0.0
-for i, domino_x in enumerate(domino_positions):
-    last_domino_x = domino_x
+def _create_domino(world, domino_width, domino_height, push_position, domino_x):
+    start_y = PLATFORM_TOP + domino_height / 2  # Platform top surface y=6, domino center y
     angle = 0.0
     if domino_x == push_position:
         angle = -0.3
@@ -165,211 +100,468 @@ for i, domino_x in enumerate(domino_positions):
         box=(domino_width / 2, domino_height / 2), density=1.0, friction=0.3
     )
     body.fixedRotation = False  # Allow rotation
-    domino_bodies.append(body)  # Add to list
+    return body
+
+
+def _create_dominoes(world, domino_width, domino_height, push_position, domino_positions, lazy=None):
+    """Creates the dominoes in scenario order. With `lazy` (see wavefront.py)
+    the dominoes right of the pushed one start asleep ("sleep") or are not
+    created yet and left as None ("data")."""
+    domino_bodies = []  # List to hold domino bodies
+    for domino_x in domino_positions:
+        if lazy == "data" and domino_x > push_position:
+            domino_bodies.append(None)
+            continue
+        body = _create_domino(world, domino_width, domino_height, push_position, domino_x)
+        if lazy == "sleep" and domino_x > push_position:
+            body.awake = False
+        domino_bodies.append(body)  # Add to list
+    return domino_bodies
+
+
+def _create_balls(world, ball_positions):
+    # Bowling ball properties
+    bowling_ball_radius = BOWLING_BALL_RADIUS
+    bowling_ball_density = 0.5  # Adjust as needed
+
+    ball_bodies = []
+    for bowling_ball_x in ball_positions:
+        bowling_ball_y = PLATFORM_TOP + bowling_ball_radius  # On top of the platform
+
+        # Create bowling ball
+        bowling_ball_body = world.CreateDynamicBody(
+            position=(bowling_ball_x, bowling_ball_y),
+        )
+        bowling_ball_body.CreateCircleFixture(
+            radius=bowling_ball_radius, density=bowling_ball_density, friction=0.3
+        )
+        ball_bodies.append(bowling_ball_body)
+    return ball_bodies
+
+
+def _create_beam(world):
+    """Creates the balance beam with its two cups, the fulcrum and the pivot
+    joint. Returns the beam body."""
+    # Create the balance beam (seesaw)
+    beam_length = BEAM_LENGTH  # Total length of the beam
+    beam_thickness = 0.2  # Thickness of the beam
+    beam_position = BEAM_POSITION  # Position of the fulcrum (pivot point)
+
+    # Beam body (dynamic)
+    beam_body = world.CreateDynamicBody(
+        position=beam_position,
+        angle=0.0,
+    )
+    beam_body.CreatePolygonFixture(
+        box=(beam_length / 2, beam_thickness / 2), density=1.0, friction=0.5
+    )
 
-# First and last domino references
-first_domino_body = domino_bodies[0]
-last_domino_body = domino_bodies[-1]
+    # Attach cups to each end of the beam
+    cup_width = 2.0  # Width of the cup (meters)
+    cup_height = CUP_HEIGHT  # Height of the cup walls (meters)
+    wall_thickness = 0.1  # Thickness of the cup walls (meters)
+
+    for cup_offset in [
+        (-beam_length / 2 + cup_width / 2, 0),  # Left cup (where the ball will land)
+        (beam_length / 2 - cup_width / 2, 0),  # Right cup (opposite side)
+    ]:
+        # Cup walls relative to beam body
+        left_wall_vertices = [
+            (cup_offset[0] - cup_width / 2 + wall_thickness / 2, cup_height / 2),
+            (cup_offset[0] - cup_width / 2 + wall_thickness / 2, -cup_height / 2),
+            (cup_offset[0] - cup_width / 2 - wall_thickness / 2, -cup_height / 2),
+            (cup_offset[0] - cup_width / 2 - wall_thickness / 2, cup_height / 2),
+        ]
 
-# Bowling ball properties
-bowling_ball_radius = 0.5  # 0.5 meters radius
-bowling_ball_density = 0.5  # Adjust as needed
-small_gap = 0.1  # Gap between last domino and bowling ball
+        right_wall_vertices = [
+            (cup_offset[0] + cup_width / 2 - wall_thickness / 2, cup_height / 2),
+            (cup_offset[0] + cup_width / 2 - wall_thickness / 2, -cup_height / 2),
+            (cup_offset[0] + cup_width / 2 + wall_thickness / 2, -cup_height / 2),
+            (cup_offset[0] + cup_width / 2 + wall_thickness / 2, cup_height / 2),
+        ]
 
-for bowling_ball_x in ball_positions:
-    bowling_ball_y = 6 + bowling_ball_radius  # On top of the platform
+        # Create fixtures for the cup walls
+        beam_body.CreatePolygonFixture(vertices=left_wall_vertices, density=1.0, friction=0.5)
+        beam_body.CreatePolygonFixture(vertices=right_wall_vertices, density=1.0, friction=0.5)
 
-    # Create bowling ball
-    bowling_ball_body = world.CreateDynamicBody(
-        position=(bowling_ball_x, bowling_ball_y),
+    # Create the fulcrum (static body)
+    fulcrum_body = world.CreateStaticBody(
+        position=beam_position,
     )
-    bowling_ball_body.CreateCircleFixture(
-        radius=bowling_ball_radius, density=bowling_ball_density, friction=0.3
+
+    # Create a revolute joint (pivot) between the beam and the fulcrum
+    joint_def = b2RevoluteJointDef(
+        bodyA=beam_body,
+        bodyB=fulcrum_body,
+        localAnchorA=(0, 0),
+        localAnchorB=(0, 0),
+        enableMotor=False,
+        enableLimit=True,
+        lowerAngle=-BEAM_LIMIT,  # Limit the rotation to prevent excessive tilt
+        upperAngle=BEAM_LIMIT,
     )
+    world.CreateJoint(joint_def)
 
-# Create the balance beam (seesaw)
-beam_length = 8.0  # Total length of the beam
-beam_thickness = 0.2  # Thickness of the beam
-beam_position = (30, 2.0)  # Position of the fulcrum (pivot point)
+    return beam_body
 
-# Beam body (dynamic)
-beam_body = world.CreateDynamicBody(
-    position=beam_position,
-    angle=0.0,
-)
-beam_body.CreatePolygonFixture(
-    box=(beam_length / 2, beam_thickness / 2), density=1.0, friction=0.5
-)
 
-# Attach cups to each end of the beam
-cup_width = 2.0  # Width of the cup (meters)
-cup_height = 1.0  # Height of the cup walls (meters)
-wall_thickness = 0.1  # Thickness of the cup walls (meters)
-
-# Left cup (where the ball will land)
-left_cup_offset = (-beam_length / 2 + cup_width / 2, 0)
-# Left cup walls relative to beam body
-left_wall_vertices = [
-    (left_cup_offset[0] - cup_width / 2 + wall_thickness / 2, cup_height / 2),
-    (left_cup_offset[0] - cup_width / 2 + wall_thickness / 2, -cup_height / 2),
-    (left_cup_offset[0] - cup_width / 2 - wall_thickness / 2, -cup_height / 2),
-    (left_cup_offset[0] - cup_width / 2 - wall_thickness / 2, cup_height / 2),
-]
-
-right_wall_vertices = [
-    (left_cup_offset[0] + cup_width / 2 - wall_thickness / 2, cup_height / 2),
-    (left_cup_offset[0] + cup_width / 2 - wall_thickness / 2, -cup_height / 2),
-    (left_cup_offset[0] + cup_width / 2 + wall_thickness / 2, -cup_height / 2),
-    (left_cup_offset[0] + cup_width / 2 + wall_thickness / 2, cup_height / 2),
-]
-
-# Create fixtures for the left cup walls
-beam_body.CreatePolygonFixture(vertices=left_wall_vertices, density=1.0, friction=0.5)
-beam_body.CreatePolygonFixture(vertices=right_wall_vertices, density=1.0, friction=0.5)
-
-# Right cup (opposite side)
-right_cup_offset = (beam_length / 2 - cup_width / 2, 0)
-# Right cup walls relative to beam body
-left_wall_vertices = [
-    (right_cup_offset[0] - cup_width / 2 + wall_thickness / 2, cup_height / 2),
-    (right_cup_offset[0] - cup_width / 2 + wall_thickness / 2, -cup_height / 2),
-    (right_cup_offset[0] - cup_width / 2 - wall_thickness / 2, -cup_height / 2),
-    (right_cup_offset[0] - cup_width / 2 - wall_thickness / 2, cup_height / 2),
-]
-
-right_wall_vertices = [
-    (right_cup_offset[0] + cup_width / 2 - wall_thickness / 2, cup_height / 2),
-    (right_cup_offset[0] + cup_width / 2 - wall_thickness / 2, -cup_height / 2),
-    (right_cup_offset[0] + cup_width / 2 + wall_thickness / 2, -cup_height / 2),
-    (right_cup_offset[0] + cup_width / 2 + wall_thickness / 2, cup_height / 2),
-]
-
-# Create fixtures for the right cup walls
-beam_body.CreatePolygonFixture(vertices=left_wall_vertices, density=1.0, friction=0.5)
-beam_body.CreatePolygonFixture(vertices=right_wall_vertices, density=1.0, friction=0.5)
-
-# Create the fulcrum (static body)
-fulcrum_body = world.CreateStaticBody(
-    position=beam_position,
-)
+def build_world(domino_width, domino_height, push_position, domino_positions, ball_positions, lazy=None):
+    """Builds the scenario world. Returns the world, the list of domino bodies,
+    the list of ball bodies and the beam body. `lazy` is passed on to
+    `_create_dominoes`."""
+    # Box2D world setup
+    world = b2World(gravity=(0, -10), doSleep=True)
 
-# Create a revolute joint (pivot) between the beam and the fulcrum
-joint_def = b2RevoluteJointDef(
-    bodyA=beam_body,
-    bodyB=fulcrum_body,
-    localAnchorA=(0, 0),
-    localAnchorB=(0, 0),
-    enableMotor=False,
-    enableLimit=True,
-    lowerAngle=-15 * (3.1416 / 180),  # Limit the rotation to prevent excessive tilt
-    upperAngle=15 * (3.1416 / 180),
-)
-world.CreateJoint(joint_def)
+    platform_body = _create_platform(world)
+    domino_bodies = _create_dominoes(world, domino_width, domino_height, push_position, domino_positions, lazy)
+    ball_bodies = _create_balls(world, ball_positions)
+    beam_body = _create_beam(world)
 
-# Create a video writer using imageio
-video_writer = imageio.get_writer("domino_simulation_balance_beam.mp4", fps=TARGET_FPS)
+    # Add the contact listener to the world. As before, the contact flags follow
+    # the last ball created; the event log covers every ball.
+    tag_bodies(domino_bodies, ball_bodies, [platform_body], beam_body)
+    world.contactListener = ContactListener(flag_ball=len(ball_bodies) - 1)
+    return world, domino_bodies, ball_bodies, beam_body
 
-# Simulation loop
-running = True
-frame_count = 0
-total_frames = DURATION * TARGET_FPS  # Total number of frames to record
 
-while running:
-    # # Handle events
-    if use_pygame:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
+class WorldTemplate:
+    """A scenario world whose platform, beam, fulcrum and joint are built once.
 
-        screen.fill(WHITE)
+    `reset` destroys the previous scenario's dominoes and balls, creates the new
+    ones and puts the beam back at rest, so one b2World serves any number of
+    scenarios. Bodies are created in a different order than in `build_world`,
+    so trajectories can differ from a fresh world in the last bits."""
 
-    # Update variables
-    # Check if the first domino has tipped (angle significantly different from initial angle)
-    if not first_domino_tipped and abs(first_domino_body.angle) > 0.5:
-        first_domino_tipped = True
+    def __init__(self):
+        self.world = b2World(gravity=(0, -10), doSleep=True)
+        self.platform_body = _create_platform(self.world)
+        self.beam_body = _create_beam(self.world)
+        self.domino_bodies = []
+        self.ball_bodies = []
 
-    # Check if the last domino has tipped
-    if not last_domino_tipped and abs(last_domino_body.angle) > 0.5:
-        last_domino_tipped = True
+    def reset(self, domino_width, domino_height, push_position, domino_positions, ball_positions, lazy=None):
+        """Same arguments and return value as `build_world`."""
+        destroy_bodies(self.world, self.domino_bodies + self.ball_bodies)
 
-    if beam_body.angle > 0.2:
-        beam_tip = "positive"
-    elif beam_body.angle < -0.2:
-        beam_tip = "negative"
-    else:
-        beam_tip = "neutral"
+        beam_body = self.beam_body
+        beam_body.position = BEAM_POSITION
+        beam_body.angle = 0.0
+        beam_body.linearVelocity = (0, 0)
+        beam_body.angularVelocity = 0.0
+        beam_body.awake = True
 
-    # Check if the bowling ball is moving to the right
-    ball_velocity = bowling_ball_body.linearVelocity.x
-    ball_moving_right = ball_velocity > 0.1  # Threshold to avoid floating-point errors
+        self.domino_bodies = _create_dominoes(
+            self.world, domino_width, domino_height, push_position, domino_positions, lazy
+        )
+        self.ball_bodies = _create_balls(self.world, ball_positions)
+        tag_bodies(self.domino_bodies, self.ball_bodies, [self.platform_body], beam_body)
+        self.world.contactListener = ContactListener(flag_ball=len(self.ball_bodies) - 1)
+        return self.world, self.domino_bodies, self.ball_bodies, beam_body
 
-    if use_pygame:
-        # Draw static bodies (platform, fulcrum)
-        for body in world.bodies:
-            if body.type == b2_staticBody:
-                for fixture in body.fixtures:
-                    shape = fixture.shape
-                    if isinstance(shape, b2PolygonShape):
-                        vertices = [body.transform * v for v in shape.vertices]
-                        vertices = [to_pygame(v) for v in vertices]
-                        pygame.draw.polygon(screen, BLACK, vertices)
-
-        # Draw dynamic bodies (dominoes, bowling ball, beam)
-        for body in world.bodies:
-            if body.type == b2_dynamicBody:
-                for fixture in body.fixtures:
-                    shape = fixture.shape
-                    if isinstance(shape, b2PolygonShape):
-                        vertices = [body.transform * v for v in shape.vertices]
-                        vertices = [to_pygame(v) for v in vertices]
-                        pygame.draw.polygon(screen, BLACK, vertices)
-                    elif isinstance(shape, b2CircleShape):
-                        position = body.transform * shape.pos
-                        position = to_pygame(position)
-                        pygame.draw.circle(
-                            screen, BLACK, position, int(shape.radius * PPM)
-                        )
-
-        # Display variables on the screen
-        status_texts = [
-            f"First Domino Tipped: {'Yes' if first_domino_tipped else 'No'}",
-            f"Last Domino Tipped: {'Yes' if last_domino_tipped else 'No'}",
-            f"Domino and Ball Contact: {'Yes' if domino_ball_contact else 'No'}",
-            f"Ball Moving Right: {'Yes' if ball_moving_right else 'No'}",
-            f"Ball Contact Top Level: {'Yes' if ball_contact_top else 'No'}",
-            f"Ball Contact Beam: {'Yes' if ball_contact_bottom else 'No'}",
-            f"Beam Tip: {beam_tip}",
-        ]
 
-        for i, text in enumerate(status_texts):
-            rendered_text = font.render(text, True, BLACK)
-            screen.blit(rendered_text, (10, 10 + i * 20))
+# Per-process template used by `simulate(..., reuse_world=True)`
+_world_template = None
 
-    # # Capture the screen surface as an image
-    # frame = pygame.surfarray.array3d(screen)
-    # # Convert from (width, height, channels) to (height, width, channels)
-    # frame = np.transpose(frame, (1, 0, 2))
-    # # Write the frame to the video
-    # video_writer.append_data(frame)
 
-    if beam_tip == "positive":
-        exit(0)
+def _reuse_world(*args):
+    global _world_template
+    if _world_template is None:
+        _world_template = WorldTemplate()
+    return _world_template.reset(*args)
 
-    # Update physics
-    world.Step(TIME_STEP, 10, 10)
-    world.ClearForces()
+
+def _init_pygame():
+    import pygame
+
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Domino Simulation with Balance Beam and Cups")
+    clock = pygame.time.Clock()
+    font = pygame.font.SysFont("Arial", 18)
+    return pygame, screen, clock, font
+
+
+def _draw(pygame, screen, font, world, status_texts):
+    screen.fill(WHITE)
+
+    # Draw static bodies (platform, fulcrum)
+    for body in world.bodies:
+        if body.type == b2_staticBody:
+            for fixture in body.fixtures:
+                shape = fixture.shape
+                if isinstance(shape, b2PolygonShape):
+                    vertices = [body.transform * v for v in shape.vertices]
+                    vertices = [to_pygame(v) for v in vertices]
+                    pygame.draw.polygon(screen, BLACK, vertices)
+
+    # Draw dynamic bodies (dominoes, bowling ball, beam)
+    for body in world.bodies:
+        if body.type == b2_dynamicBody:
+            for fixture in body.fixtures:
+                shape = fixture.shape
+                if isinstance(shape, b2PolygonShape):
+                    vertices = [body.transform * v for v in shape.vertices]
+                    vertices = [to_pygame(v) for v in vertices]
+                    pygame.draw.polygon(screen, BLACK, vertices)
+                elif isinstance(shape, b2CircleShape):
+                    position = body.transform * shape.pos
+                    position = to_pygame(position)
+                    pygame.draw.circle(
+                        screen, BLACK, position, int(shape.radius * PPM)
+                    )
+
+    for i, text in enumerate(status_texts):
+        rendered_text = font.render(text, True, BLACK)
+        screen.blit(rendered_text, (10, 10 + i * 20))
+
+
+def _at_rest(body, profile):
+    velocity = body.linearVelocity
+    return (
+        abs(body.angularVelocity) < profile.rest_angular_speed
+        and velocity.x * velocity.x + velocity.y * velocity.y < profile.rest_speed * profile.rest_speed
+    )
+
+
+def _ball_lost(ball_body):
+    """A ball is lost once it can no longer land in a cup: it is below the
+    lowest point the beam can reach, or below the ledge and moving away from
+    the beam."""
+    x, y = ball_body.position
+    if y + BOWLING_BALL_RADIUS < BEAM_LOWEST_Y:
+        return True
+    if y > PLATFORM_TOP - 2:  # Still above the bottom of the ledge
+        return False
+    velocity_x = ball_body.linearVelocity.x
+    beam_left = BEAM_POSITION[0] - BEAM_LENGTH / 2 - BOWLING_BALL_RADIUS
+    beam_right = BEAM_POSITION[0] + BEAM_LENGTH / 2 + BOWLING_BALL_RADIUS
+    return (x > beam_right and velocity_x >= 0) or (x < beam_left and velocity_x <= 0)
+
+
+def _wave_stalled(domino_bodies, domino_positions, domino_height, ball_bodies, beam_body, profile,
+                  fallen_front=-math.inf, next_standing=None):
+    """The falling wave has stopped: every body is at rest and the next
+    standing domino (if any) is out of reach of the furthest fallen one.
+    `fallen_front` and `next_standing` account for dominoes left out of
+    `domino_bodies`: the furthest fallen one and the nearest standing one."""
+    fallen = [x for x, body in zip(domino_positions, domino_bodies) if abs(body.angle) > 0.5]
+    if not fallen and fallen_front == -math.inf:
+        return False
+    front = max(fallen + [fallen_front])
+    standing = [
+        x for x, body in zip(domino_positions, domino_bodies)
+        if x > front and abs(body.angle) <= 0.5
+    ]
+    if next_standing is not None and next_standing > front:
+        standing.append(next_standing)
+    if standing and min(standing) - front <= domino_height:
+        return False
+    if not _at_rest(beam_body, profile) or not all(_at_rest(body, profile) for body in domino_bodies):
+        return False
+    return all(_at_rest(body, profile) or _ball_lost(body) for body in ball_bodies)
+
+
+def early_stop_rule(beam_tip, domino_bodies, domino_positions, domino_height, ball_bodies, beam_body,
+                    profile=solver.DEFAULT_PROFILE, wavefront=None):
+    """Returns the name of the first stop rule under which the cup can no
+    longer tip, or None while the outcome is still open. Rest thresholds come
+    from the solver `profile`. With a `wavefront` only its live dominoes are
+    inspected; the others are settled or have not been reached."""
+    profile = solver.get_profile(profile)
+    fallen_front, next_standing = -math.inf, None
+    if wavefront is not None:
+        domino_bodies, domino_positions = wavefront.live()
+        fallen_front, next_standing = wavefront.fallen_front, wavefront.next_position()
+    if beam_tip == "negative":
+        return "beam_negative"
+    if not beam_body.awake and not any(body.awake for body in domino_bodies) and not any(
+        body.awake for body in ball_bodies
+    ):
+        return "asleep"
+    if all(_ball_lost(body) for body in ball_bodies):
+        return "ball_lost"
+    if _wave_stalled(domino_bodies, domino_positions, domino_height, ball_bodies, beam_body, profile,
+                     fallen_front, next_standing):
+        return "wave_stalled"
+    return None
+
+
+def simulate(
+    scenario,
+    duration=DURATION,
+    timeout=None,
+    check_every=None,
+    early_stop=True,
+    reuse_world=False,
+    trajectory=None,
+    trajectory_stride=1,
+    profile=solver.DEFAULT_PROFILE,
+    lazy=None,
+):
+    """Simulates `scenario` (a Scenario or the path of a `.pl` file) and
+    returns a Verdict.
+
+    The cup is considered tipped as soon as the beam angle exceeds 0.2 rad;
+    the beam is checked before every step. The other observables are checked
+    every `check_every` steps (by default every CHECK_INTERVAL simulated
+    seconds); with `early_stop` the run
+    also ends as soon as `early_stop_rule` decides the cup cannot tip, and
+    `Verdict.stop_reason` names the rule that fired. `timeout` bounds the
+    wall-clock time spent in the loop (in seconds). With `reuse_world` the
+    process-wide WorldTemplate is reset instead of building a new world.
+    With `trajectory` set to a `.npy` path, the state before every
+    `trajectory_stride`-th step is recorded there; see trajectory.py.
+    `profile` is a solver profile or its name; see solver.py. With `lazy`
+    ("sleep" or "data") dominoes are only activated as the wave reaches
+    them; see wavefront.py."""
+    if not isinstance(scenario, scenario_lib.Scenario):
+        scenario = scenario_lib.load_scenario(scenario)
+    profile = solver.get_profile(profile)
+    if check_every is None:
+        check_every = max(1, round(CHECK_INTERVAL / profile.time_step))
+    domino_width, domino_height = scenario.width, scenario.height
+    push_position = scenario.push
+    domino_positions, ball_positions = scenario.dominoes, scenario.balls
+    if lazy is not None and lazy not in LAZY_MODES:
+        raise ValueError(f"Unknown lazy mode {lazy!r}; expected one of {', '.join(LAZY_MODES)}")
+    if lazy == "data" and trajectory is not None:
+        raise ValueError('Trajectories need every body from the start; use lazy="sleep"')
+    world, domino_bodies, ball_bodies, beam_body = (_reuse_world if reuse_world else build_world)(
+        domino_width, domino_height, push_position, domino_positions, ball_positions, lazy
+    )
+    contact_listener = world.contactListener
+
+    wavefront = None
+    if lazy is not None:
+        def create_domino(i):
+            body = _create_domino(world, domino_width, domino_height, push_position, domino_positions[i])
+            body.userData = domino_tag(i, len(domino_bodies))
+            return body
+
+        wavefront = Wavefront(lazy, domino_bodies, domino_positions, domino_width, domino_height, push_position,
+                              ball_bodies, BOWLING_BALL_RADIUS, profile.rest_speed, create_domino)
+
+    # First and last domino references; in "data" mode they may not exist yet
+    first_domino_body = domino_bodies[0]
+    last_domino_body = domino_bodies[-1]
+    bowling_ball_body = ball_bodies[-1]
+
+    # Variables to track
+    first_domino_tipped = False
+    last_domino_tipped = False
+    ball_moving_right = False
+    beam_tip = "neutral"
 
     if use_pygame:
-        # Update display
-        pygame.display.flip()
-        clock.tick(TARGET_FPS)
+        pygame, screen, clock, font = _init_pygame()
+        check_every = 1  # Observables are drawn every frame
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    frame_count = 0
+    total_frames = solver.frames(profile, duration)  # Total number of frames to simulate
+    stop_reason = "duration"
+
+    recorder = None
+    if trajectory is not None:
+        recorder = TrajectoryRecorder(
+            trajectory, domino_bodies, ball_bodies, beam_body, contact_listener,
+            total_frames, trajectory_stride, scenario=scenario.name, time_step=profile.time_step,
+            profile=profile.name,
+        )
+
+    while frame_count < total_frames:
+        if recorder is not None:
+            recorder.record(frame_count)
+
+        # The beam is checked every step, so a brief tip is never missed
+        if beam_body.angle > 0.2:
+            beam_tip = "positive"
+        elif beam_body.angle < -0.2:
+            beam_tip = "negative"
+        else:
+            beam_tip = "neutral"
+
+        check = frame_count % check_every == 0
+        if check:
+            # Update variables
+            if wavefront is not None:
+                first_domino_body, last_domino_body = domino_bodies[0], domino_bodies[-1]
+
+            # Check if the first domino has tipped (angle significantly different from initial angle)
+            if not first_domino_tipped and first_domino_body is not None and abs(first_domino_body.angle) > 0.5:
+                first_domino_tipped = True
+
+            # Check if the last domino has tipped
+            if not last_domino_tipped and last_domino_body is not None and abs(last_domino_body.angle) > 0.5:
+                last_domino_tipped = True
+
+            if use_pygame:
+                # Check if the bowling ball is moving to the right
+                ball_velocity = bowling_ball_body.linearVelocity.x
+                ball_moving_right = ball_velocity > 0.1  # Threshold to avoid floating-point errors
+
+                if any(event.type == pygame.QUIT for event in pygame.event.get()):
+                    stop_reason = "quit"
+                    break
+
+                # Display variables on the screen
+                _draw(pygame, screen, font, world, [
+                    f"First Domino Tipped: {'Yes' if first_domino_tipped else 'No'}",
+                    f"Last Domino Tipped: {'Yes' if last_domino_tipped else 'No'}",
+                    f"Domino and Ball Contact: {'Yes' if contact_listener.domino_ball_contact else 'No'}",
+                    f"Ball Moving Right: {'Yes' if ball_moving_right else 'No'}",
+                    f"Ball Contact Top Level: {'Yes' if contact_listener.ball_contact_top else 'No'}",
+                    f"Ball Contact Beam: {'Yes' if contact_listener.ball_contact_bottom else 'No'}",
+                    f"Beam Tip: {beam_tip}",
+                ])
+
+        if beam_tip == "positive":
+            stop_reason = "cup"
+            break
+
+        if check:
+            if early_stop:
+                rule = early_stop_rule(
+                    beam_tip, domino_bodies, domino_positions, domino_height, ball_bodies, beam_body, profile,
+                    wavefront
+                )
+                if rule is not None:
+                    stop_reason = rule
+                    break
+
+            if deadline is not None and time.monotonic() > deadline:
+                stop_reason = "timeout"
+                break
+
+        # Update physics
+        if wavefront is not None:
+            wavefront.update()
+        contact_listener.step = frame_count
+        solver.step(world, profile)
+        world.ClearForces()
+
+        if use_pygame:
+            # Update display
+            pygame.display.flip()
+            clock.tick(round(1 / profile.time_step))
+
+        frame_count += 1
 
-    frame_count += 1
-    if frame_count >= total_frames:
-        running = False
+    if use_pygame:
+        pygame.quit()
+    if recorder is not None:
+        recorder.close(stop_reason=stop_reason, cup_tipped=beam_tip == "positive")
+
+    return Verdict(
+        scenario=scenario.name,
+        cup_tipped=None if stop_reason == "timeout" else beam_tip == "positive",
+        first_domino_tipped=first_domino_tipped,
+        last_domino_tipped=last_domino_tipped,
+        steps=frame_count,
+        stop_reason=stop_reason,
+    )
 
-# Clean up
-# video_writer.close()
-# pygame.quit()
 
-exit(1)
+if __name__ == "__main__":
+    verdict = simulate(sys.argv[1])
+    exit(0 if verdict.cup_tipped else 1)
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""Sandboxed, cached evaluation of synthesized feature programs.
+
+A program is the source of a `get_abstract_feature(structure_rep)` function,
+as returned by the abstract-feature prompt. Each source is validated against
+a small whitelist of Python once, compiled once per process (keyed by its
+hash), and run on a pool of worker processes with a per-call time limit and
+an address-space limit. Every (program, scenario) value is stored in an
+SQLite table keyed by the source hash and `Scenario.digest()`, so re-scoring
+after the corpus changes only evaluates the new scenarios.
+
+The whitelist keeps generated code from doing accidental damage (writing
+files, importing the simulator, spinning forever); it is not a security
+boundary against deliberately hostile code.
+"""
+
+import argparse
+import ast
+import builtins
+import hashlib
+import json
+import math
+import os
+import re
+import signal
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from scenario import load_scenarios
+
+ENTRY = "get_abstract_feature"
+CACHE_PATH = os.environ.get(
+    "FEATURE_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "feature_cache.db")
+)
+TIMEOUT = 1.0  # Seconds per call
+MEMORY_LIMIT = 1 << 30  # Bytes of address space per worker
+
+ALLOWED_MODULES = {"math": math}
+SAFE_BUILTINS = {
+    name: getattr(builtins, name)
+    for name in (
+        "abs", "all", "any", "bool", "dict", "divmod", "enumerate", "filter", "float", "int", "isinstance",
+        "len", "list", "map", "max", "min", "pow", "range", "reversed", "round", "set", "sorted", "sum",
+        "tuple", "zip", "ArithmeticError", "Exception", "IndexError", "KeyError", "TypeError", "ValueError",
+        "ZeroDivisionError",
+    )
+}
+# Syntax that has no business in a feature function
+FORBIDDEN_NODES = (
+    ast.Global, ast.Nonlocal, ast.AsyncFunctionDef, ast.AsyncFor, ast.AsyncWith, ast.Await, ast.ClassDef,
+)
+_FENCE = re.compile(r"```(?:python)?\s*\n(.*?)```", re.DOTALL)
+
+
+class ProgramError(ValueError):
+    """A source that does not parse or uses forbidden syntax."""
+
+
+class CallTimeout(BaseException):
+    # Not an Exception, so `except Exception` in a program cannot swallow it
+    pass
+
+
+def extract_source(text):
+    """The code of an LLM completion: the first fenced block that defines the
+    entry function, or the whole text if there are no fences."""
+    blocks = _FENCE.findall(text)
+    for block in blocks:
+        if f"def {ENTRY}" in block:
+            return block
+    return blocks[0] if blocks else text
+
+
+def program_hash(source):
+    return hashlib.sha1(source.strip().encode()).hexdigest()
+
+
+def validate(source):
+    """Parses `source` and raises ProgramError unless it only defines
+    functions and constants, imports nothing but `math`, touches no dunder
+    names or attributes, and defines the entry function."""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError as e:
+        raise ProgramError(f"syntax error: {e}") from None
+
+    for node in ast.walk(tree):
+        if isinstance(node, FORBIDDEN_NODES):
+            raise ProgramError(f"line {node.lineno}: {type(node).__name__} is not allowed")
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            modules = [node.module] if isinstance(node, ast.ImportFrom) else [alias.name for alias in node.names]
+            for module in modules:
+                if module not in ALLOWED_MODULES:
+                    raise ProgramError(f"line {node.lineno}: import of {module!r} is not allowed")
+        elif isinstance(node, ast.ExceptHandler) and node.type is None:
+            raise ProgramError(f"line {node.lineno}: bare except is not allowed")
+        name = getattr(node, "id", None) or getattr(node, "attr", None) or getattr(node, "arg", None)
+        if isinstance(name, str) and name.startswith("__"):
+            raise ProgramError(f"line {node.lineno}: {name!r} is not allowed")
+
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.Import, ast.ImportFrom, ast.Assign, ast.AnnAssign, ast.Expr)):
+            raise ProgramError(f"line {node.lineno}: top-level {type(node).__name__} is not allowed")
+    if not any(isinstance(node, ast.FunctionDef) and node.name == ENTRY for node in tree.body):
+        raise ProgramError(f"no top-level {ENTRY} function")
+    return tree
+
+
+def _import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name not in ALLOWED_MODULES:
+        raise ImportError(f"import of {name!r} is not allowed")
+    return ALLOWED_MODULES[name]
+
+
+_compiled = {}
+
+
+def compile_program(source):
+    """Returns the entry function of a validated source, compiled once per
+    process and source hash."""
+    key = program_hash(source)
+    function = _compiled.get(key)
+    if function is None:
+        from classes import StructureRep
+
+        code = compile(validate(source), f"<program {key[:12]}>", "exec")
+        namespace = {
+            "__builtins__": dict(SAFE_BUILTINS, __import__=_import),
+            "math": math,
+            "StructureRep": StructureRep,
+        }
+        exec(code, namespace)
+        function = _compiled[key] = namespace[ENTRY]
+    return function
+
+
+def _raise_timeout(signum, frame):
+    raise CallTimeout
+
+
+def _init_worker(memory_limit):
+    if memory_limit:
+        import resource
+
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        limit = memory_limit if hard == resource.RLIM_INFINITY else min(memory_limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    signal.signal(signal.SIGALRM, _raise_timeout)
+
+
+def _call(function, rep, timeout):
+    """Returns `(value, error)` of one call; value is a float or None."""
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        value = function(rep)
+    except CallTimeout:
+        return None, "timeout"
+    except MemoryError:
+        return None, "memory limit"
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    if value is None:
+        return None, None
+    if isinstance(value, (bool, int, float, np.integer, np.floating)):
+        return float(value), None
+    return None, f"returned {type(value).__name__}"
+
+
+def _evaluate_chunk(source, items, timeout):
+    """Worker: evaluates one program on `[(scenario digest, scenario)]`."""
+    from classes import StructureRep
+
+    function = compile_program(source)
+    rows = []
+    for digest, scenario in items:
+        value, error = _call(function, StructureRep.from_scenario(scenario), timeout)
+        rows.append((digest, value, error))
+    return rows
+
+
+class FeatureCache:
+    """SQLite-backed (program hash, scenario digest) -> value table, in WAL
+    mode like `tip_oracle.TipCache`. `value` is NULL where the program
+    returned None or failed; `error` says why it failed."""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS programs (program TEXT PRIMARY KEY, source TEXT)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS feature_values ("
+            "program TEXT, scenario TEXT, value REAL, error TEXT, PRIMARY KEY (program, scenario))"
+        )
+
+    def add_program(self, program, source):
+        self.conn.execute("INSERT OR IGNORE INTO programs VALUES (?, ?)", (program, source))
+
+    def rows(self, program):
+        """`{scenario digest: (value, error)}` of everything known for `program`."""
+        return {
+            scenario: (value, error)
+            for scenario, value, error in self.conn.execute(
+                "SELECT scenario, value, error FROM feature_values WHERE program=?", (program,)
+            )
+        }
+
+    def put_many(self, program, rows):
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO feature_values VALUES (?, ?, ?, ?)",
+                [(program, digest, value, error) for digest, value, error in rows],
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+class FeatureExecutor:
+    """Scores feature programs on scenario corpora.
+
+    `processes` workers (default: one per CPU) each run calls for at most
+    `timeout` seconds in at most `memory_limit` bytes of address space. Work
+    is sent in chunks of `chunk_size` scenarios of one program. A worker
+    that dies takes its chunk down with it: the chunk is retried alone and
+    recorded as crashed if it kills a worker again."""
+
+    def __init__(self, cache_path=CACHE_PATH, processes=None, timeout=TIMEOUT, memory_limit=MEMORY_LIMIT,
+                 chunk_size=256):
+        self.cache = FeatureCache(cache_path)
+        self.processes = processes or os.cpu_count()
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.chunk_size = chunk_size
+        self.errors = {}  # program hash -> validation error
+        self.stats = {"programs": 0, "invalid": 0, "cached": 0, "computed": 0, "failed": 0, "timeouts": 0}
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.processes, initializer=_init_worker,
+                                             initargs=(self.memory_limit,))
+        return self._pool
+
+    def _reset_pool(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _run(self, chunks):
+        """Runs `[(program, source, items)]` and stores the rows; returns the
+        chunks that were lost to a dying worker."""
+        pool = self._get_pool()
+        futures = {pool.submit(_evaluate_chunk, source, items, self.timeout): (program, source, items)
+                   for program, source, items in chunks}
+        lost = []
+        for future in as_completed(futures):
+            program, source, items = futures[future]
+            try:
+                rows = future.result()
+            except BrokenProcessPool:
+                lost.append((program, source, items))
+                continue
+            self._store(program, rows)
+        if lost:
+            self._reset_pool()
+        return lost
+
+    def _store(self, program, rows):
+        self.cache.put_many(program, rows)
+        self.stats["computed"] += len(rows)
+        self.stats["failed"] += sum(error is not None for _, _, error in rows)
+        self.stats["timeouts"] += sum(error == "timeout" for _, _, error in rows)
+
+    def evaluate(self, sources, scenarios):
+        """Returns a `(len(scenarios), len(sources))` float array of feature
+        values, NaN where a program returned None, failed, or is invalid
+        (see `errors`). Only pairs missing from the cache are computed."""
+        scenarios = list(scenarios)
+        digests = [scenario.digest() for scenario in scenarios]
+        unique = dict(zip(digests, scenarios))
+
+        programs = []
+        chunks = []
+        for source in sources:
+            source = extract_source(source)
+            program = program_hash(source)
+            programs.append(program)
+            self.stats["programs"] += 1
+            try:
+                validate(source)
+            except ProgramError as e:
+                self.errors[program] = str(e)
+                self.stats["invalid"] += 1
+                continue
+            self.cache.add_program(program, source)
+            known = self.cache.rows(program)
+            missing = [(digest, scenario) for digest, scenario in unique.items() if digest not in known]
+            self.stats["cached"] += len(unique) - len(missing)
+            chunks.extend(
+                (program, source, missing[i:i + self.chunk_size]) for i in range(0, len(missing), self.chunk_size)
+            )
+
+        lost = self._run(chunks)
+        for chunk in lost:
+            if self._run([chunk]):
+                program, _, items = chunk
+                self._store(program, [(digest, None, "worker crashed") for digest, _ in items])
+
+        features = np.full((len(scenarios), len(programs)), np.nan)
+        index = {digest: i for i, digest in enumerate(unique)}
+        rows_of = np.array([index[digest] for digest in digests], dtype=np.intp)
+        for j, program in enumerate(programs):
+            if program in self.errors:
+                continue
+            known = self.cache.rows(program)
+            column = np.array([known[digest][0] for digest in unique], dtype=float)
+            features[:, j] = column[rows_of]
+        return features
+
+    def close(self):
+        self._reset_pool()
+        self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score synthesized feature programs on a scenario corpus.")
+    parser.add_argument("programs", nargs="+", help="files with a get_abstract_feature source (or LLM completion)")
+    parser.add_argument("--scenarios", default="scenarios", help="scenario file, shard, or directory")
+    parser.add_argument("--cache", default=CACHE_PATH, help="SQLite value cache")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="seconds allowed per call")
+    parser.add_argument("--memory-limit", type=int, default=MEMORY_LIMIT >> 20, help="MiB of address space per worker")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("-j", "--processes", type=int, default=None)
+    parser.add_argument("-o", "--out", default=None, help="write features, program hashes and digests to this .npz")
+    args = parser.parse_args()
+
+    sources = []
+    for path in args.programs:
+        with open(path) as f:
+            sources.append(f.read())
+    scenarios = load_scenarios(args.scenarios)
+
+    with FeatureExecutor(args.cache, args.processes, args.timeout, args.memory_limit << 20, args.chunk_size) as executor:
+        features = executor.evaluate(sources, scenarios)
+        hashes = [program_hash(extract_source(source)) for source in sources]
+        for path, program, column in zip(args.programs, hashes, features.T):
+            error = executor.errors.get(program)
+            defined = int(np.isfinite(column).sum())
+            print(f"{path}: {program[:12]} " + (f"invalid ({error})" if error else f"{defined}/{len(column)} defined"))
+        print(json.dumps(executor.stats), file=sys.stderr)
+
+    if args.out:
+        np.savez(args.out, features=features, programs=np.array(hashes),
+                 scenarios=np.array([scenario.digest() for scenario in scenarios]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
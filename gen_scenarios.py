@@ -1,88 +1,210 @@
+import argparse
+import json
+import os
+import random
+from itertools import product
+
+from scenario import Scenario, open_shard
+
 domino_spacing = 0.5  # Spacing between dominoes
 start_x = 5  # Starting x position on the platform
 bowling_ball_radius = 0.5  # 0.5 meters radius
 small_gap = 0.1  # Gap between last domino and bowling ball
 
+# Default sampling axes
+RATIOS = [3, 6, 9, 12]
+NUM_DOMINOES = [5, 10, 20]
+SKIP = [0, 2, 4]
+WIDTHS = [0.2]
+
+# Scenarios are sampled in blocks of BLOCK_SIZE indices, each with its own
+# seeded generator, so scenario i is the same however the stream is sharded.
+BLOCK_SIZE = 4096
+
+
+def make_scenario(ratio, n_dominoes, n_skip, domino_width):
+    """Builds one scenario: a row of `n_dominoes` with the middle `n_skip`
+    removed and a bowling ball just past the last domino position. Raises
+    ValueError if that removes every domino."""
+    domino_height = domino_width * ratio
+
+    mid = n_dominoes // 2
+    skip_start = mid - n_skip // 2
+    skip_end = mid + n_skip // 2
+    if skip_start <= 0 and skip_end >= n_dominoes:
+        raise ValueError(f"Skipping {n_skip} of {n_dominoes} dominoes leaves none to push")
+    push = None
+    dominoes = []
+    last_domino_x = 0
+    for i in range(n_dominoes):
+        domino_x = start_x + i * (domino_width + domino_spacing)
+        if not skip_start <= i < skip_end:
+            if push is None:
+                push = domino_x
+            dominoes.append(domino_x)
+        last_domino_x = domino_x
+
+    bowling_ball_x = last_domino_x + domino_width / 2 + bowling_ball_radius + small_gap
+    return Scenario(domino_width, domino_height, push, tuple(dominoes), (bowling_ball_x,))
+
+
+def iter_simple(ratios=RATIOS, num_dominoes=NUM_DOMINOES, skip=SKIP, domino_width=0.2):
+    """Yields the full grid of simple scenarios as immutable records."""
+    for ratio, n_dominoes, n_skip in product(ratios, num_dominoes, skip):
+        yield make_scenario(ratio, n_dominoes, n_skip, domino_width)
+
+
+def iter_multi_ball(ratios=RATIOS, num_dominoes=NUM_DOMINOES, skip=SKIP, domino_width=0.2):
+    """Yields the full grid of multi-ball scenarios as immutable records.
+    These still have a single ball, so the grid is that of `iter_simple`."""
+    yield from iter_simple(ratios, num_dominoes, skip, domino_width)
+
 
 def gen_simple(
     ratios=[3, 6, 9, 12], num_dominoes=[5, 10, 20], skip=[0, 2, 4], domino_width=0.2
 ):
     """Generates simple scenarios with a single bowling ball and a row of dominoes that may have gaps."""
-    scenario = []
-
-    for ratio in ratios:
-        domino_height = domino_width * ratio
-        for n_dominoes in num_dominoes:
-            for n_skip in skip:
-                scenario.append(f"width({domino_width}).")
-                scenario.append(f"height({domino_height}).")
-
-                mid = n_dominoes // 2
-                skip_start = mid - n_skip // 2
-                skip_end = mid + n_skip // 2
-                pushed = False
-                last_domino_x = 0
-                for i in range(n_dominoes):
-                    should_skip = skip_start <= i < skip_end
-                    domino_x = start_x + i * (domino_width + domino_spacing)
-                    if not pushed and not should_skip:
-                        scenario.append(f"push(domino({domino_x})).")
-                        pushed = True
-
-                    if not should_skip:
-                        scenario.append(f"domino({domino_x}).")
-                    last_domino_x = domino_x
-
-                bowling_ball_x = (
-                    last_domino_x + domino_width / 2 + bowling_ball_radius + small_gap
-                )
-                scenario.append(f"ball_x({bowling_ball_x}).")
-
-                yield scenario
-                scenario.clear()
+    for scenario in iter_simple(ratios, num_dominoes, skip, domino_width):
+        yield scenario.facts()
 
 
 def gen_multi_ball(
     ratios=[3, 6, 9, 12], num_dominoes=[5, 10, 20], skip=[0, 2, 4], domino_width=0.2
 ):
     """Generates simple scenarios with a single bowling ball and a row of dominoes that may have gaps."""
-    scenario = []
-
-    for ratio in ratios:
-        domino_height = domino_width * ratio
-        for n_dominoes in num_dominoes:
-            for n_skip in skip:
-                scenario.append(f"width({domino_width}).")
-                scenario.append(f"height({domino_height}).")
-
-                mid = n_dominoes // 2
-                skip_start = mid - n_skip // 2
-                skip_end = mid + n_skip // 2
-                pushed = False
-                for i in range(n_dominoes):
-                    if skip_start <= i < skip_end:
-                        continue
-
-                    domino_x = start_x + i * (domino_width + domino_spacing)
-                    if not pushed:
-                        scenario.append(f"push(domino({domino_x})).")
-                        pushed = True
-
-                    scenario.append(f"domino({domino_x}).")
-
-                last_domino_x = start_x + (n_dominoes - 1) * (
-                    domino_width + domino_spacing
-                )
-                bowling_ball_x = (
-                    last_domino_x + domino_width / 2 + bowling_ball_radius + small_gap
-                )
-                scenario.append(f"ball_x({bowling_ball_x}).")
-
-                yield scenario
-                scenario.clear()
+    for scenario in iter_multi_ball(ratios, num_dominoes, skip, domino_width):
+        yield scenario.facts()
+
+
+def _block_rng(seed, block):
+    return random.Random(f"{seed}/{block}")
+
+
+def sample_scenarios(
+    start,
+    stop,
+    seed=0,
+    strategy="random",
+    ratios=RATIOS,
+    num_dominoes=NUM_DOMINOES,
+    skip=SKIP,
+    widths=WIDTHS,
+):
+    """Yields scenarios `start` to `stop - 1` of a deterministic sample stream.
+
+    With `strategy="random"` every axis is drawn uniformly and independently.
+    With `strategy="stratified"` each consecutive run of len(strata) scenarios
+    covers every (ratio, num_dominoes, skip, width) combination exactly once,
+    in a seeded random order. Raises ValueError up front if some combination
+    of `num_dominoes` and `skip` leaves no domino (see `make_scenario`)."""
+    for n_dominoes, n_skip in product(num_dominoes, skip):
+        make_scenario(1, n_dominoes, n_skip, 0.2)
+    if strategy == "stratified":
+        strata = list(product(ratios, num_dominoes, skip, widths))
+        current_round, order = None, None
+        for i in range(start, stop):
+            round_index, offset = divmod(i, len(strata))
+            if round_index != current_round:
+                current_round = round_index
+                order = strata[:]
+                _block_rng(seed, f"round{round_index}").shuffle(order)
+            ratio, n_dominoes, n_skip, width = order[offset]
+            yield make_scenario(ratio, n_dominoes, n_skip, width)
+    elif strategy == "random":
+        axes = (ratios, num_dominoes, skip, widths)
+        rng, block = None, None
+        for i in range(start, stop):
+            if i // BLOCK_SIZE != block:
+                block = i // BLOCK_SIZE
+                rng = _block_rng(seed, block)
+                for _ in range((i % BLOCK_SIZE) * len(axes)):
+                    rng.random()
+            ratio, n_dominoes, n_skip, width = (axis[int(rng.random() * len(axis))] for axis in axes)
+            yield make_scenario(ratio, n_dominoes, n_skip, width)
+    else:
+        raise ValueError(f"Unknown sampling strategy {strategy!r}")
+
+
+def shard_range(shard, num_shards, total):
+    """Returns the [start, stop) scenario indices of `shard`."""
+    per_shard, extra = divmod(total, num_shards)
+    start = shard * per_shard + min(shard, extra)
+    return start, start + per_shard + (1 if shard < extra else 0)
+
+
+def shard_name(shard, num_shards, fmt):
+    return f"shard-{shard:05d}-of-{num_shards:05d}.{fmt}"
+
+
+def iter_shard(manifest, shard):
+    """Regenerates the scenarios of `shard` from a manifest without reading the
+    shard from disk."""
+    start, stop = shard_range(shard, manifest["num_shards"], manifest["total"])
+    return sample_scenarios(start, stop, **manifest["sampling"])
+
+
+def write_shards(out_dir, total, num_shards, shards=None, fmt="jsonl.gz", export_pl=False, **sampling):
+    """Writes `total` sampled scenarios as `num_shards` JSONL shards (only the
+    shards listed in `shards`, if given) plus a manifest describing the sample.
+    With `export_pl` every scenario is also written as a `.pl` file."""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {"total": total, "num_shards": num_shards, "format": fmt, "sampling": sampling}
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    for shard in range(num_shards) if shards is None else shards:
+        path = os.path.join(out_dir, shard_name(shard, num_shards, fmt))
+        start, _ = shard_range(shard, num_shards, total)
+        pl_dir = os.path.join(out_dir, "pl", f"shard-{shard:05d}")
+        if export_pl:
+            os.makedirs(pl_dir, exist_ok=True)
+        with open_shard(path, "wt") as f:
+            for i, scenario in enumerate(iter_shard(manifest, shard), start):
+                f.write(scenario.to_json() + "\n")
+                if export_pl:
+                    with open(os.path.join(pl_dir, f"scenario_{i}.pl"), "w") as pl_file:
+                        pl_file.write(scenario.to_prolog())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate scenarios. Without --count, writes the simple grid to scenarios/simple_<i>.pl."
+    )
+    parser.add_argument("--count", type=int, default=None, help="number of sampled scenarios")
+    parser.add_argument("--out", default="shards", help="output directory for shards")
+    parser.add_argument("--num-shards", type=int, default=1)
+    parser.add_argument("--shard", type=int, action="append", default=None, help="only write this shard (repeatable)")
+    parser.add_argument("--format", choices=["jsonl", "jsonl.gz"], default="jsonl.gz")
+    parser.add_argument("--export-pl", action="store_true", help="also write one .pl file per scenario")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--strategy", choices=["random", "stratified"], default="random")
+    parser.add_argument("--ratios", type=float, nargs="+", default=RATIOS)
+    parser.add_argument("--num-dominoes", type=int, nargs="+", default=NUM_DOMINOES)
+    parser.add_argument("--skip", type=int, nargs="+", default=SKIP)
+    parser.add_argument("--widths", type=float, nargs="+", default=WIDTHS)
+    args = parser.parse_args()
+
+    if args.count is None:
+        for i, s in enumerate(gen_simple()):
+            with open(f"scenarios/simple_{i}.pl", "w") as f:
+                f.write("\n".join(s) + "\n")
+        return
+
+    write_shards(
+        args.out,
+        args.count,
+        args.num_shards,
+        shards=args.shard,
+        fmt=args.format,
+        export_pl=args.export_pl,
+        seed=args.seed,
+        strategy=args.strategy,
+        ratios=args.ratios,
+        num_dominoes=args.num_dominoes,
+        skip=args.skip,
+        widths=args.widths,
+    )
 
 
 if __name__ == "__main__":
-    for i, s in enumerate(gen_simple()):
-        with open(f"scenarios/simple_{i}.pl", "w") as f:
-            f.write("\n".join(s) + "\n")
+    main()
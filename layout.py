@@ -0,0 +1,31 @@
+from array import array
+
+# Geometry shared with `world.get_world`
+START_X = 5  # Starting x position on the platform
+PLATFORM_TOP = 6  # Platform top surface y
+BOWLING_BALL_RADIUS = 0.5  # 0.5 meters radius
+
+
+def domino_xs(domino_spacing, domino_width, num_dominoes):
+    """x positions of the dominoes `get_world` creates, in creation order."""
+    return [START_X + i * (domino_width + domino_spacing) for i in range(int(num_dominoes))]
+
+
+def ball_x(domino_spacing, domino_width, num_dominoes, small_gap):
+    """x position of the bowling ball `get_world` creates."""
+    last_domino_x = START_X + (int(num_dominoes) - 1) * (domino_width + domino_spacing)
+    return last_domino_x + domino_width / 2 + BOWLING_BALL_RADIUS + small_gap
+
+
+def as_stored(values):
+    """Rounds positions the way Box2D stores them (single precision), so they
+    equal what `body.position` reads back."""
+    return array("f", values).tolist()
+
+
+def layout(domino_spacing=0.5, domino_width=0.2, domino_height=1.0, num_dominoes=20, small_gap=0.1, hole_size=0.1):
+    """Returns `(domino_positions, ball_position)` exactly as read from the
+    bodies of `get_world` with the same parameters, without building a world."""
+    dominoes = as_stored(domino_xs(domino_spacing, domino_width, num_dominoes))
+    ball = as_stored([ball_x(domino_spacing, domino_width, num_dominoes, small_gap)])[0]
+    return dominoes, ball
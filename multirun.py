@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Runs a hydra sweep of `run.py` headlessly, one job per core.
+
+Overrides take hydra's multirun form: `key=a,b,c` sweeps over the listed
+values and the jobs cover every combination. Each job is a separate
+`python run.py ... headless=true` process (pygame and hydra keep global
+state, so jobs cannot share one) that writes its output directory
+`OUT/<job>` and its status observables to `OUT/<job>/status.json`; the
+statuses are collected into `OUT/results.jsonl` in job order.
+
+    python multirun.py task=task_1,task_2,task_3 solver_profile=realtime,fast -j 8
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from itertools import product
+from multiprocessing.pool import ThreadPool
+
+RUN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "run.py")
+STATUS = "status.json"
+
+
+def expand_overrides(overrides):
+    """Every combination of the swept `key=a,b` overrides, as lists of
+    single-valued overrides. Values in brackets or quotes are not split."""
+    axes = []
+    for override in overrides:
+        key, sep, value = override.partition("=")
+        if not sep:
+            raise ValueError(f"Override {override!r} is not of the form key=value")
+        if value[:1] in "[{'\"" or "," not in value:
+            axes.append([override])
+        else:
+            axes.append([f"{key}={item}" for item in value.split(",")])
+    return [list(job) for job in product(*axes)]
+
+
+def run_job(args):
+    """Runs one job; returns its status (None if it wrote none), with the
+    overrides, return code and wall-clock time added."""
+    index, overrides, out_dir, timeout = args
+    job_dir = os.path.abspath(os.path.join(out_dir, str(index)))
+    command = [
+        sys.executable, RUN, *overrides, "headless=true", f"status={STATUS}",
+        f"hydra.run.dir={job_dir}", "hydra.job.chdir=true",
+    ]
+    os.makedirs(job_dir, exist_ok=True)
+    start = time.perf_counter()
+    with open(os.path.join(job_dir, "job.log"), "w") as log:
+        try:
+            returncode = subprocess.run(command, stdout=log, stderr=subprocess.STDOUT, timeout=timeout).returncode
+        except subprocess.TimeoutExpired:
+            returncode = None
+    try:
+        with open(os.path.join(job_dir, STATUS)) as f:
+            status = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        status = None
+    return {"job": index, "overrides": overrides, "returncode": returncode,
+            "seconds": time.perf_counter() - start, "status": status}
+
+
+def multirun(overrides, out_dir, processes=None, timeout=None):
+    """Yields the result of every job of the sweep in job order."""
+    jobs = expand_overrides(overrides)
+    with ThreadPool(processes=processes or os.cpu_count()) as pool:
+        yield from pool.imap(run_job, [(index, job, out_dir, timeout) for index, job in enumerate(jobs)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a sweep of run.py configs headlessly on every core.")
+    parser.add_argument("overrides", nargs="*", help="hydra overrides; key=a,b sweeps over a and b")
+    parser.add_argument("-o", "--out", default=os.path.join("multirun", time.strftime("%Y-%m-%d_%H-%M-%S")),
+                        help="output directory (default: multirun/<timestamp>)")
+    parser.add_argument("-j", "--processes", type=int, default=None, help="parallel jobs (default: all cores)")
+    parser.add_argument("--timeout", type=float, default=None, help="wall-clock seconds allowed per job")
+    args = parser.parse_args()
+
+    # Video is opt-in for sweeps: pass record=true to keep it
+    overrides = args.overrides
+    if not any(override.startswith("record=") for override in overrides):
+        overrides = ["record=false", *overrides]
+
+    os.makedirs(args.out, exist_ok=True)
+    failed = 0
+    with open(os.path.join(args.out, "results.jsonl"), "w") as f:
+        for result in multirun(overrides, args.out, args.processes, args.timeout):
+            f.write(json.dumps(result) + "\n")
+            f.flush()
+            if result["status"] is None:
+                failed += 1
+                print(f"job {result['job']} ({' '.join(result['overrides'])}) failed, see "
+                      f"{os.path.join(args.out, str(result['job']), 'job.log')}", file=sys.stderr)
+    print(f"Results in {os.path.join(args.out, 'results.jsonl')}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
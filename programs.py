@@ -1,6 +1,8 @@
 import math
 
-from classes import StructureRep
+import numpy as np
+
+from classes import StructureRep, StructureRepBatch
 
 # Domino Spacing and Alignment
 def get_abstract_feature_1(structure_rep: StructureRep) -> float:
@@ -129,4 +131,102 @@ def get_abstract_feature_5(structure_rep: StructureRep) -> float:
         # If any error occurs, return None
         res = None
     
-    return res
\ No newline at end of file
+    return res
+
+
+# Batch versions of the features above. Each takes a StructureRepBatch and
+# returns one float64 value per scenario, NaN where the scalar version returns
+# None, computed with the same operations in the same order.
+
+def _first_last(batch: StructureRepBatch):
+    # First and last domino positions, NaN for scenarios without dominoes
+    counts = batch.counts()
+    has_dominoes = counts > 0
+    first = np.full(len(batch), np.nan)
+    last = np.full(len(batch), np.nan)
+    first[has_dominoes] = batch.domino_positions[batch.offsets[:-1][has_dominoes]]
+    last[has_dominoes] = batch.domino_positions[batch.offsets[1:][has_dominoes] - 1]
+    return first, last
+
+
+def get_abstract_feature_1_batch(batch: StructureRepBatch) -> np.ndarray:
+    counts = batch.counts()
+    segments = batch.segments()
+
+    # Spacings between consecutive dominoes of the same scenario
+    same = segments[1:] == segments[:-1]
+    spacings = np.diff(batch.domino_positions)[same]
+    spacing_segments = segments[1:][same]
+
+    num_spacings = np.maximum(counts - 1, 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        average_spacing = np.bincount(spacing_segments, weights=spacings, minlength=len(batch)) / num_spacings
+
+    deviation = np.zeros(len(batch))
+    np.maximum.at(deviation, spacing_segments, np.abs(spacings - average_spacing[spacing_segments]))
+    tolerance = 0.01 * batch.domino_width
+    aligned = (counts >= 2) & (deviation <= tolerance)
+    return np.where(aligned, average_spacing, np.nan)
+
+
+def get_abstract_feature_2_batch(batch: StructureRepBatch) -> np.ndarray:
+    ball_volume = (4/3) * math.pi * (batch.ball_radius ** 3)
+    ball_mass = batch.ball_density * ball_volume
+    assumed_velocity = 1.0
+    return ball_mass * assumed_velocity
+
+
+def get_abstract_feature_3_batch(batch: StructureRepBatch) -> np.ndarray:
+    total_domino_width = batch.counts() * batch.domino_width
+    first, last = _first_last(batch)
+    center_domino_position = (first + last) / 2
+
+    # NaN comparisons are False, so scenarios without dominoes stay NaN
+    on_dominoes = ((batch.ball_position - batch.ball_radius >= first) &
+                   (batch.ball_position + batch.ball_radius <= last))
+    balance = np.abs(batch.ball_position - center_domino_position)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        res = 1 - (balance / (total_domino_width / 2))
+    return np.where(on_dominoes, res, np.nan)
+
+
+def get_abstract_feature_4_batch(batch: StructureRepBatch) -> np.ndarray:
+    _, last = _first_last(batch)
+    return batch.ball_position - last
+
+
+def get_abstract_feature_5_batch(batch: StructureRepBatch) -> np.ndarray:
+    domino_volume = batch.domino_width * batch.domino_height
+    domino_density = 1.0
+    domino_mass = domino_volume * domino_density
+
+    ball_volume = (4/3) * 3.14159 * (batch.ball_radius ** 3)
+    ball_mass = ball_volume * batch.ball_density
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mass_variation = np.where(ball_mass != 0, domino_mass / ball_mass, np.nan)
+        size_variation = np.where(batch.ball_radius != 0, batch.domino_height / (2 * batch.ball_radius), np.nan)
+    return mass_variation * size_variation
+
+
+BATCH_FEATURES = {
+    get_abstract_feature_1: get_abstract_feature_1_batch,
+    get_abstract_feature_2: get_abstract_feature_2_batch,
+    get_abstract_feature_3: get_abstract_feature_3_batch,
+    get_abstract_feature_4: get_abstract_feature_4_batch,
+    get_abstract_feature_5: get_abstract_feature_5_batch,
+}
+
+
+def get_feature_matrix(batch: StructureRepBatch, programs) -> np.ndarray:
+    """Evaluates `programs` (scalar feature functions) on every scenario of
+    `batch` and returns an (n_scenarios, n_programs) matrix with NaN for None.
+    Programs without a batch version are evaluated one rep at a time."""
+    columns = []
+    for program in programs:
+        if program in BATCH_FEATURES:
+            columns.append(BATCH_FEATURES[program](batch))
+        else:
+            values = [program(batch[i]) for i in range(len(batch))]
+            columns.append(np.array([np.nan if v is None else v for v in values], dtype=np.float64))
+    return np.stack(columns, axis=1) if columns else np.zeros((len(batch), 0))
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import random
+import time
+
+
+class LLMBackend:
+    """Completes prompts with an `openai_hf_interface` LLM. Its blocking
+    `prompt` call (and disk cache) runs in a worker thread."""
+
+    def __init__(self, llm):
+        self.llm = llm
+
+    async def complete(self, prompt, **kwargs):
+        outputs = await asyncio.to_thread(self.llm.prompt, [prompt], **kwargs)
+        return outputs[0]
+
+
+# Completion of the offline backend when no canned response matches: a valid
+# feature function that always returns None
+DEFAULT_OFFLINE_TEMPLATE = """\
+def get_abstract_feature(structure_rep: StructureRep) -> float:
+    res = None
+    return res
+"""
+
+
+class OfflineBackend:
+    """Stand-in backend that needs no network. A prompt is answered from
+    `responses` (prompt -> completion) if present, otherwise from `template`,
+    formatted with `prompt` and the running call `index`. `latency` seconds
+    are awaited per call to mimic a remote service."""
+
+    def __init__(self, responses=None, template=DEFAULT_OFFLINE_TEMPLATE, latency=0.0):
+        self.responses = responses or {}
+        self.template = template
+        self.latency = latency
+        self.calls = 0
+
+    async def complete(self, prompt, **kwargs):
+        index = self.calls
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if prompt in self.responses:
+            return self.responses[prompt]
+        return self.template.format(prompt=prompt, index=index)
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average and bursts of up to
+    `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class PromptRunner:
+    """Sends prompts to a backend with at most `concurrency` requests in
+    flight, at most `rate` requests per second (None for no limit), and up to
+    `retries` retries with exponential backoff and jitter on failure.
+
+    Identical requests (same prompt and keyword arguments) that are in flight
+    at the same time share one backend call. `timeout` bounds each attempt
+    in seconds (None leaves it to the backend)."""
+
+    def __init__(self, backend, concurrency=8, rate=None, burst=None, retries=3, backoff=1.0, max_backoff=30.0,
+                 timeout=None):
+        self.backend = backend
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.stats = {"requests": 0, "calls": 0, "deduplicated": 0, "retries": 0, "failures": 0, "seconds": 0.0}
+        self._in_flight = {}
+        self._semaphore = None
+        self._bucket = None
+
+    def _limits(self):
+        # Created lazily, inside the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            if self.rate:
+                self._bucket = TokenBucket(self.rate, self.burst)
+
+    async def _call(self, prompt, kwargs):
+        self._limits()
+        for attempt in range(self.retries + 1):
+            async with self._semaphore:
+                if self._bucket is not None:
+                    await self._bucket.acquire()
+                self.stats["calls"] += 1
+                start = time.perf_counter()
+                try:
+                    call = self.backend.complete(prompt, **kwargs)
+                    result = await (asyncio.wait_for(call, self.timeout) if self.timeout else call)
+                    self.stats["seconds"] += time.perf_counter() - start
+                    return result
+                except Exception:
+                    self.stats["seconds"] += time.perf_counter() - start
+                    if attempt == self.retries:
+                        self.stats["failures"] += 1
+                        raise
+            self.stats["retries"] += 1
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+            await asyncio.sleep(delay * (0.5 + random.random() / 2))
+
+    async def run(self, prompt, **kwargs):
+        """Returns the completion of one prompt."""
+        self.stats["requests"] += 1
+        key = (prompt, json.dumps(kwargs, sort_keys=True, default=str))
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.stats["deduplicated"] += 1
+            return await asyncio.shield(future)
+        future = asyncio.ensure_future(self._call(prompt, kwargs))
+        self._in_flight[key] = future
+        future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def run_many(self, prompts, **kwargs):
+        """Returns the completions of `prompts`, in order."""
+        return await asyncio.gather(*(self.run(prompt, **kwargs) for prompt in prompts))
+
+    def prompt(self, prompts, **kwargs):
+        """Blocking `run_many`, for callers without an event loop."""
+        self._semaphore = self._bucket = None
+        return asyncio.run(self.run_many(prompts, **kwargs))
@@ -1,16 +1,17 @@
+import os
+import json
+import time
 import pygame
 import logging
-from Box2D import (
-    b2World, b2PolygonShape, b2CircleShape,
-    b2_dynamicBody, b2_staticBody, b2ContactListener, b2RevoluteJointDef
-)
-import imageio
-import numpy as np
+from Box2D import b2_dynamicBody
 import hydra
-import matplotlib.pyplot as plt
 
-from classes import ContactListener, Button, Slider, StructureRep
-from world import get_world, to_pygame, draw_world_on_screen
+from classes import StructureRep
+from ui import Button, Slider
+from world import get_world, to_pygame, draw_world_on_screen, WorldTemplate, WorldRenderer
+from capture import VideoRecorder
+import solver
+from trajectory import TrajectoryRecorder
 
 
 # init_logger() # Don't need this if already using hydra
@@ -31,16 +32,34 @@ def get_values(sliders, config):
         return slider_values
 
 
+def stop_reason(beam_body, dynamic_bodies):
+    """Why a headless run ends now, or None: the stop rules of
+    `world.simulate_world`."""
+    if beam_body.angle > 0.2:
+        return "cup_tipped"
+    if beam_body.angle < -0.2:
+        return "beam_tipped"
+    if not any(body.awake for body in dynamic_bodies):
+        return "at_rest"
+    return None
+
+
 @hydra.main(version_base=None, config_path="conf", config_name="config")
 def main(config):
+    # Without a window the simulation starts immediately, runs as fast as it
+    # can, and ends when the beam tips, everything is at rest, or after DURATION
+    if config.headless:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
     # Initialize Pygame
     pygame.init()
 
     # Screen dimensions and conversion factor
     SCREEN_WIDTH, SCREEN_HEIGHT = 800, 800
     PPM = 20.0  # Pixels per meter
-    TARGET_FPS = 60
-    TIME_STEP = 1.0 / TARGET_FPS
+    profile = solver.get_profile(config.solver_profile)
+    TIME_STEP = profile.time_step
+    TARGET_FPS = round(1 / TIME_STEP)
     DURATION = 15  # Duration of the simulation in seconds
 
     # Pygame setup
@@ -60,8 +79,15 @@ def main(config):
     ball_moving_right = False
     beam_tip = "neutral"
 
-    # Create a video writer using imageio
-    video_writer = imageio.get_writer(f'domino_simulation_balance_beam_{config.task}.mp4', fps=TARGET_FPS)
+    # Frames are encoded on a background thread; see capture.py
+    recorder = None
+    if config.record:
+        recorder = VideoRecorder(f'domino_simulation_balance_beam_{config.task}.mp4', fps=TARGET_FPS,
+                                 every=config.record_every, scale=config.record_scale,
+                                 max_queue=config.record_queue,
+                                 # Without a window there is no frame rate to keep up with,
+                                 # so wait for the encoder rather than drop frames
+                                 block=config.headless)
 
 
     domino_spacing_slider = Slider('domino_spacing', 100, 50, 600, 20, 2)
@@ -73,11 +99,26 @@ def main(config):
     sliders = [domino_spacing_slider, domino_width_slider, domino_height_slider, num_dominoes_slider, small_gap_slider, hole_size_slider]
     start_button = Button(350, 400, 100, 50, "Start", font, GRAY, (170, 170, 170), BLACK)
 
+    # The world is only rebuilt (in place) when the parameters change
+    template = WorldTemplate()
+    world, first_domino_body, last_domino_body, bowling_ball_body, beam_body, _, _ = template.reset(*get_values(sliders, config))
+    renderer = WorldRenderer(world)
+
+    # Body states are recorded from the start of the run; a rebuilt world
+    # starts a new file (<name>_<k>.npy)
+    trajectory = None
+    trajectory_runs = 0
+
     # Simulation loop
     running = True
-    game_started = False
+    game_started = config.headless
     frame_count = 0
     total_frames = DURATION * TARGET_FPS  # Total number of frames to record
+    dynamic_bodies = None
+    reason = None
+    # Drawing is only needed for the window or the video
+    draw = not config.headless or recorder is not None
+    start_time = time.perf_counter()
     
     # if config.task != 'slider':
     #     slider_values = get_values([], config)
@@ -87,7 +128,7 @@ def main(config):
     #     print(rep)
         
     #     screen.fill(WHITE)
-    #     draw_world_on_screen(world, screen)
+    #     draw_world_on_screen(world, screen, renderer)
         
     #     frame = pygame.surfarray.array3d(screen)
     #     # Convert from (width, height, channels) to (height, width, channels)
@@ -116,12 +157,18 @@ def main(config):
             if start_button.handle_event(event):
                 game_started = True  # Set the flag to True to indicate game has started
                 
-            world, first_domino_body, last_domino_body, bowling_ball_body, beam_body, _, _ = get_world(*slider_values)
+            if tuple(slider_values) != template.values:
+                world, first_domino_body, last_domino_body, bowling_ball_body, beam_body, _, _ = template.reset(*slider_values)
+                renderer.refresh()
+                dynamic_bodies = None
+                if trajectory is not None:
+                    trajectory.close()
+                    trajectory = None
 
         # Clear screen
-        screen.fill(WHITE)
-        
-        draw_world_on_screen(world, screen)
+        if draw:
+            screen.fill(WHITE)
+            draw_world_on_screen(world, screen, renderer)
         
         if not game_started:
             # Draw the slider and display its current value
@@ -168,31 +215,75 @@ def main(config):
                 f"Beam Tip: {beam_tip}"
             ]
 
-            for i, text in enumerate(status_texts):
-                rendered_text = font.render(text, True, BLACK)
-                screen.blit(rendered_text, (10, 10 + i * 20))
+            if draw:
+                for i, text in enumerate(status_texts):
+                    rendered_text = font.render(text, True, BLACK)
+                    screen.blit(rendered_text, (10, 10 + i * 20))
                 
+            if config.trajectory and trajectory is None:
+                root, ext = os.path.splitext(config.trajectory)
+                path = config.trajectory if trajectory_runs == 0 else f'{root}_{trajectory_runs}{ext}'
+                trajectory = TrajectoryRecorder(path, template.domino_bodies, [bowling_ball_body], beam_body,
+                                                world.contactListener, total_frames, config.trajectory_stride,
+                                                task=config.task, values=list(template.values), time_step=TIME_STEP)
+                trajectory_runs += 1
+            if trajectory is not None:
+                trajectory.record(frame_count)
+
+            if config.headless:
+                if dynamic_bodies is None:
+                    dynamic_bodies = [body for body in world.bodies if body.type == b2_dynamicBody]
+                reason = stop_reason(beam_body, dynamic_bodies)
+                if reason is not None:
+                    break
+
             # Update physics
-            world.Step(TIME_STEP, 10, 10)
+            world.contactListener.step = frame_count
+            solver.step(world, profile)
             world.ClearForces()
 
-        # Capture the screen surface as an image
-        frame = pygame.surfarray.array3d(screen)
-        # Convert from (width, height, channels) to (height, width, channels)
-        frame = np.transpose(frame, (1, 0, 2))
-        # Write the frame to the video
-        video_writer.append_data(frame)
+        # Capture the screen surface for the video
+        if recorder is not None:
+            recorder.capture(screen)
 
         # Update display
-        pygame.display.flip()
-        clock.tick(TARGET_FPS)
+        if not config.headless:
+            pygame.display.flip()
+            clock.tick(TARGET_FPS)
+
+        frame_count += 1
+        if config.headless and frame_count >= total_frames:
+            reason = "duration"
+            running = False
 
-        # frame_count += 1
-        # if frame_count >= total_frames:
-        #     running = False
+    if game_started:
+        status = {
+            "task": config.task,
+            "values": list(template.values),
+            "solver_profile": profile.name,
+            "first_domino_tipped": first_domino_tipped,
+            "last_domino_tipped": last_domino_tipped,
+            "domino_ball_contact": bool(world.contactListener.domino_ball_contact),
+            "ball_moving_right": ball_moving_right,
+            "ball_contact_top": bool(world.contactListener.ball_contact_top),
+            "ball_contact_bottom": bool(world.contactListener.ball_contact_bottom),
+            "beam_tip": beam_tip,
+            "stop": reason,
+            "steps": frame_count,
+            "simulated_seconds": frame_count * TIME_STEP,
+            "wall_seconds": time.perf_counter() - start_time,
+        }
+        log.info(f'Status: {json.dumps(status)}')
+        if config.status:
+            with open(config.status, 'w') as f:
+                json.dump(status, f, indent=2)
 
     # Clean up
-    video_writer.close()
+    if trajectory is not None:
+        trajectory.close()
+    if recorder is not None:
+        recorder.close()
+        log.info(f'Video capture: {recorder.stats()}')
     pygame.quit()
     
 if __name__ == '__main__':
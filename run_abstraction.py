@@ -1,22 +1,38 @@
 #!/usr/bin/env python3
 
+import argparse
 import os
-import sys
 
+from chain import will_cup
+from dominos import simulate
+from scenario import load_scenario
+from tip_oracle import ensure_prolog_export
 
-def main(scenario):
-    scenario_name = os.path.basename(scenario).split(".")[0]
+
+def prolog_predict(path, scenario):
+    scenario_name = os.path.basename(path).split(".")[0]
     pl_name = f"/tmp/dominos_{scenario_name}.pl"
-    os.system(f"cat {scenario} dominos.pl > {pl_name}")
+    with open("dominos.pl") as f:
+        rules = f.read()
+    with open(pl_name, "w") as f:
+        f.write(scenario.to_prolog() + rules)
+
+    ensure_prolog_export()
+    return os.system(f"swipl -q -f {pl_name}") == 0
+
 
-    actual = os.system(f"python3.11 dominos.py {scenario}")
-    predicted = os.system(f"swipl -q -f {pl_name}")
+def main(path, prolog=False):
+    scenario = load_scenario(path)
+    actual = simulate(scenario).cup_tipped
+    # The native evaluator implements the rules of dominos.pl in-process; see chain.py
+    predicted = prolog_predict(path, scenario) if prolog else will_cup(scenario)
 
-    print(scenario, 1 if actual == 0 else 0, 1 if predicted == 0 else 0)
+    print(path, 1 if actual else 0, 1 if predicted else 0)
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        sys.exit("Usage: run_abstraction.py <file>")
-    scenario = sys.argv[1]
-    main(scenario)
+    parser = argparse.ArgumentParser(description="Compare the simulated and abstracted outcome of a scenario.")
+    parser.add_argument("file", help="scenario .pl file")
+    parser.add_argument("--prolog", action="store_true", help="evaluate the abstraction with swipl instead of chain.py")
+    args = parser.parse_args()
+    main(args.file, args.prolog)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+import dominos
+import solver
+from scenario import load_scenarios
+
+
+def _init_worker():
+    # Box2D is imported together with `dominos` when the pool forks; touching it
+    # here also warms workers started with the "spawn" method.
+    import Box2D  # noqa: F401
+
+
+def _simulate(args):
+    scenario, kwargs = args
+    start = time.perf_counter()
+    try:
+        result = dominos.simulate(scenario, **kwargs)._asdict()
+        result["error"] = None
+    except Exception as e:
+        result = {"scenario": scenario.name, "cup_tipped": None, "error": repr(e)}
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def run_batch(scenarios, processes=None, trajectory_dir=None, **kwargs):
+    """Simulates every Scenario on a pool of warm worker processes. Keyword
+    arguments are passed on to `dominos.simulate`. With `trajectory_dir` every
+    run is recorded to `<trajectory_dir>/<scenario digest>.npy`.
+
+    Yields one result dict per scenario (the Verdict fields, including the stop
+    rule that ended the run, plus `seconds` and `error`) in completion order."""
+    if trajectory_dir is None:
+        tasks = [(scenario, kwargs) for scenario in scenarios]
+    else:
+        tasks = [
+            (scenario, dict(kwargs, trajectory=os.path.join(trajectory_dir, f"{scenario.digest()}.npy")))
+            for scenario in scenarios
+        ]
+    with Pool(processes=processes, initializer=_init_worker) as pool:
+        yield from pool.imap_unordered(_simulate, tasks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a directory of scenarios in parallel.")
+    parser.add_argument("scenarios", help="scenario file, shard, or directory of .pl scenarios and shards")
+    parser.add_argument("-j", "--processes", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--duration", type=float, default=dominos.DURATION, help="simulated seconds per scenario")
+    parser.add_argument("--timeout", type=float, default=None, help="wall-clock seconds allowed per scenario")
+    parser.add_argument("--check-every", type=int, default=None,
+                        help=f"steps between checks of the stop rules (default: every {dominos.CHECK_INTERVAL:g} s)")
+    parser.add_argument("--lazy", choices=("sleep", "data"), default=None,
+                        help="activate dominoes only as the wave reaches them (see wavefront.py)")
+    parser.add_argument("--profile", default=solver.DEFAULT_PROFILE,
+                        help=f"solver profile: {', '.join(solver.PROFILES)} or calibrated")
+    parser.add_argument("--no-early-stop", action="store_true", help="only stop when the cup tips or the duration ends")
+    parser.add_argument("--reuse-worlds", action="store_true",
+                        help="reset one world per worker instead of building one per scenario (faster, but verdicts "
+                             "of borderline scenarios can depend on which scenarios the worker ran before)")
+    parser.add_argument("--trajectories", default=None, help="record every run's trajectory into this directory")
+    parser.add_argument("--trajectory-stride", type=int, default=1, help="steps between recorded trajectory rows")
+    args = parser.parse_args()
+
+    results = run_batch(
+        load_scenarios(args.scenarios),
+        args.processes,
+        duration=args.duration,
+        timeout=args.timeout,
+        check_every=args.check_every,
+        early_stop=not args.no_early_stop,
+        reuse_world=args.reuse_worlds,
+        trajectory_dir=args.trajectories,
+        trajectory_stride=args.trajectory_stride,
+        profile=args.profile,
+        lazy=args.lazy,
+    )
+    for result in results:
+        print(json.dumps(result), flush=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
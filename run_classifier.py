@@ -1,14 +1,12 @@
 
 import hydra
 import logging
-from openai_hf_interface import choose_provider, create_llm
 
-from sklearn.linear_model import LogisticRegression
 
 
 from programs import *
-from world import get_world
-from classes import StructureRep
+from classes import StructureRep, StructureRepBatch
+from training import FeatureStore, OnlineClassifier, program_names
 
 
 # init_logger() # Don't need this if already using hydra
@@ -29,11 +27,6 @@ def get_values(task):
 
 @hydra.main(version_base=None, config_path="conf", config_name="config")
 def main(config):
-    logging.getLogger("requests").setLevel(logging.WARNING)
-    logging.getLogger("openai").setLevel(logging.WARNING)
-    
-    choose_provider(config.provider)
-    
     programs = [get_abstract_feature_1,
                 get_abstract_feature_2, 
                 # get_abstract_feature_3, 
@@ -41,31 +34,30 @@ def main(config):
                 get_abstract_feature_5]
 
 
-    all_features = []
+    tasks = ['task_1', 'task_2', 'task_3']
     all_ys = [1, 0, 1]
-    for task in ['task_1', 'task_2', 'task_3']:
+    reps = []
+    for task in tasks:
         values = get_values(task)
 
-        world, first_domino_body, last_domino_body, bowling_ball_body, beam_body, domino_bodies, ball_body = get_world(*values)
-        rep = StructureRep(domino_bodies, ball_body)
-        
-        features = [f(rep) for f in programs]
-        
-        log.info(f'Feature for task {task} = {features}')
-        all_features.append(features)
-            
-    
-    model = LogisticRegression(
-        penalty='l1',         # L2 regularization by default
-        solver='liblinear',   # Recommended solver for small or binary datasets
-        max_iter=1000,         # Increase if the model struggles to converge
-        verbose=True
-    )
-
-    # Fit the model
-    model.fit(all_features * 10, all_ys * 10)   
-    log.info(model.coef_)
+        # Same positions as the bodies of get_world(*values), without Box2D
+        reps.append(StructureRep.from_params(*values))
 
+    # One vectorized pass over all reps; NaN where a feature is undefined
+    all_features = get_feature_matrix(StructureRepBatch.from_reps(reps), programs)
+    for task, features in zip(tasks, all_features):
+        log.info(f'Feature for task {task} = {features.tolist()}')
+    
+    # The three task rows are one immutable batch of the feature store; the
+    # checkpointed model only trains on batches it has not seen yet, so rerunning
+    # costs nothing and batches added with `training.py add` are picked up here
+    store = FeatureStore(config.feature_store)
+    store.append(all_features, all_ys, program_names(programs), name='tasks')
+    model = OnlineClassifier.load(config.classifier_checkpoint, program_names(programs),
+                                  passes=config.classifier_passes)
+    new = model.update(store, config.classifier_checkpoint)
+    log.info(f'Trained on {len(new)} new batches ({model.rows} rows in total)')
+    log.info(model.coefficients())
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
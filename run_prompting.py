@@ -1,10 +1,10 @@
 
 import hydra
 import logging
-from openai_hf_interface import choose_provider, create_llm
 
 
 from prompts import *
+from prompting import LLMBackend, OfflineBackend, PromptRunner
 
 
 # init_logger() # Don't need this if already using hydra
@@ -17,11 +17,20 @@ def main(config):
     logging.getLogger("requests").setLevel(logging.WARNING)
     logging.getLogger("openai").setLevel(logging.WARNING)
     
-    choose_provider(config.provider)
-
-    llm = create_llm('gpt-4o-2024-08-06' if config.provider == 'openai' else 'openai/gpt-4o-2024-08-06')
-    llm.setup_cache('disk', database_path=config.database_path)
-    llm.set_default_kwargs({'timeout': 60})
+    # The offline backend needs no provider or network; see prompting.py
+    if config.prompt_backend == 'offline':
+        backend = OfflineBackend(latency=config.prompt_offline_latency)
+    else:
+        from openai_hf_interface import choose_provider, create_llm
+
+        choose_provider(config.provider)
+
+        llm = create_llm('gpt-4o-2024-08-06' if config.provider == 'openai' else 'openai/gpt-4o-2024-08-06')
+        llm.setup_cache('disk', database_path=config.database_path)
+        llm.set_default_kwargs({'timeout': config.prompt_timeout})
+        backend = LLMBackend(llm)
+    runner = PromptRunner(backend, concurrency=config.prompt_concurrency, rate=config.prompt_rate,
+                          retries=config.prompt_retries)
     
     abstract_features = [
         "Domino Spacing and Alignment",
@@ -31,8 +40,9 @@ def main(config):
         "Domino Size and Mass Variation",
     ]
     
-    outputs = llm.prompt([abstract_feature_prompt.format(abstract_feature=abstract_feature) for abstract_feature in abstract_features], 
-                         temperature = 0)
+    outputs = runner.prompt([abstract_feature_prompt.format(abstract_feature=abstract_feature) for abstract_feature in abstract_features], 
+                            temperature = 0)
+    log.info(f'Prompting: {runner.stats}')
     
     for abstract_feature, output in zip(abstract_features, outputs):
         log.info(f'Abstract feature = "{abstract_feature}"')
@@ -0,0 +1,140 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+from array import array
+
+# One pass over the Prolog text picks up every fact of the scenario format:
+# width(W). height(H). push(domino(X)). domino(X). ball_x(X).
+_FACT_RE = re.compile(r"\b(width|height|push\(domino|domino|ball_x)\(\s*([-+0-9.eE]+)\s*\)\)?\s*\.")
+
+SHARD_SUFFIXES = (".jsonl", ".jsonl.gz")
+
+
+class Scenario:
+    """Immutable scenario record: domino width and height, the x position of the
+    pushed domino, and the domino and ball x positions as read-only
+    memoryviews of float64 (`tolist()`, `tobytes()`, indexing and the buffer
+    protocol work as on the `array('d')` behind them). The positions are
+    copied on construction, so neither the caller nor a reader can change the
+    scenario's hash or digest.
+
+    `name` identifies where the scenario came from (a file path or a shard
+    entry) and is not part of its identity."""
+
+    __slots__ = ("width", "height", "push", "dominoes", "balls", "name")
+
+    def __init__(self, width, height, push, dominoes, balls, name=None):
+        set_field = object.__setattr__
+        set_field(self, "width", width)
+        set_field(self, "height", height)
+        set_field(self, "push", push)
+        set_field(self, "dominoes", memoryview(array("d", dominoes)).toreadonly())
+        set_field(self, "balls", memoryview(array("d", balls)).toreadonly())
+        set_field(self, "name", name)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Scenario is immutable")
+
+    def __reduce__(self):
+        return (Scenario, (self.width, self.height, self.push, self.dominoes.tolist(), self.balls.tolist(), self.name))
+
+    def _key(self):
+        return (self.width, self.height, self.push, self.dominoes.tobytes(), self.balls.tobytes())
+
+    def __eq__(self, other):
+        return isinstance(other, Scenario) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return (
+            f"Scenario(width={self.width!r}, height={self.height!r}, push={self.push!r}, "
+            f"dominoes={list(self.dominoes)!r}, balls={list(self.balls)!r})"
+        )
+
+    def digest(self):
+        """Content hash of the scenario, stable across processes and runs."""
+        return hashlib.sha1(self.to_json().encode()).hexdigest()
+
+    def with_name(self, name):
+        return Scenario(self.width, self.height, self.push, self.dominoes, self.balls, name)
+
+    def facts(self):
+        """Returns the Prolog facts of the scenario, in the order the `.pl`
+        files have always used."""
+        facts = [f"width({self.width}).", f"height({self.height}).", f"push(domino({self.push}))."]
+        facts.extend(f"domino({x})." for x in self.dominoes)
+        facts.extend(f"ball_x({x})." for x in self.balls)
+        return facts
+
+    def to_prolog(self):
+        return "\n".join(self.facts()) + "\n"
+
+    def to_json(self):
+        return json.dumps(
+            [self.width, self.height, self.push, self.dominoes.tolist(), self.balls.tolist()],
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def from_json(cls, line, name=None):
+        width, height, push, dominoes, balls = json.loads(line)
+        return cls(width, height, push, dominoes, balls, name)
+
+
+def parse_scenario(scenario_text, name=None):
+    """Parses the `width/height/push/domino/ball_x` fact format in one pass."""
+    width = height = push = None
+    dominoes = array("d")
+    balls = array("d")
+    for match in _FACT_RE.finditer(scenario_text):
+        fact, value = match.groups()
+        if fact == "domino":
+            dominoes.append(float(value))
+        elif fact == "ball_x":
+            balls.append(float(value))
+        elif fact == "width":
+            width = float(value) if width is None else width
+        elif fact == "height":
+            height = float(value) if height is None else height
+        elif push is None:
+            push = float(value)
+    return Scenario(width, height, push, dominoes, balls, name)
+
+
+def load_scenario(path):
+    with open(path, "r") as f:
+        return parse_scenario(f.read(), path)
+
+
+def open_shard(path, mode="rt"):
+    """Opens a `.jsonl` or `.jsonl.gz` shard."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def read_shard(path):
+    """Yields the scenarios stored one JSON record per line in a shard, named
+    `<path>:<line index>`."""
+    with open_shard(path) as f:
+        for i, line in enumerate(f):
+            if line.strip():
+                yield Scenario.from_json(line, f"{path}:{i}")
+
+
+def load_scenarios(path):
+    """Loads every scenario under `path`: a `.pl` file, a shard, or a directory
+    of `.pl` files and shards (sorted by file name)."""
+    if os.path.isdir(path):
+        scenarios = []
+        for entry in sorted(os.scandir(path), key=lambda entry: entry.name):
+            if entry.is_file() and (entry.name.endswith(".pl") or entry.name.endswith(SHARD_SUFFIXES)):
+                scenarios.extend(load_scenarios(entry.path))
+        return scenarios
+    if path.endswith(SHARD_SUFFIXES):
+        return list(read_shard(path))
+    return [load_scenario(path)]
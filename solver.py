@@ -0,0 +1,70 @@
+"""Named Box2D solver settings for the simulation entry points.
+
+A profile fixes the time step, the velocity and position iterations passed to
+`b2World.Step`, and the speeds below which the early-stop rules of
+`dominos.py` count a body as at rest. (Box2D's own sleep tolerances are
+compile-time constants that pybox2d cannot change.) `calibrate.py` measures
+which profiles reproduce the verdicts of `reference` on a scenario corpus.
+"""
+
+import json
+import os
+from collections import namedtuple
+
+Profile = namedtuple(
+    "Profile",
+    ["name", "time_step", "velocity_iterations", "position_iterations", "rest_speed", "rest_angular_speed"],
+)
+
+
+def _profile(name, fps, velocity_iterations, position_iterations, rest_speed=0.05, rest_angular_speed=0.05):
+    return Profile(name, 1.0 / fps, velocity_iterations, position_iterations, rest_speed, rest_angular_speed)
+
+
+PROFILES = {
+    profile.name: profile
+    for profile in (
+        # High accuracy, for calibration
+        _profile("reference", 240, 30, 30, rest_speed=0.02, rest_angular_speed=0.02),
+        # The settings `dominos.py` always used
+        _profile("default", 120, 10, 10),
+        # The settings `world.py` and `run.py` always used
+        _profile("realtime", 60, 10, 10),
+        # Box2D's recommended iteration counts
+        _profile("fast", 120, 8, 3),
+        _profile("coarse", 60, 8, 3),
+    )
+}
+DEFAULT_PROFILE = "default"
+
+# Written by `calibrate.py --save`; names the profile `get_profile("calibrated")`
+# returns
+CALIBRATION_PATH = os.environ.get(
+    "SOLVER_CALIBRATION_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "solver_calibration.json")
+)
+
+
+def get_profile(profile=DEFAULT_PROFILE):
+    """Returns a Profile given one or its name. "calibrated" is the profile
+    last chosen by `calibrate.py --save`, or the default if there is none."""
+    if isinstance(profile, Profile):
+        return profile
+    if profile == "calibrated":
+        try:
+            with open(CALIBRATION_PATH) as f:
+                profile = json.load(f)["profile"]
+        except FileNotFoundError:
+            profile = DEFAULT_PROFILE
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"Unknown solver profile {profile!r}; expected one of {', '.join(PROFILES)}") from None
+
+
+def frames(profile, duration):
+    """Number of steps that simulate `duration` seconds."""
+    return int(round(duration / profile.time_step))
+
+
+def step(world, profile):
+    world.Step(profile.time_step, profile.velocity_iterations, profile.position_iterations)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import sys
+import time
+from itertools import product
+from multiprocessing import Pool
+
+import numpy as np
+
+import solver
+import world as world_lib
+
+# The `get_world` parameters, in call order
+PARAMS = ("domino_spacing", "domino_width", "domino_height", "num_dominoes", "small_gap", "hole_size")
+
+# Default ranges, matching the sliders in `run.py` (every value at least 0.1,
+# at least one domino)
+BOUNDS = {
+    "domino_spacing": (0.1, 2.0),
+    "domino_width": (0.1, 2.0),
+    "domino_height": (0.1, 2.0),
+    "num_dominoes": (1, 20),
+    "small_gap": (0.1, 2.0),
+    "hole_size": (0.1, 2.0),
+}
+
+# Stored columns of the result table besides `index` and the parameters
+OUTCOME_DTYPES = {
+    "cup_tipped": np.bool_,
+    "last_domino_tipped": np.bool_,
+    "domino_ball_contact": np.bool_,
+    "ball_contact_bottom": np.bool_,
+    "cup_step": np.int32,
+    "last_domino_step": np.int32,
+    "domino_ball_step": np.int32,
+    "ball_beam_step": np.int32,
+    "steps": np.int32,
+    "start_step": np.int32,
+    "error": np.bool_,
+}
+
+
+def grid_design(axes):
+    """Full factorial design. `axes` maps a parameter name to its values;
+    missing parameters are fixed at the `get_world` defaults."""
+    defaults = world_lib.get_world.__defaults__
+    values = [axes.get(name, [default]) for name, default in zip(PARAMS, defaults)]
+    return np.array(list(product(*values)), dtype=np.float64).reshape(-1, len(PARAMS))
+
+
+def random_design(n, bounds=BOUNDS, seed=0):
+    """`n` points drawn uniformly within `bounds`; `num_dominoes` is drawn as
+    an integer."""
+    rng = np.random.default_rng(seed)
+    columns = []
+    for name in PARAMS:
+        low, high = bounds[name]
+        if name == "num_dominoes":
+            columns.append(rng.integers(int(low), int(high), endpoint=True, size=n).astype(np.float64))
+        else:
+            columns.append(rng.uniform(low, high, size=n))
+    return np.stack(columns, axis=1)
+
+
+def _chunk_path(out_dir, chunk):
+    return os.path.join(out_dir, f"chunk-{chunk:06d}.npz")
+
+
+def _save_npz(path, **columns):
+    # Write then rename, so an interrupted sweep never leaves a partial chunk
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, **columns)
+    os.replace(tmp_path, path)
+
+
+_template = None
+
+
+def _run_chunk(args):
+    global _template
+    out_dir, chunk, start, points, duration, share_prefix, profile, reuse_worlds = args
+    # A reset world can differ from a fresh one in the last bits, so reuse is
+    # opt-in: otherwise results would depend on what the worker ran before
+    if reuse_worlds and _template is None:
+        _template = world_lib.WorldTemplate()
+
+    columns = {name: np.full(len(points), -1 if dtype is np.int32 else False, dtype=dtype)
+               for name, dtype in OUTCOME_DTYPES.items()}
+    points_values = [[int(v) if name == "num_dominoes" else float(v) for name, v in zip(PARAMS, values)]
+                     for values in points]
+    if share_prefix:
+        try:
+            results = world_lib.simulate_worlds(points_values, duration, _template, profile=profile)
+        except Exception:
+            # Fall back to one run per point, which isolates the failing ones
+            if reuse_worlds:
+                _template = world_lib.WorldTemplate()
+            results = [None] * len(points)
+    else:
+        results = [None] * len(points)
+
+    for i, values in enumerate(points_values):
+        if results[i] is None:
+            try:
+                results[i] = (world_lib.simulate_world(values, duration, _template, profile), 0)
+            except Exception:
+                columns["error"][i] = True
+                if reuse_worlds:
+                    _template = world_lib.WorldTemplate()
+                continue
+        outcome, start_step = results[i]
+        for name, value in outcome._asdict().items():
+            columns[name][i] = value
+        columns["start_step"][i] = start_step
+
+    _save_npz(_chunk_path(out_dir, chunk), index=np.arange(start, start + len(points), dtype=np.int64),
+              params=points, **columns)
+    return chunk, len(points)
+
+
+def run_sweep(out_dir, design=None, chunk_size=1000, processes=None, duration=world_lib.DURATION, share_prefix=False,
+              profile=world_lib.PROFILE, reuse_worlds=False):
+    """Simulates every point of `design` (an (n, 6) array in PARAMS order) on
+    a process pool, writing results in chunks of `chunk_size` points to
+    `out_dir`.
+
+    The design and settings are stored in `out_dir/design.npz` on the first
+    call. Calling again on the same directory (with or without `design`)
+    resumes: chunks already on disk are skipped. Yields `(chunk, points)` as
+    chunks complete.
+
+    With `share_prefix`, points of a chunk that only differ in `small_gap`
+    and `hole_size` share the start of their simulation (see
+    `world.simulate_worlds`); grid designs list those points next to each
+    other. The `start_step` column records where a point was forked.
+    `profile` names the solver profile (see solver.py). With `reuse_worlds`
+    each worker resets one `world.WorldTemplate` instead of building a world
+    per point, which is faster but makes borderline outcomes depend on the
+    points the worker simulated before."""
+    os.makedirs(out_dir, exist_ok=True)
+    design_path = os.path.join(out_dir, "design.npz")
+    if os.path.exists(design_path):
+        stored = np.load(design_path)
+        if design is not None and not np.array_equal(stored["points"], design):
+            raise ValueError(f"{out_dir} holds a different design; use a new directory")
+        design = stored["points"]
+        chunk_size = int(stored["chunk_size"])
+        duration = float(stored["duration"])
+        share_prefix = bool(stored["share_prefix"]) if "share_prefix" in stored.files else False
+        profile = str(stored["profile"]) if "profile" in stored.files else world_lib.PROFILE
+        reuse_worlds = bool(stored["reuse_worlds"]) if "reuse_worlds" in stored.files else False
+    elif design is None:
+        raise ValueError(f"No design given and none stored in {out_dir}")
+    else:
+        _save_npz(design_path, points=design, params=np.array(PARAMS), chunk_size=chunk_size, duration=duration,
+                  share_prefix=share_prefix, profile=solver.get_profile(profile).name, reuse_worlds=reuse_worlds)
+
+    tasks = [
+        (out_dir, chunk, start, design[start:start + chunk_size], duration, share_prefix, profile, reuse_worlds)
+        for chunk, start in enumerate(range(0, len(design), chunk_size))
+        if not os.path.exists(_chunk_path(out_dir, chunk))
+    ]
+    if not tasks:
+        return
+    with Pool(processes=processes) as pool:
+        yield from pool.imap_unordered(_run_chunk, tasks)
+
+
+def load_results(out_dir):
+    """Merges the completed chunks into one table: a dict of columns, one row
+    per finished point ordered by design index, with one column per
+    parameter."""
+    chunks = sorted(entry.path for entry in os.scandir(out_dir)
+                    if entry.name.startswith("chunk-") and entry.name.endswith(".npz") and ".tmp" not in entry.name)
+    if not chunks:
+        return {}
+    loaded = [np.load(path) for path in chunks]
+    table = {name: np.concatenate([chunk[name] for chunk in loaded]) for name in ("index", "params", *OUTCOME_DTYPES)}
+    order = np.argsort(table["index"], kind="stable")
+    table = {name: column[order] for name, column in table.items()}
+    params = table.pop("params")
+    for i, name in enumerate(PARAMS):
+        table[name] = params[:, i]
+    return table
+
+
+def _parse_axes(specs, parse):
+    axes = {}
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if name not in PARAMS:
+            raise SystemExit(f"Unknown parameter {name!r}; expected one of {', '.join(PARAMS)}")
+        axes[name] = parse(values)
+    return axes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep the world.get_world parameters headlessly.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run (or resume) a sweep")
+    run_parser.add_argument("out", help="sweep directory")
+    run_parser.add_argument("--grid", metavar="NAME=V1,V2,...", action="append", default=[],
+                            help="grid values of one parameter (repeatable)")
+    run_parser.add_argument("--random", type=int, metavar="N", default=None, help="number of random points")
+    run_parser.add_argument("--bounds", metavar="NAME=LOW:HIGH", action="append", default=[],
+                            help="random range of one parameter (repeatable)")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--chunk-size", type=int, default=1000)
+    run_parser.add_argument("--duration", type=float, default=world_lib.DURATION, help="simulated seconds per point")
+    run_parser.add_argument("--share-prefix", action="store_true",
+                            help="fork points that only differ in small_gap and hole_size from a shared run")
+    run_parser.add_argument("--profile", default=world_lib.PROFILE,
+                            help=f"solver profile: {', '.join(solver.PROFILES)} or calibrated")
+    run_parser.add_argument("--reuse-worlds", action="store_true",
+                            help="reset one world per worker instead of building one per point (faster, but "
+                                 "borderline outcomes can depend on the points the worker ran before)")
+    run_parser.add_argument("-j", "--processes", type=int, default=None, help="worker processes (default: all cores)")
+
+    merge_parser = subparsers.add_parser("merge", help="merge finished chunks into results.npz")
+    merge_parser.add_argument("out", help="sweep directory")
+    args = parser.parse_args()
+
+    if args.command == "merge":
+        table = load_results(args.out)
+        _save_npz(os.path.join(args.out, "results.npz"), **table)
+        print(json.dumps({"points": len(table.get("index", [])),
+                          "cup_tipped": int(table["cup_tipped"].sum()) if table else 0}))
+        return
+
+    design = None
+    if args.random is not None:
+        bounds = dict(BOUNDS, **_parse_axes(args.bounds, lambda v: tuple(float(x) for x in v.split(":"))))
+        design = random_design(args.random, bounds, args.seed)
+    elif args.grid:
+        design = grid_design(_parse_axes(args.grid, lambda v: [float(x) for x in v.split(",")]))
+
+    start = time.perf_counter()
+    done = 0
+    for chunk, points in run_sweep(args.out, design, args.chunk_size, args.processes, args.duration,
+                                   args.share_prefix, args.profile, args.reuse_worlds):
+        done += points
+        print(json.dumps({"chunk": chunk, "points": done, "seconds": time.perf_counter() - start}), flush=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""Differential tests of the native evaluator in chain.py against the rules
+of dominos.pl, evaluated by datalog.py and, if installed, by swipl."""
+
+import os
+import random
+import shutil
+
+import pytest
+
+import chain
+import datalog
+from scenario import Scenario
+
+RULES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dominos.pl")
+
+# Heights far enough from the critical angle of a 0.2 wide domino that
+# tipping.static_tip answers without simulating: 0.5 stays, 1.0 and 1.5 tip
+HEIGHTS = (0.5, 1.0, 1.5)
+
+
+def random_scenarios(count, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        dominoes = [round(rng.uniform(0, 10), 1) for _ in range(rng.randint(0, 8))]
+        balls = [round(rng.uniform(0, 12), 1) for _ in range(rng.randint(0, 3))]
+        push = rng.choice(dominoes) if dominoes and rng.random() < 0.9 else 3.0
+        yield Scenario(0.2, rng.choice(HEIGHTS), push, dominoes, balls)
+
+
+@pytest.fixture(scope="module")
+def rules():
+    with open(RULES) as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("tips", [True, False])
+def test_chain_matches_datalog(rules, tips):
+    program = datalog.Program(rules, shell=datalog.tip_shell(lambda width, height: tips))
+    for scenario in random_scenarios(2000, seed=int(tips)):
+        expected = program.holds(datalog.scenario_facts(scenario))
+        assert chain.will_cup(scenario, lambda width, height: tips) == expected, scenario.to_prolog()
+
+
+@pytest.mark.skipif(shutil.which("swipl") is None, reason="swipl is not installed")
+def test_chain_matches_swipl():
+    import tipping
+
+    for height in HEIGHTS:
+        # Puts the answers in tip_cache.pl, so swipl does not shell out
+        tipping.will_tip(0.2, height)
+    for scenario in random_scenarios(50, seed=2):
+        assert chain.will_cup(scenario) == chain.prolog_will_cup(scenario, RULES), scenario.to_prolog()
@@ -0,0 +1,57 @@
+"""Worlds reset in place (`dominos.WorldTemplate`, `world.WorldTemplate`)."""
+
+import os
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("Box2D")
+
+import dominos
+import world
+from scenario import load_scenarios
+
+SCENARIOS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scenarios")
+
+
+def test_dominos_template_survives_resets():
+    scenarios = load_scenarios(SCENARIOS)[:3]
+    template = dominos.WorldTemplate()
+    for scenario in scenarios + scenarios:
+        template.reset(scenario.width, scenario.height, scenario.push, scenario.dominoes, scenario.balls)
+        template.world.Step(dominos.TIME_STEP, 10, 10)
+    for scenario in scenarios:
+        assert dominos.simulate(scenario, duration=2, reuse_world=True).stop_reason != "timeout"
+
+
+def test_world_template_survives_resets():
+    template = world.WorldTemplate()
+    # Changing the domino count recreates the dominoes; the ball is recreated on every reset
+    for values in ([0.5, 0.2, 1.0, 4, 0.1, 0.1], [0.5, 0.2, 1.0, 6, 0.6, 0.1], [0.5, 0.2, 1.0, 6, 0.1, 0.1]):
+        world.simulate_world(values, duration=2, template=template)
+
+
+def test_reused_worlds_match_fresh_worlds():
+    # One template for the whole corpus, as in a run_batch.py --reuse-worlds worker
+    scenarios = load_scenarios(SCENARIOS)
+    fresh = [dominos.simulate(scenario).cup_tipped for scenario in scenarios]
+    reused = [dominos.simulate(scenario, reuse_world=True).cup_tipped for scenario in scenarios]
+    assert reused == fresh
+
+
+def test_world_template_matches_fresh_worlds():
+    # The run.py presets, in an order that both moves and recreates dominoes
+    template = world.WorldTemplate()
+    for values in ([0.5, 0.2, 1.0, 4, 0.1, 0], [0.5, 0.2, 1.0, 22, 2, 0], [0.5, 0.2, 1.0, 6, 0.6, 0],
+                   [0.5, 0.2, 1.0, 4, 0.1, 0]):
+        assert world.simulate_world(values, template=template).cup_tipped == world.simulate_world(values).cup_tipped
+
+
+def test_benchmark_reuse_worlds():
+    import benchmark
+
+    scenarios = load_scenarios(SCENARIOS)
+    fresh = benchmark.run_benchmark(scenarios)
+    reused = benchmark.run_benchmark(scenarios, reuse_world=True)
+    assert [record["actual"] for record in reused["records"]] == [record["actual"] for record in fresh["records"]]
+    assert reused["summary"]["confusion"] == fresh["summary"]["confusion"]
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""Memoized answers to "does a single pushed domino of this size tip over?".
+
+Answers are computed with the same 3 second single-domino simulation that
+`will-tip.py` used to run on every call, and stored in an SQLite database that
+is shared by all processes. Every entry is keyed by the simulation settings
+fingerprint, so changing any physics constant below invalidates old answers.
+The entries for the current settings are also exported as `tip_cache/3` facts
+that `dominos.pl` consults, so Prolog never launches a process for a known
+width and height.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+
+# Physics settings of the tipping simulation. Anything that can change the
+# outcome belongs in SETTINGS so that it ends up in the fingerprint.
+TARGET_FPS = 60
+TIME_STEP = 1.0 / TARGET_FPS
+DURATION = 3  # Duration of the simulation in seconds
+PUSH_ANGLE = -0.3  # Initial tilt of the pushed domino
+SETTINGS = {
+    "time_step": TIME_STEP,
+    "velocity_iterations": 10,
+    "position_iterations": 10,
+    "duration": DURATION,
+    "gravity": -10,
+    "density": 1.0,
+    "friction": 0.3,
+    "tipped_angle": 0.5,
+    "platform": (12.5, 5, 12.5, 1),
+    "start_x": 5,
+}
+
+CACHE_PATH = os.environ.get(
+    "TIP_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tip_cache.db")
+)
+PROLOG_CACHE_PATH = os.environ.get(
+    "TIP_CACHE_PROLOG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tip_cache.pl")
+)
+
+
+def settings_fingerprint(settings=SETTINGS):
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def simulate_tip(domino_width, domino_height, angle=PUSH_ANGLE, settings=SETTINGS):
+    """Simulates one domino resting on the platform with an initial tilt and
+    returns whether it tips over (|angle| > tipped_angle) within the duration."""
+    from Box2D import b2World, b2PolygonShape
+
+    # Box2D world setup
+    world = b2World(gravity=(0, settings["gravity"]), doSleep=True)
+
+    # Elevated platform (the ledge)
+    platform_x, platform_y, platform_hw, platform_hh = settings["platform"]
+    world.CreateStaticBody(
+        position=(platform_x, platform_y),
+        shapes=b2PolygonShape(box=(platform_hw, platform_hh)),
+    )
+
+    start_y = platform_y + platform_hh + domino_height / 2  # Domino center y
+    body = world.CreateDynamicBody(position=(settings["start_x"], start_y), angle=angle)
+    body.CreatePolygonFixture(
+        box=(domino_width / 2, domino_height / 2),
+        density=settings["density"],
+        friction=settings["friction"],
+    )
+
+    total_frames = int(round(settings["duration"] / settings["time_step"]))
+    for _ in range(total_frames):
+        if abs(body.angle) > settings["tipped_angle"]:
+            return True
+
+        # Update physics
+        world.Step(settings["time_step"], settings["velocity_iterations"], settings["position_iterations"])
+        world.ClearForces()
+
+    return False
+
+
+class TipCache:
+    """SQLite-backed (width, height, angle, settings) -> tipped table.
+
+    WAL mode lets any number of processes read while one writes; writers wait
+    on the busy timeout instead of failing."""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS tips ("
+            "width REAL, height REAL, angle REAL, settings TEXT, tipped INTEGER, "
+            "PRIMARY KEY (width, height, angle, settings))"
+        )
+
+    def get(self, width, height, angle, settings):
+        row = self.conn.execute(
+            "SELECT tipped FROM tips WHERE width=? AND height=? AND angle=? AND settings=?",
+            (width, height, angle, settings),
+        ).fetchone()
+        return None if row is None else bool(row[0])
+
+    def put(self, width, height, angle, settings, tipped):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO tips VALUES (?, ?, ?, ?, ?)",
+            (width, height, angle, settings, int(tipped)),
+        )
+
+    def entries(self, angle, settings):
+        return self.conn.execute(
+            "SELECT width, height, tipped FROM tips WHERE angle=? AND settings=? ORDER BY width, height",
+            (angle, settings),
+        ).fetchall()
+
+
+_memo = {}
+_cache = None
+FINGERPRINT = settings_fingerprint()
+
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        _cache = TipCache()
+    return _cache
+
+
+def will_tip(domino_width, domino_height, angle=PUSH_ANGLE):
+    """Cached `simulate_tip` for the current settings."""
+    key = (float(domino_width), float(domino_height), float(angle))
+    tipped = _memo.get(key)
+    if tipped is not None:
+        return tipped
+
+    cache = _get_cache()
+    tipped = cache.get(*key, FINGERPRINT)
+    if tipped is None:
+        tipped = simulate_tip(*key)
+        cache.put(*key, FINGERPRINT, tipped)
+        if key[2] == PUSH_ANGLE:
+            export_prolog()
+    _memo[key] = tipped
+    return tipped
+
+
+def record(domino_width, domino_height, angle, tipped):
+    """Stores an answer obtained without simulating (statics or the table
+    in tipping.py), so the Prolog export covers it too."""
+    key = (float(domino_width), float(domino_height), float(angle))
+    if key in _memo:
+        return
+    cache = _get_cache()
+    if cache.get(*key, FINGERPRINT) is None:
+        cache.put(*key, FINGERPRINT, tipped)
+        if key[2] == PUSH_ANGLE:
+            export_prolog()
+    _memo[key] = tipped
+
+
+def export_prolog(path=PROLOG_CACHE_PATH):
+    """Writes the cached answers for the default push angle as `tip_cache/3`
+    facts. The file is replaced atomically so concurrent readers never see a
+    partial file, and exports are serialized by a lock file so that an
+    export that read the cache earlier cannot replace a later one."""
+    import fcntl
+
+    with open(f"{path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        lines = [f"% settings {FINGERPRINT}\n"]
+        for width, height, tipped in _get_cache().entries(PUSH_ANGLE, FINGERPRINT):
+            lines.append(f"tip_cache({width!r}, {height!r}, {tipped}).\n")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.writelines(lines)
+        os.replace(tmp_path, path)
+
+
+def ensure_prolog_export(path=PROLOG_CACHE_PATH):
+    """Re-exports the Prolog facts if they were written under other settings."""
+    try:
+        with open(path) as f:
+            if f.readline().strip() == f"% settings {FINGERPRINT}":
+                return
+    except FileNotFoundError:
+        pass
+    export_prolog(path)
+
+
+def main():
+    if len(sys.argv) == 2 and sys.argv[1] == "export":
+        export_prolog()
+        return 0
+    if len(sys.argv) != 3:
+        sys.exit("Usage: tip_oracle.py WIDTH HEIGHT | tip_oracle.py export")
+    return 0 if will_tip(float(sys.argv[1]), float(sys.argv[2])) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
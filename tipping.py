@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""Fast answers to "does a pushed domino of this width and height tip over?".
+
+Queries are answered, in order, by
+  1. rigid-body statics: a box released at rest on its corner tips iff its
+     center of mass is past the pivot corner, i.e. |angle| > atan(width / height).
+     Box2D first pushes the tilted domino out of the platform, so the static
+     answer is only trusted at least STATIC_MARGIN away from that threshold;
+  2. a precomputed (width, height, angle) grid of simulation outcomes
+     (`python tipping.py build`), interpolated and trusted only when every
+     grid point with nonzero weight agrees;
+  3. the cached simulation in `tip_oracle`, i.e. only near the decision boundary.
+
+Answers from statics and the table are recorded in the `tip_oracle` cache as
+well, so the Prolog export covers every width and height queried so far.
+`python tipping.py build` checks STATIC_MARGIN against the simulated grid.
+"""
+
+import math
+import os
+import sys
+from itertools import product
+
+import tip_oracle
+from tip_oracle import PUSH_ANGLE
+
+STATIC_MARGIN = 0.1  # rad
+TABLE_PATH = os.environ.get(
+    "TIPPING_TABLE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tipping_table.npz")
+)
+
+# Default sweep of the table
+TABLE_WIDTHS = [round(0.05 * i, 2) for i in range(1, 21)]  # 0.05 .. 1.0
+TABLE_HEIGHTS = [round(0.1 * i, 1) for i in range(1, 51)]  # 0.1 .. 5.0
+TABLE_ANGLES = [round(-0.05 * i, 2) for i in range(12, 0, -1)]  # -0.6 .. -0.05
+
+
+def static_tip(domino_width, domino_height, angle=PUSH_ANGLE, margin=STATIC_MARGIN):
+    """Returns whether the domino tips according to statics, or None when the
+    tilt is within `margin` of the critical angle."""
+    critical = math.atan2(domino_width, domino_height)
+    tilt = abs(angle)
+    if tilt > critical + margin:
+        return True
+    if tilt < critical - margin:
+        return False
+    return None
+
+
+class TippingTable:
+    """Grid of simulated tipping outcomes over sorted width, height and angle axes."""
+
+    def __init__(self, widths, heights, angles, tipped, fingerprint):
+        self.widths = widths
+        self.heights = heights
+        self.angles = angles
+        self.tipped = tipped
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, widths=TABLE_WIDTHS, heights=TABLE_HEIGHTS, angles=TABLE_ANGLES, processes=None):
+        from multiprocessing import Pool
+
+        import numpy as np
+
+        points = list(product(widths, heights, angles))
+        with Pool(processes=processes) as pool:
+            outcomes = pool.starmap(tip_oracle.simulate_tip, points, chunksize=64)
+        tipped = np.array(outcomes, dtype=np.uint8).reshape(len(widths), len(heights), len(angles))
+        return cls(
+            np.array(widths, dtype=np.float64),
+            np.array(heights, dtype=np.float64),
+            np.array(angles, dtype=np.float64),
+            tipped,
+            tip_oracle.FINGERPRINT,
+        )
+
+    def save(self, path=TABLE_PATH):
+        import numpy as np
+
+        np.savez_compressed(
+            path,
+            widths=self.widths,
+            heights=self.heights,
+            angles=self.angles,
+            tipped=self.tipped,
+            fingerprint=np.array(self.fingerprint),
+        )
+
+    @classmethod
+    def load(cls, path=TABLE_PATH):
+        import numpy as np
+
+        with np.load(path) as data:
+            return cls(
+                data["widths"], data["heights"], data["angles"], data["tipped"], str(data["fingerprint"])
+            )
+
+    def lookup(self, domino_width, domino_height, angle=PUSH_ANGLE):
+        """Returns the trilinearly interpolated tipping outcome if every grid
+        point with nonzero weight agrees, or None outside the grid or near the
+        decision boundary."""
+        import numpy as np
+
+        corners = []
+        for axis, value in ((self.widths, domino_width), (self.heights, domino_height), (self.angles, angle)):
+            if not axis[0] <= value <= axis[-1]:
+                return None
+            if len(axis) == 1:
+                # A single grid point: the value equals it
+                corners.append((0, 0, 0.0))
+                continue
+            hi = min(max(int(np.searchsorted(axis, value)), 1), len(axis) - 1)
+            corners.append((hi - 1, hi, (value - axis[hi - 1]) / (axis[hi] - axis[hi - 1])))
+
+        (w0, w1, tw), (h0, h1, th), (a0, a1, ta) = corners
+        cell = self.tipped[np.ix_([w0, w1], [h0, h1], [a0, a1])].astype(np.float64)
+        cell = cell[0] * (1 - tw) + cell[1] * tw
+        cell = cell[0] * (1 - th) + cell[1] * th
+        p = cell[0] * (1 - ta) + cell[1] * ta
+        if p > 1 - 1e-9:
+            return True
+        if p < 1e-9:
+            return False
+        return None
+
+    def static_disagreements(self, margin=STATIC_MARGIN):
+        """Grid points where `static_tip` answers and differs from the
+        simulation, as `(width, height, angle, simulated)`."""
+        disagreements = []
+        for (i, width), (j, height), (k, angle) in product(
+            enumerate(self.widths), enumerate(self.heights), enumerate(self.angles)
+        ):
+            tipped = static_tip(float(width), float(height), float(angle), margin)
+            if tipped is not None and tipped != bool(self.tipped[i, j, k]):
+                disagreements.append((float(width), float(height), float(angle), bool(self.tipped[i, j, k])))
+        return disagreements
+
+
+_table = None
+_table_loaded = False
+
+
+def _get_table():
+    """Loads the table once per process; tables built under other simulation
+    settings are ignored."""
+    global _table, _table_loaded
+    if not _table_loaded:
+        _table_loaded = True
+        if os.path.exists(TABLE_PATH):
+            table = TippingTable.load(TABLE_PATH)
+            if table.fingerprint == tip_oracle.FINGERPRINT:
+                _table = table
+    return _table
+
+
+def will_tip(domino_width, domino_height, angle=PUSH_ANGLE):
+    tipped = static_tip(domino_width, domino_height, angle)
+    if tipped is None:
+        table = _get_table()
+        if table is not None:
+            tipped = table.lookup(domino_width, domino_height, angle)
+    if tipped is None:
+        return tip_oracle.will_tip(domino_width, domino_height, angle)
+
+    tip_oracle.record(domino_width, domino_height, angle, tipped)
+    return tipped
+
+
+def main():
+    # `will-tip.py` imports this module once per query, so the CLI and pool
+    # modules are only loaded when needed
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tipping oracle and table builder.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="simulate the default grid into the table")
+    build_parser.add_argument("-j", "--processes", type=int, default=None)
+    build_parser.add_argument("--output", default=TABLE_PATH)
+    query_parser = subparsers.add_parser("query", help="exit 0 if the domino tips, 1 otherwise")
+    query_parser.add_argument("width", type=float)
+    query_parser.add_argument("height", type=float)
+    query_parser.add_argument("angle", type=float, nargs="?", default=PUSH_ANGLE)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        table = TippingTable.build(processes=args.processes)
+        disagreements = table.static_disagreements()
+        if disagreements:
+            for width, height, angle, simulated in disagreements:
+                print(f"statics disagree with the simulation at width {width}, height {height}, angle {angle} "
+                      f"(simulated: {'tips' if simulated else 'stays'})", file=sys.stderr)
+            print(f"STATIC_MARGIN = {STATIC_MARGIN} is too small; the table was not saved", file=sys.stderr)
+            return 1
+        table.save(args.output)
+        return 0
+    return 0 if will_tip(args.width, args.height, args.angle) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""Incremental training of the cup classifier on a store of feature batches.
+
+A feature store is a directory of `.npz` batches, each holding the feature
+matrix of some scenarios (NaN where a feature program returned None), their
+labels and their digests. `OnlineClassifier` consumes batches it has not seen
+yet with `SGDClassifier.partial_fit` and checkpoints itself after each one,
+so adding a batch costs time proportional to that batch only.
+
+Missing values are handled with masks: every feature gets an indicator
+column that is 1 where the value is missing, and the value itself is
+replaced by the running mean of that feature, i.e. 0 after standardization.
+"""
+
+import argparse
+import json
+import os
+import pickle
+import sys
+
+import numpy as np
+
+from scenario import load_scenarios
+
+
+def _save_npz(path, **columns):
+    # Write then rename, so a reader never sees a partial batch
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, **columns)
+    os.replace(tmp_path, path)
+
+
+class FeatureStore:
+    """Directory of feature batches, consumed in name order."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, f"{name}.npz")
+
+    def names(self):
+        return sorted(f[:-len(".npz")] for f in os.listdir(self.directory)
+                      if f.endswith(".npz") and not f.endswith(".tmp.npz"))
+
+    def append(self, features, labels, programs, scenarios=None, name=None):
+        """Writes a batch and returns its name. Batches are immutable: an
+        existing `name` is left as it is. Default names sort in insertion
+        order."""
+        if name is None:
+            names = [n for n in self.names() if n.startswith("batch_")]
+            name = f"batch_{int(names[-1][len('batch_'):]) + 1 if names else 0:06d}"
+        path = self.path(name)
+        if not os.path.exists(path):
+            features = np.asarray(features, dtype=np.float64)
+            _save_npz(path, features=features, labels=np.asarray(labels, dtype=np.int8),
+                      programs=np.array(programs),
+                      scenarios=np.array(scenarios if scenarios is not None else [""] * len(features)))
+        return name
+
+    def load(self, name):
+        with np.load(self.path(name)) as batch:
+            return {key: batch[key] for key in batch.files}
+
+
+def program_names(programs):
+    return [getattr(program, "__name__", str(program)) for program in programs]
+
+
+class OnlineClassifier:
+    """Logistic regression trained by SGD, one store batch at a time.
+
+    The model sees `2 * len(programs)` inputs: the standardized features,
+    with missing values at the running mean, and their missing indicators.
+    Standardization statistics are accumulated over every value seen so far.
+    `passes` repeats each batch, like replicating rows did for the old
+    LogisticRegression fit."""
+
+    def __init__(self, programs, alpha=1e-3, penalty="l1", passes=1, seed=0):
+        from sklearn.linear_model import SGDClassifier
+
+        self.programs = list(programs)
+        self.model = SGDClassifier(loss="log_loss", penalty=penalty, alpha=alpha, random_state=seed)
+        self.passes = passes
+        n = len(self.programs)
+        self.count = np.zeros(n)
+        self.total = np.zeros(n)
+        self.total_sq = np.zeros(n)
+        self.consumed = []
+        self.rows = 0
+
+    def _update_stats(self, features):
+        seen = ~np.isnan(features)
+        values = np.where(seen, features, 0.0)
+        self.count += seen.sum(axis=0)
+        self.total += values.sum(axis=0)
+        self.total_sq += (values ** 2).sum(axis=0)
+
+    def transform(self, features):
+        """`[standardized features, missing mask]` with missing values at 0."""
+        features = np.asarray(features, dtype=np.float64)
+        missing = np.isnan(features)
+        count = np.maximum(self.count, 1)
+        mean = self.total / count
+        std = np.sqrt(np.maximum(self.total_sq / count - mean ** 2, 0.0))
+        std[std == 0] = 1.0
+        scaled = np.where(missing, 0.0, (features - mean) / std)
+        return np.hstack([scaled, missing.astype(np.float64)])
+
+    def partial_fit(self, features, labels):
+        features = np.asarray(features, dtype=np.float64)
+        if features.shape[1] != len(self.programs):
+            raise ValueError(f"expected {len(self.programs)} features, got {features.shape[1]}")
+        self._update_stats(features)
+        inputs = self.transform(features)
+        for _ in range(self.passes):
+            self.model.partial_fit(inputs, labels, classes=np.array([0, 1]))
+        self.rows += len(features)
+        return self
+
+    def predict_proba(self, features):
+        return self.model.predict_proba(self.transform(features))[:, 1]
+
+    def predict(self, features):
+        return self.model.predict(self.transform(features))
+
+    def coefficients(self):
+        """`{program: (feature weight, missing weight)}`."""
+        weights = self.model.coef_[0]
+        n = len(self.programs)
+        return {program: (weights[i], weights[n + i]) for i, program in enumerate(self.programs)}
+
+    def update(self, store, checkpoint=None):
+        """Trains on every batch of `store` not consumed yet, in name order,
+        checkpointing after each one. Returns the names of the new batches."""
+        new = [name for name in store.names() if name not in self.consumed]
+        for name in new:
+            batch = store.load(name)
+            if list(batch["programs"]) != self.programs:
+                raise ValueError(f"batch {name} has programs {list(batch['programs'])}, expected {self.programs}")
+            self.partial_fit(batch["features"], batch["labels"])
+            self.consumed.append(name)
+            if checkpoint:
+                self.save(checkpoint)
+        return new
+
+    def save(self, path):
+        # The state is pickled rather than the object, so a checkpoint written
+        # by `python training.py` loads from other scripts too
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self.__dict__, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, programs, **kwargs):
+        """The checkpointed classifier, or a new one if there is none yet.
+        `passes` applies to the batches trained from now on; the model
+        settings (`alpha`, `penalty`, `seed`) must match the checkpoint's."""
+        if os.path.exists(path):
+            classifier = cls.__new__(cls)
+            with open(path, "rb") as f:
+                classifier.__dict__.update(pickle.load(f))
+            if classifier.programs != list(programs):
+                raise ValueError(f"checkpoint {path} was trained on programs {classifier.programs}")
+            if "passes" in kwargs:
+                classifier.passes = kwargs.pop("passes")
+            params = classifier.model.get_params()
+            for name, param in (("alpha", "alpha"), ("penalty", "penalty"), ("seed", "random_state")):
+                if name in kwargs and kwargs[name] != params[param]:
+                    raise ValueError(f"checkpoint {path} was trained with {name}={params[param]!r}, "
+                                     f"not {kwargs[name]!r}")
+            return classifier
+        return cls(programs, **kwargs)
+
+
+def read_labels(results_path):
+    """`{scenario name: cup_tipped}` from a `run_batch.py` JSONL file; runs
+    that failed or timed out are left out."""
+    labels = {}
+    with open(results_path) as f:
+        for line in f:
+            result = json.loads(line)
+            if result.get("cup_tipped") is not None:
+                labels[result["scenario"]] = int(result["cup_tipped"])
+    return labels
+
+
+def add_scenarios(store, scenarios, labels, programs, name=None):
+    """Computes the features of the labeled `scenarios` and appends them to
+    `store` as one batch; returns its name, or None if none are labeled."""
+    from classes import StructureRepBatch
+    from programs import get_feature_matrix
+
+    scenarios = [scenario for scenario in scenarios if scenario.name in labels]
+    if not scenarios:
+        return None
+    features = get_feature_matrix(StructureRepBatch.from_scenarios(scenarios), programs)
+    return store.append(features, [labels[scenario.name] for scenario in scenarios], program_names(programs),
+                        [scenario.digest() for scenario in scenarios], name)
+
+
+def default_programs():
+    import programs
+
+    return [programs.get_abstract_feature_1, programs.get_abstract_feature_2,
+            programs.get_abstract_feature_4, programs.get_abstract_feature_5]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grow a feature store and train the cup classifier on it.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    add = subparsers.add_parser("add", help="append the features of simulated scenarios as a new batch")
+    add.add_argument("store", help="feature store directory")
+    add.add_argument("scenarios", help="scenario file, shard, or directory")
+    add.add_argument("results", help="run_batch.py JSONL results for the scenarios")
+    add.add_argument("--name", default=None, help="batch name (default: next batch_NNNNNN)")
+    fit = subparsers.add_parser("fit", help="train on the batches not seen by the checkpoint")
+    fit.add_argument("store", help="feature store directory")
+    fit.add_argument("--checkpoint", default="classifier.pkl", help="model checkpoint, created if missing")
+    fit.add_argument("--passes", type=int, default=1, help="SGD passes over each new batch")
+    args = parser.parse_args()
+
+    store = FeatureStore(args.store)
+    programs = default_programs()
+    if args.command == "add":
+        name = add_scenarios(store, load_scenarios(args.scenarios), read_labels(args.results), programs, args.name)
+        print(name or "no labeled scenarios", file=sys.stderr)
+        return 0
+
+    classifier = OnlineClassifier.load(args.checkpoint, program_names(programs), passes=args.passes)
+    new = classifier.update(store, args.checkpoint)
+    print(f"trained on {len(new)} new batches, {classifier.rows} rows in total", file=sys.stderr)
+    if not classifier.rows:
+        return 1
+    for program, (weight, missing_weight) in classifier.coefficients().items():
+        print(f"{program}: {weight:+.4f} (missing {missing_weight:+.4f})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
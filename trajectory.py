@@ -0,0 +1,101 @@
+import json
+import os
+
+import numpy as np
+
+# Order of the `contacts` flags, as returned by ContactListener.get_contacts
+CONTACT_FLAGS = ("domino_ball", "ball_top", "ball_beam")
+
+
+def trajectory_dtype(num_bodies):
+    """One row per recorded step. Body columns hold the dominoes followed by the
+    balls, in creation order."""
+    return np.dtype([
+        ("step", np.int32),
+        ("position", np.float32, (num_bodies, 2)),
+        ("angle", np.float32, (num_bodies,)),
+        ("linear_velocity", np.float32, (num_bodies, 2)),
+        ("angular_velocity", np.float32, (num_bodies,)),
+        ("beam_angle", np.float32),
+        ("beam_angular_velocity", np.float32),
+        ("contacts", np.bool_, (len(CONTACT_FLAGS),)),
+    ])
+
+
+def _meta_path(path):
+    return path + ".json"
+
+
+class TrajectoryRecorder:
+    """Records the state of a world every `stride` steps into a preallocated
+    `.npy` file that is memory-mapped while recording.
+
+    The file has room for `max_steps // stride + 1` rows; the number of rows
+    actually written is stored with the other metadata in `<path>.json` by
+    `close`. Steps beyond the capacity are counted as dropped."""
+
+    def __init__(self, path, domino_bodies, ball_bodies, beam_body, contact_listener, max_steps, stride=1, **meta):
+        self.path = path
+        self.bodies = list(domino_bodies) + list(ball_bodies)
+        self.beam_body = beam_body
+        self.contact_listener = contact_listener
+        self.stride = max(1, int(stride))
+        self.rows = 0
+        self.dropped = 0
+        self.meta = dict(meta, num_dominoes=len(domino_bodies), num_balls=len(ball_bodies))
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.data = np.lib.format.open_memmap(
+            path, mode="w+", dtype=trajectory_dtype(len(self.bodies)), shape=(max_steps // self.stride + 1,)
+        )
+
+    def record(self, step):
+        """Stores the current state as `step` if it falls on the stride."""
+        if step % self.stride:
+            return
+        if self.rows == len(self.data):
+            self.dropped += 1
+            return
+        bodies = self.bodies
+        self.data[self.rows] = (
+            step,
+            [tuple(body.position) for body in bodies],
+            [body.angle for body in bodies],
+            [tuple(body.linearVelocity) for body in bodies],
+            [body.angularVelocity for body in bodies],
+            self.beam_body.angle,
+            self.beam_body.angularVelocity,
+            self.contact_listener.get_contacts(),
+        )
+        self.rows += 1
+
+    def close(self, **meta):
+        """Flushes the rows and writes the metadata, including `meta`."""
+        self.data.flush()
+        self.meta.update(meta)
+        self.meta.update(rows=self.rows, stride=self.stride, dropped=self.dropped)
+        with open(_meta_path(self.path), "w") as f:
+            json.dump(self.meta, f, indent=2)
+        self.data = None
+        return self.meta
+
+
+def load_trajectory(path):
+    """Returns `(rows, meta)` for one recording, where `rows` is a read-only
+    memory-mapped view of the recorded rows (nothing is copied)."""
+    with open(_meta_path(path)) as f:
+        meta = json.load(f)
+    return np.load(path, mmap_mode="r")[:meta["rows"]], meta
+
+
+def load_trajectories(path):
+    """Loads every recording in a directory (sorted by file name), or the
+    recordings listed in `path`, as a list of `(rows, meta)`."""
+    if isinstance(path, str):
+        path = sorted(
+            entry.path for entry in os.scandir(path)
+            if entry.name.endswith(".npy") and os.path.exists(_meta_path(entry.path))
+        )
+    return [load_trajectory(p) for p in path]
@@ -0,0 +1,75 @@
+"""Pygame widgets for the interactive `run.py` window."""
+
+import pygame
+
+
+# Colors
+WHITE = (255, 255, 255)
+GRAY = (200, 200, 200)
+BLACK = (0, 0, 0)
+
+
+class Slider:
+    def __init__(self, name, x, y, width, height, range):
+        self.name = name
+        self.rect = pygame.Rect(x, y, width, height)
+        self.circle_radius = height // 2
+        self.circle_x = x  # Start position of the slider handle
+        self.dragging = False
+        self.range=range
+
+    def draw(self, surface):
+        # Draw the slider track
+        pygame.draw.rect(surface, GRAY, self.rect)
+        
+        # Draw the slider handle
+        pygame.draw.circle(surface, BLACK, (self.circle_x, self.rect.centery), self.circle_radius)
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            # Check if the mouse clicked on the slider handle
+            if pygame.Rect(self.circle_x - self.circle_radius, self.rect.centery - self.circle_radius, 
+                           self.circle_radius * 2, self.circle_radius * 2).collidepoint(event.pos):
+                self.dragging = True
+
+        elif event.type == pygame.MOUSEBUTTONUP:
+            # Stop dragging when the mouse button is released
+            self.dragging = False
+
+        elif event.type == pygame.MOUSEMOTION:
+            # Update the slider handle position if dragging
+            if self.dragging:
+                self.circle_x = max(self.rect.left, min(event.pos[0], self.rect.right))
+                
+    def get_value(self):
+        # Map the slider position to a range (e.g., 0 to 100)
+        return (self.circle_x - self.rect.left) / self.rect.width * self.range
+
+class Button:
+    def __init__(self, x, y, width, height, text, font, color, hover_color, text_color):
+        self.rect = pygame.Rect(x, y, width, height)
+        self.text = text
+        self.font = font
+        self.color = color
+        self.hover_color = hover_color
+        self.text_color = text_color
+        self.is_hovered = False
+
+    def draw(self, surface):
+        # Change color on hover
+        color = self.hover_color if self.is_hovered else self.color
+        pygame.draw.rect(surface, color, self.rect)
+        
+        # Render the text
+        text_surf = self.font.render(self.text, True, self.text_color)
+        text_rect = text_surf.get_rect(center=self.rect.center)
+        surface.blit(text_surf, text_rect)
+
+    def handle_event(self, event):
+        # Check if mouse is hovering over the button
+        self.is_hovered = self.rect.collidepoint(pygame.mouse.get_pos())
+        
+        # Check if button is clicked
+        if event.type == pygame.MOUSEBUTTONDOWN and self.is_hovered:
+            return True
+        return False
@@ -0,0 +1,105 @@
+"""Lazy activation of dominoes along the propagating wave.
+
+In a long chain only the few dominoes around the wavefront move; the rest
+stand still until a falling neighbour reaches them. `Wavefront` follows the
+rightmost point the moving dominoes and balls can reach and activates each
+domino once that point comes within ACTIVATION_MARGIN of it:
+
+- "sleep": every domino exists, but those right of the pushed one start
+  asleep. Box2D skips sleeping bodies in the solver and wakes them when a
+  contact begins, so activation only extends the bookkeeping.
+- "data": dominoes right of the pushed one are only positions until they
+  are activated, when their body is created (asleep, so it stays put until
+  it is hit). The broadphase and body list then only hold the wave.
+
+Only the live range (from the oldest domino that may still move to the
+newest activated one) is scanned, so the per-step cost follows the width of
+the wave rather than the length of the chain. Dominoes left of the pushed
+one are not tracked.
+"""
+
+import math
+from bisect import bisect_left, bisect_right
+
+LAZY_MODES = ("sleep", "data")
+ACTIVATION_MARGIN = 0.25  # Extra distance covering a few steps of motion
+
+
+class Wavefront:
+    """Tracks the wave over `domino_bodies` (in scenario order; None where
+    a body is not created yet) at `domino_positions`. In "data" mode
+    `create(i)` creates the body of domino `i`. Balls count as moving when
+    awake and faster than `rest_speed`."""
+
+    def __init__(self, mode, domino_bodies, domino_positions, domino_width, domino_height, push_position,
+                 ball_bodies, ball_radius, rest_speed, create=None):
+        if mode not in LAZY_MODES:
+            raise ValueError(f"Unknown lazy mode {mode!r}; expected one of {', '.join(LAZY_MODES)}")
+        if mode == "data" and create is None:
+            raise ValueError('"data" mode needs a `create` callback')
+        self.mode = mode
+        self.domino_bodies = domino_bodies
+        self.order = sorted(range(len(domino_positions)), key=domino_positions.__getitem__)
+        self.xs = [domino_positions[i] for i in self.order]
+        self.ball_bodies = ball_bodies
+        self.ball_radius = ball_radius
+        self.rest_speed = rest_speed
+        self.create = create
+        # Bounding circle of a domino around its center, and how far left of
+        # its center a domino can be touched
+        self.extent = math.hypot(domino_width, domino_height) / 2
+        self.margin = domino_width / 2 + ACTIVATION_MARGIN
+
+        self.tail = bisect_left(self.xs, push_position)
+        self.window = bisect_right(self.xs, push_position)
+        self.touched = bytearray(len(self.xs))
+        self.front = -math.inf
+        self.fallen_front = -math.inf
+
+    def _activate(self, k):
+        if self.mode == "data":
+            i = self.order[k]
+            body = self.domino_bodies[i] = self.create(i)
+            body.awake = False
+
+    def update(self):
+        """Advances the live range and activates the dominoes the wave can
+        reach. Call once before every step."""
+        bodies, order, touched = self.domino_bodies, self.order, self.touched
+        front = self.front
+        settled = True  # Everything left of k is asleep after being touched
+        for k in range(self.tail, self.window):
+            body = bodies[order[k]]
+            if body.awake:
+                touched[k] = 1
+                settled = False
+                x = body.position[0] + self.extent
+                if x > front:
+                    front = x
+            elif settled and touched[k]:
+                if abs(body.angle) > 0.5 and self.xs[k] > self.fallen_front:
+                    self.fallen_front = self.xs[k]
+                self.tail = k + 1
+            else:
+                settled = False
+
+        for ball in self.ball_bodies:
+            velocity = ball.linearVelocity
+            if ball.awake and velocity.x * velocity.x + velocity.y * velocity.y > self.rest_speed * self.rest_speed:
+                x = ball.position[0] + self.ball_radius
+                if x > front:
+                    front = x
+        self.front = front
+
+        while self.window < len(self.xs) and self.xs[self.window] - self.margin <= front:
+            self._activate(self.window)
+            self.window += 1
+
+    def live(self):
+        """`(bodies, positions)` of the live range, left to right."""
+        bodies, order = self.domino_bodies, self.order
+        return [bodies[order[k]] for k in range(self.tail, self.window)], self.xs[self.tail:self.window]
+
+    def next_position(self):
+        """Position of the first domino not activated yet, or None."""
+        return self.xs[self.window] if self.window < len(self.xs) else None
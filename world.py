@@ -1,12 +1,15 @@
-import pygame
+import math
+from collections import namedtuple
+
 from Box2D import (
     b2World, b2PolygonShape, b2CircleShape,
-    b2_dynamicBody, b2_staticBody, b2ContactListener, b2RevoluteJointDef
+    b2_dynamicBody, b2_staticBody, b2ContactListener, b2RevoluteJoint, b2RevoluteJointDef
 )
-import imageio
 import numpy as np
 
-from classes import ContactListener, Button, Slider
+import solver
+from contacts import ContactListener, BALL_BEAM, DOMINO, LAST_DOMINO, LAST_DOMINO_BALL, destroy_bodies, tag_bodies
+from layout import BOWLING_BALL_RADIUS, PLATFORM_TOP, ball_x, domino_xs
 
 # Screen dimensions and conversion factor
 SCREEN_WIDTH, SCREEN_HEIGHT = 800, 800
@@ -14,6 +17,7 @@ PPM = 20.0  # Pixels per meter
 TARGET_FPS = 60
 TIME_STEP = 1.0 / TARGET_FPS
 DURATION = 15  # Duration of the simulation in seconds
+PROFILE = "realtime"  # Solver profile of the headless runs (see solver.py); matches run.py
 
 BLACK = (0, 0, 0)
 
@@ -23,64 +27,46 @@ def to_pygame(pos):
     return int(pos[0] * PPM), int(SCREEN_HEIGHT - pos[1] * PPM)
 
 
-def get_world(domino_spacing=0.5, domino_width=0.2, domino_height=1.0, num_dominoes=20, small_gap=0.1, hole_size=0.1):
-    # Box2D world setup
-    world = b2World(gravity=(0, -10), doSleep=True)
-
-
-    # Elevated platform (the ledge)
-    platform_body = world.CreateStaticBody(
-        position=(12.5, 5),  # Centered at x=12.5, y=5
-        shapes=b2PolygonShape(box=(12.5, 1)),  # Half-width 12.5, half-height 1
-    )
-    
-    platform_body2 = world.CreateStaticBody(
-        position=(25 + hole_size + 1, 5),  # Centered at x=12.5, y=5
-        shapes=b2PolygonShape(box=(1, 1)),  # Half-width 12.5, half-height 1
-    )
-    
-
-
+def _create_dominoes(world, domino_spacing, domino_width, domino_height, num_dominoes):
     # Create dominoes
-    start_x = 5  # Starting x position on the platform
-    start_y = 6 + domino_height / 2  # Platform top surface y=6, domino center y
+    start_y = PLATFORM_TOP + domino_height / 2  # Platform top surface y=6, domino center y
 
     domino_bodies = []  # List to hold domino bodies
-    num_dominoes = int(num_dominoes)
-    for i in range(num_dominoes):
+    for i, domino_x in enumerate(domino_xs(domino_spacing, domino_width, num_dominoes)):
         angle = 0.0
         if i == 0:
             angle = -0.3  # Slightly tilt the first domino to initiate the fall
         body = world.CreateDynamicBody(
-            position=(start_x + i * (domino_width + domino_spacing), start_y),
+            position=(domino_x, start_y),
             angle=angle,
         )
         body.CreatePolygonFixture(box=(domino_width / 2, domino_height / 2), density=1.0, friction=0.3)
         body.fixedRotation = False  # Allow rotation
         domino_bodies.append(body)  # Add to list
-    first_domino_body = domino_bodies[0]
-    last_domino_body = domino_bodies[-1]
+    return domino_bodies
 
-    # Compute last domino x-position
-    last_domino_x = start_x + (num_dominoes - 1) * (domino_width + domino_spacing)
 
+def _create_ball(world, domino_spacing, domino_width, num_dominoes, small_gap):
     # Bowling ball properties
-    bowling_ball_radius = 0.5  # 0.5 meters radius
+    bowling_ball_radius = BOWLING_BALL_RADIUS  # 0.5 meters radius
     bowling_ball_density = 0.5  # Adjust as needed
 
-    bowling_ball_x = last_domino_x + domino_width / 2 + bowling_ball_radius + small_gap
-    bowling_ball_y = 6 + bowling_ball_radius  # On top of the platform
+    # Just past the last domino; see layout.py
+    bowling_ball_x = ball_x(domino_spacing, domino_width, num_dominoes, small_gap)
+    bowling_ball_y = PLATFORM_TOP + bowling_ball_radius  # On top of the platform
 
     # Create bowling ball
     bowling_ball_body = world.CreateDynamicBody(
         position=(bowling_ball_x, bowling_ball_y),
     )
     bowling_ball_body.CreateCircleFixture(radius=bowling_ball_radius, density=bowling_ball_density, friction=0.3)
+    return bowling_ball_body
 
+
+def _create_beam(world, beam_position):
     # Create the balance beam (seesaw)
     beam_length = 8.0  # Total length of the beam
     beam_thickness = 0.2  # Thickness of the beam
-    beam_position = (32 + hole_size, 2.0)  # Position of the fulcrum (pivot point)
 
     # Beam body (dynamic)
     beam_body = world.CreateDynamicBody(
@@ -154,33 +140,435 @@ def get_world(domino_spacing=0.5, domino_width=0.2, domino_height=1.0, num_domin
     )
     world.CreateJoint(joint_def)
 
+    return beam_body, fulcrum_body
+
+
+def get_world(domino_spacing=0.5, domino_width=0.2, domino_height=1.0, num_dominoes=20, small_gap=0.1, hole_size=0.1):
+    # Box2D world setup
+    world = b2World(gravity=(0, -10), doSleep=True)
+
+
+    # Elevated platform (the ledge)
+    platform_body = world.CreateStaticBody(
+        position=(12.5, 5),  # Centered at x=12.5, y=5
+        shapes=b2PolygonShape(box=(12.5, 1)),  # Half-width 12.5, half-height 1
+    )
+    
+    platform_body2 = world.CreateStaticBody(
+        position=(25 + hole_size + 1, 5),  # Centered at x=12.5, y=5
+        shapes=b2PolygonShape(box=(1, 1)),  # Half-width 12.5, half-height 1
+    )
+
+    domino_bodies = _create_dominoes(world, domino_spacing, domino_width, domino_height, num_dominoes)
+    first_domino_body = domino_bodies[0]
+    last_domino_body = domino_bodies[-1]
+
+    bowling_ball_body = _create_ball(world, domino_spacing, domino_width, num_dominoes, small_gap)
+
+    beam_body, _ = _create_beam(world, (32 + hole_size, 2.0))  # Position of the fulcrum (pivot point)
+
     # Add the contact listener to the world
-    contact_listener = ContactListener(last_domino_body, bowling_ball_body, platform_body, beam_body)
+    tag_bodies(domino_bodies, [bowling_ball_body], [platform_body, platform_body2], beam_body)
+    contact_listener = ContactListener()
     world.contactListener = contact_listener
     return world, first_domino_body, last_domino_body, bowling_ball_body, beam_body, domino_bodies, bowling_ball_body
 
 
-def draw_world_on_screen(world, screen):
-    # Draw static bodies (platform, fulcrum)
-        for body in world.bodies:
-            if body.type == b2_staticBody:
-                for fixture in body.fixtures:
-                    shape = fixture.shape
-                    if isinstance(shape, b2PolygonShape):
-                        vertices = [body.transform * v for v in shape.vertices]
-                        vertices = [to_pygame(v) for v in vertices]
-                        pygame.draw.polygon(screen, BLACK, vertices)
-
-        # Draw dynamic bodies (dominoes, bowling ball, beam)
-        for body in world.bodies:
-            if body.type == b2_dynamicBody:
-                for fixture in body.fixtures:
-                    shape = fixture.shape
-                    if isinstance(shape, b2PolygonShape):
-                        vertices = [body.transform * v for v in shape.vertices]
-                        vertices = [to_pygame(v) for v in vertices]
-                        pygame.draw.polygon(screen, BLACK, vertices)
-                    elif isinstance(shape, b2CircleShape):
-                        position = body.transform * shape.pos
-                        position = to_pygame(position)
-                        pygame.draw.circle(screen, BLACK, position, int(shape.radius * PPM))
\ No newline at end of file
+def _reset_body(body, position, angle=0.0):
+    """Puts a body back at the given transform, at rest and awake."""
+    body.position = position
+    body.angle = angle
+    body.linearVelocity = (0, 0)
+    body.angularVelocity = 0.0
+    body.awake = True
+
+
+class WorldTemplate:
+    """A world whose platforms, beam, fulcrum and joint are built once.
+
+    `reset` takes the same parameters as `get_world`. Dominoes are moved back
+    into place and brought to rest when their size and count are unchanged and
+    recreated otherwise; the second platform and the beam are moved in place.
+    The ball is always recreated so that the contact listener sees its contacts
+    begin again. Reusing one template avoids rebuilding the whole b2World for
+    every parameter set."""
+
+    def __init__(self):
+        self.world = b2World(gravity=(0, -10), doSleep=True)
+
+        # Elevated platform (the ledge)
+        self.platform_body = self.world.CreateStaticBody(
+            position=(12.5, 5),  # Centered at x=12.5, y=5
+            shapes=b2PolygonShape(box=(12.5, 1)),  # Half-width 12.5, half-height 1
+        )
+        # Positioned for the hole size in `reset`
+        self.platform_body2 = self.world.CreateStaticBody(
+            position=(26, 5),
+            shapes=b2PolygonShape(box=(1, 1)),  # Half-width 1, half-height 1
+        )
+        self.beam_body, self.fulcrum_body = _create_beam(self.world, (32, 2.0))
+        self.domino_bodies = []
+        self.domino_shape = None
+        self.bowling_ball_body = None
+        self.contact_listener = ContactListener()
+        self.world.contactListener = self.contact_listener
+        self.values = None
+
+    def reset(self, domino_spacing=0.5, domino_width=0.2, domino_height=1.0, num_dominoes=20, small_gap=0.1, hole_size=0.1):
+        """Returns the same tuple as `get_world`."""
+        self.values = (domino_spacing, domino_width, domino_height, num_dominoes, small_gap, hole_size)
+        world = self.world
+
+        self.platform_body2.position = (25 + hole_size + 1, 5)
+        beam_position = (32 + hole_size, 2.0)
+        self.fulcrum_body.position = beam_position
+        beam_body = self.beam_body
+        _reset_body(beam_body, beam_position)
+
+        shape = (domino_width, domino_height, int(num_dominoes))
+        if self.domino_bodies and shape == self.domino_shape:
+            start_y = PLATFORM_TOP + domino_height / 2
+            positions = domino_xs(domino_spacing, domino_width, num_dominoes)
+            for i, (body, domino_x) in enumerate(zip(self.domino_bodies, positions)):
+                _reset_body(body, (domino_x, start_y), -0.3 if i == 0 else 0.0)
+        else:
+            destroy_bodies(world, self.domino_bodies)
+            self.domino_bodies = _create_dominoes(world, domino_spacing, domino_width, domino_height, num_dominoes)
+        self.domino_shape = shape
+
+        destroy_bodies(world, [self.bowling_ball_body])
+        self.bowling_ball_body = _create_ball(world, domino_spacing, domino_width, num_dominoes, small_gap)
+
+        # Tag the new bodies for the contact listener and clear its state
+        tag_bodies(self.domino_bodies, [self.bowling_ball_body], [self.platform_body, self.platform_body2], beam_body)
+        self.contact_listener.reset()
+
+        return (world, self.domino_bodies[0], self.domino_bodies[-1], self.bowling_ball_body, beam_body,
+                self.domino_bodies, self.bowling_ball_body)
+
+
+# Result of `simulate_world`. Event steps are the first step at which the event
+# was observed, or -1 if it never happened.
+Outcome = namedtuple(
+    "Outcome",
+    [
+        "cup_tipped",
+        "last_domino_tipped",
+        "domino_ball_contact",
+        "ball_contact_bottom",
+        "cup_step",
+        "last_domino_step",
+        "domino_ball_step",
+        "ball_beam_step",
+        "steps",
+    ],
+)
+
+
+class WorldRun:
+    """The headless loop of `simulate_world` over a `get_world` tuple, in
+    resumable form: `advance(until)` runs it up to frame `until` (default: the
+    end of `duration`), and calling it again continues where it stopped.
+    With `sleep_stop=False` the "every dynamic body is asleep" rule is not
+    applied. `profile` is a solver profile or its name."""
+
+    def __init__(self, world_tuple, duration=DURATION, profile=PROFILE):
+        world, _, last_domino_body, ball_body, beam_body, domino_bodies, _ = world_tuple
+        self.world = world
+        self.last_domino_body = last_domino_body
+        self.ball_body = ball_body
+        self.beam_body = beam_body
+        self.domino_bodies = domino_bodies
+        self.contact_listener = world.contactListener
+        self.dynamic_bodies = [body for body in world.bodies if body.type == b2_dynamicBody]
+        self.profile = solver.get_profile(profile)
+        self.total_frames = solver.frames(self.profile, duration)
+        self.frame_count = 0
+        self.cup_step = self.last_domino_step = -1
+        self.stopped = False
+        # Frame the dominoes were restored from a snapshot at (see fork_world)
+        self.start_step = 0
+
+    @property
+    def done(self):
+        return self.stopped or self.frame_count >= self.total_frames
+
+    def advance(self, until=None, sleep_stop=True):
+        """Returns `done`."""
+        until = self.total_frames if until is None else min(until, self.total_frames)
+        world, beam_body, contact_listener, profile = self.world, self.beam_body, self.contact_listener, self.profile
+        while not self.stopped and self.frame_count < until:
+            if self.last_domino_step < 0 and abs(self.last_domino_body.angle) > 0.5:
+                self.last_domino_step = self.frame_count
+            if beam_body.angle > 0.2:
+                self.cup_step = self.frame_count
+                self.stopped = True
+                break
+            if beam_body.angle < -0.2 or (sleep_stop and not any(body.awake for body in self.dynamic_bodies)):
+                self.stopped = True
+                break
+
+            contact_listener.step = self.frame_count
+            solver.step(world, profile)
+            world.ClearForces()
+            self.frame_count += 1
+        return self.done
+
+    def outcome(self):
+        domino_ball_step = self.contact_listener.first_step(LAST_DOMINO_BALL)
+        ball_beam_step = self.contact_listener.first_step(BALL_BEAM)
+        return Outcome(
+            cup_tipped=self.cup_step >= 0,
+            last_domino_tipped=self.last_domino_step >= 0,
+            domino_ball_contact=domino_ball_step is not None,
+            ball_contact_bottom=ball_beam_step is not None,
+            cup_step=self.cup_step,
+            last_domino_step=self.last_domino_step,
+            domino_ball_step=-1 if domino_ball_step is None else domino_ball_step,
+            ball_beam_step=-1 if ball_beam_step is None else ball_beam_step,
+            steps=self.frame_count,
+        )
+
+
+def simulate_world(values, duration=DURATION, template=None, profile=PROFILE):
+    """Simulates the `get_world` parameters `values` headlessly, with the same
+    time step and tipping thresholds as `run.py`, and returns an Outcome.
+
+    The run ends when the beam tips either way, when every dynamic body is
+    asleep, or after `duration` seconds. With `template` (a WorldTemplate) the
+    world is reset in place instead of being built from scratch. `profile`
+    selects the solver settings; see solver.py."""
+    run = WorldRun((template.reset if template else get_world)(*values), duration, profile)
+    run.advance()
+    return run.outcome()
+
+
+# Dynamic state of one body
+BodyState = namedtuple("BodyState", ["position", "angle", "linear_velocity", "angular_velocity", "awake"])
+
+# State of a running world at frame `step`: `bodies` maps the role tag of every
+# tagged dynamic body (see contacts.tag_bodies) to its BodyState, `joints` holds
+# (angle, speed) of every revolute joint, `extra` any loop state of the caller
+WorldSnapshot = namedtuple("WorldSnapshot", ["values", "step", "bodies", "joints", "extra"])
+
+# Roles of the bodies that only the first four `get_world` parameters place.
+# `small_gap` and `hole_size` only move the ball, the second platform and the
+# beam, so runs that agree on the first four share the start of the domino wave
+DOMINO_ROLES = (DOMINO, LAST_DOMINO)
+DOMINO_PARAMS = 4
+# Distance the dominoes have to keep from the ball and the second platform for
+# a shared prefix to count as unaffected by them
+SHARE_MARGIN = 0.2
+
+
+def snapshot_world(world, values=None, step=0, **extra):
+    """Captures the dynamic state of `world`: transforms, velocities and
+    sleep flags of the tagged dynamic bodies, and the revolute joint state."""
+    bodies = {}
+    for body in world.bodies:
+        if body.type == b2_dynamicBody and body.userData is not None:
+            bodies[body.userData] = BodyState(
+                tuple(body.position), body.angle, tuple(body.linearVelocity), body.angularVelocity, body.awake
+            )
+    joints = tuple((joint.angle, joint.speed) for joint in world.joints if isinstance(joint, b2RevoluteJoint))
+    return WorldSnapshot(None if values is None else tuple(values), step, bodies, joints, extra)
+
+
+def restore_world(world, snapshot, roles=None):
+    """Puts the tagged dynamic bodies of `world` (only those with a role in
+    `roles`, if given) into their state in `snapshot`, matching bodies by
+    role tag. Joints follow from the bodies they connect.
+
+    pybox2d does not expose contact impulses or sleep timers, so the first
+    steps after a restore are not bit-identical to an uninterrupted run."""
+    restored = 0
+    for body in world.bodies:
+        tag = body.userData
+        if body.type != b2_dynamicBody or tag is None or (roles is not None and tag[0] not in roles):
+            continue
+        state = snapshot.bodies.get(tag)
+        if state is None:
+            raise ValueError(f"Snapshot has no body tagged {tag}")
+        body.position = state.position
+        body.angle = state.angle
+        body.linearVelocity = state.linear_velocity
+        body.angularVelocity = state.angular_velocity
+        body.awake = state.awake
+        restored += 1
+    expected = sum(roles is None or tag[0] in roles for tag in snapshot.bodies)
+    if restored != expected:
+        raise ValueError(f"Restored {restored} bodies of a snapshot with {expected}")
+
+
+def _downstream_edge(values, ball_body=None):
+    """Leftmost x of the bodies `small_gap` and `hole_size` place: the ball
+    (at its current position if given) and the second platform."""
+    domino_spacing, domino_width, _, num_dominoes, small_gap, hole_size = values
+    ball = ball_body.position[0] if ball_body is not None else ball_x(domino_spacing, domino_width, num_dominoes,
+                                                                        small_gap)
+    return min(ball - BOWLING_BALL_RADIUS, 25 + hole_size)
+
+
+def fork_world(snapshot, values, duration=DURATION, template=None, reach=None, profile=PROFILE):
+    """Returns a WorldRun of the `get_world` parameters `values` at frame
+    `snapshot.step`, with the dominoes taken from `snapshot`, a run whose
+    first four parameters are the same.
+
+    The ball and beam are simulated from frame 0 with the dominoes held
+    asleep, which is cheap, so they are in their own state at the fork. With
+    `reach` (the rightmost x the snapshot's dominoes reached by each frame)
+    None is returned if the ball came within SHARE_MARGIN of it, i.e. the
+    dominoes might not have moved the same way in this world. If the beam
+    tips before `snapshot.step` the run ends there without using the
+    snapshot, and its `start_step` stays 0."""
+    if tuple(values[:DOMINO_PARAMS]) != tuple(snapshot.values[:DOMINO_PARAMS]):
+        raise ValueError(f"Cannot fork a run of {snapshot.values} into {values}")
+    run = WorldRun((template.reset if template else get_world)(*values), duration, profile)
+    for body in run.domino_bodies:
+        body.awake = False
+    while run.frame_count < snapshot.step:
+        if reach is not None and reach[run.frame_count] >= _downstream_edge(values, run.ball_body) - SHARE_MARGIN:
+            return None
+        if run.advance(run.frame_count + 1, sleep_stop=False):
+            # The beam tipped before the dominoes could have reached anything
+            return run
+    restore_world(run.world, snapshot, DOMINO_ROLES)
+    run.start_step = snapshot.step
+    run.last_domino_step = snapshot.extra.get("last_domino_step", -1)
+    return run
+
+
+def simulate_worlds(points, duration=DURATION, template=None, snapshot_every=30, profile=PROFILE):
+    """`simulate_world` for many parameter sets, sharing simulated prefixes.
+
+    Points that agree on the first four parameters are grouped. The point of
+    a group whose ball and second platform are farthest away is simulated in
+    full, with a snapshot every `snapshot_every` frames while the dominoes
+    are still clear of the other points' balls. Every other point forks from
+    the last snapshot taken before the dominoes came within SHARE_MARGIN of
+    its ball (see `fork_world`). Returns `(outcome, start_step)` per point in
+    order, where `start_step` is the frame the point's dominoes were restored
+    from a snapshot at (0 if none was used)."""
+    points = [tuple(values) for values in points]
+    groups = {}
+    for i, values in enumerate(points):
+        groups.setdefault(values[:DOMINO_PARAMS], []).append(i)
+
+    results = [None] * len(points)
+    for indices in groups.values():
+        if len(indices) == 1:
+            results[indices[0]] = (simulate_world(points[indices[0]], duration, template, profile), 0)
+            continue
+
+        edges = {i: _downstream_edge(points[i]) - SHARE_MARGIN for i in indices}
+        reference = max(indices, key=edges.get)
+        needed = max(edges[i] for i in indices if i != reference)
+        _, domino_width, domino_height, _ = points[reference][:DOMINO_PARAMS]
+        radius = math.hypot(domino_width, domino_height) / 2
+
+        run = WorldRun((template.reset if template else get_world)(*points[reference]), duration, profile)
+        reach, snapshots = [], []
+        front = -math.inf
+        while not run.done:
+            if front >= needed:
+                run.advance()
+                break
+            front = max(front, max(body.position[0] for body in run.domino_bodies) + radius)
+            reach.append(front)
+            if run.frame_count % snapshot_every == 0 and front < needed:
+                snapshots.append(snapshot_world(run.world, points[reference], run.frame_count,
+                                                last_domino_step=run.last_domino_step))
+            run.advance(run.frame_count + 1)
+        results[reference] = (run.outcome(), 0)
+
+        for i in indices:
+            if i == reference:
+                continue
+            usable = [snapshot for snapshot in snapshots if snapshot.step and reach[snapshot.step] < edges[i]]
+            forked = usable and fork_world(usable[-1], points[i], duration, template, reach, profile)
+            if forked:
+                forked.advance()
+                results[i] = (forked.outcome(), forked.start_step)
+            else:
+                results[i] = (simulate_world(points[i], duration, template, profile), 0)
+    return results
+
+
+class WorldRenderer:
+    """Draws a world with one batched rotation plus translation per frame.
+
+    The local vertices of every polygon fixture and the local centers of every
+    circle fixture are cached once. Each frame only the body positions and
+    angles are gathered; all vertices are then transformed and converted to
+    screen coordinates with NumPy before the pygame draw calls. Static bodies
+    are drawn before dynamic ones, as in `draw_world_on_screen`. Call
+    `refresh` after bodies are created or destroyed."""
+
+    def __init__(self, world):
+        self.world = world
+        self.refresh()
+
+    def refresh(self):
+        bodies = list(self.world.bodies)
+        self.bodies = [body for body in bodies if body.type == b2_staticBody] + \
+                      [body for body in bodies if body.type == b2_dynamicBody]
+
+        vertices, vertex_bodies, polygon_sizes = [], [], []
+        centers, center_bodies, radii = [], [], []
+        for i, body in enumerate(self.bodies):
+            for fixture in body.fixtures:
+                shape = fixture.shape
+                if isinstance(shape, b2PolygonShape):
+                    polygon = [tuple(v) for v in shape.vertices]
+                    vertices.extend(polygon)
+                    vertex_bodies.extend([i] * len(polygon))
+                    polygon_sizes.append(len(polygon))
+                elif isinstance(shape, b2CircleShape) and body.type == b2_dynamicBody:
+                    centers.append(tuple(shape.pos))
+                    center_bodies.append(i)
+                    radii.append(int(shape.radius * PPM))
+
+        self.vertices = np.array(vertices, dtype=np.float64).reshape(-1, 2)
+        self.vertex_bodies = np.array(vertex_bodies, dtype=np.intp)
+        self.polygon_offsets = np.cumsum([0] + polygon_sizes).tolist()
+        self.centers = np.array(centers, dtype=np.float64).reshape(-1, 2)
+        self.center_bodies = np.array(center_bodies, dtype=np.intp)
+        self.radii = radii
+
+    def _to_screen(self, local, body_index, poses):
+        x, y, angle = poses[body_index].T
+        cos, sin = np.cos(angle), np.sin(angle)
+        world_x = cos * local[:, 0] - sin * local[:, 1] + x
+        world_y = sin * local[:, 0] + cos * local[:, 1] + y
+        # Same truncation as `to_pygame`
+        screen_x = (world_x * PPM).astype(np.int64)
+        screen_y = (SCREEN_HEIGHT - world_y * PPM).astype(np.int64)
+        return np.stack([screen_x, screen_y], axis=1).tolist()
+
+    def draw(self, screen, color=BLACK):
+        import pygame
+
+        poses = np.array([(body.position[0], body.position[1], body.angle) for body in self.bodies],
+                         dtype=np.float64).reshape(-1, 3)
+
+        points = self._to_screen(self.vertices, self.vertex_bodies, poses)
+        offsets = self.polygon_offsets
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            pygame.draw.polygon(screen, color, points[start:end])
+
+        centers = self._to_screen(self.centers, self.center_bodies, poses)
+        for center, radius in zip(centers, self.radii):
+            pygame.draw.circle(screen, color, center, radius)
+
+
+def draw_world_on_screen(world, screen, renderer=None):
+    """Draws `world` with `renderer`, a WorldRenderer for that world. Without
+    one, a renderer is built for this call only, which redoes the per-body
+    preprocessing; loops should keep one renderer per world across frames (as
+    `run.py` does) and call its `refresh` after bodies are created or
+    destroyed."""
+    if renderer is None:
+        renderer = WorldRenderer(world)
+    elif renderer.world is not world:
+        raise ValueError("The renderer was built for another world")
+    renderer.draw(screen)